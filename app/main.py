@@ -1,7 +1,8 @@
 # app/main.py
+import sys
 from fastapi import FastAPI
-from app.routes import health, sentiment, predict, retrieve
-from src.observability.langfuse_client import get_langfuse
+from app.routes import health, metrics, sentiment, predict, retrieve
+from src.executors import shutdown_pools
 from slowapi.errors import RateLimitExceeded
 from fastapi.responses import JSONResponse
 from src.security.rate_limit import limiter
@@ -14,14 +15,16 @@ app = FastAPI(
 
 # Routers
 app.include_router(health.router, tags=["Health"])
+app.include_router(metrics.router, tags=["Metrics"])
 app.include_router(sentiment.router, prefix="/api/v1", tags=["Sentiment"])
 app.include_router(retrieve.router, prefix="/api/v1", tags=["Retriever"])
 app.include_router(predict.router, prefix="/api/v1", tags=["Prediction"])
 
-@app.on_event("startup")
-def startup_event():
-    get_langfuse()
-    print("Langfuse initialized")
+@app.on_event("shutdown")
+async def shutdown_event():
+    shutdown_pools()
+    if "src.db" in sys.modules:
+        await sys.modules["src.db"].dispose_async_engine()
 
 
 app.state.limiter = limiter
@@ -1,7 +1,29 @@
 from fastapi import APIRouter
+from src.security.admission import admission_stats
+from src.observability.tracing import tracing_stats
 
 router = APIRouter()
 
 @router.get("/health")
-def health():
+async def health():
     return {"status": "ok"}
+
+
+@router.get("/health/admission")
+async def admission():
+    # in-flight, queue depth, rejections and queue-wait percentiles per endpoint budget
+    return admission_stats()
+
+
+@router.get("/health/db")
+async def db_pools():
+    # connection checkout latency percentiles and pool saturation per engine
+    from src.db import pool_stats  # deferred: keeps SQLAlchemy out of app startup
+
+    return pool_stats()
+
+
+@router.get("/health/tracing")
+async def tracing():
+    # sampling config and exported / dropped / failed span counts
+    return tracing_stats()
@@ -0,0 +1,10 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from src.observability.metrics import render
+
+router = APIRouter()
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    # Prometheus text exposition format: stage latency histograms and counters
+    return PlainTextResponse(render(), media_type="text/plain; version=0.0.4; charset=utf-8")
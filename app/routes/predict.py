@@ -1,6 +1,8 @@
 from fastapi import APIRouter, Depends
 from pydantic import BaseModel
 from src.predict_price import predict_next_day
+from src.executors import run_in_pool
+from src.security.admission import get_admission
 from src.auth.api_key import verify_api_key
 
 router = APIRouter()
@@ -15,8 +17,18 @@ class PredictResponse(BaseModel):
     date: str
 
 @router.post("/predict", response_model=PredictResponse)
-def predict_price(
+async def predict_price(
     req: PredictRequest,
     api_key: str = Depends(verify_api_key),
 ):
-    return predict_next_day(req.ticker)
+    async with get_admission("predict").slot(api_key):
+        from src.db import DB_ASYNC_ENABLED  # deferred: keeps SQLAlchemy out of app startup
+
+        inputs = None
+        if DB_ASYNC_ENABLED:
+            # reads on the async engine; only the CPU-bound part takes a pool worker
+            from src.features import load_feature_inputs_async
+
+            inputs = await load_feature_inputs_async(req.ticker)
+        # feature building + RandomForest scoring are CPU-bound: dedicated pool
+        return await run_in_pool("predict", predict_next_day, req.ticker, inputs)
@@ -1,17 +1,71 @@
-from fastapi import APIRouter, Depends, Query
-from src.retriever import get_default_retriever
+from datetime import datetime
+from typing import Any, Dict, List, Literal
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from pydantic import BaseModel
+from src.retriever import get_default_retriever, build_where
 from src.auth.api_key import verify_api_key
+from src.executors import run_in_pool
+from src.security.admission import get_admission
 
 router = APIRouter()
 
+MAX_BATCH_QUERIES = 100
+
+class RetrieveBatchRequest(BaseModel):
+    queries: List[str]
+    k: int = 5
+    ticker: str | None = None
+    published_after: datetime | None = None
+    published_before: datetime | None = None
+    mode: Literal["dense", "bm25", "hybrid"] | None = None
+
+class QueryResults(BaseModel):
+    query: str
+    results: List[Dict[str, Any]]
+
+class RetrieveBatchResponse(BaseModel):
+    results: List[QueryResults]
+
+def _retrieve(queries, k, filters, mode):
+    return get_default_retriever(k=k).get_relevant_documents_batch(queries, k=k, filters=filters, mode=mode)
+
 @router.get("/retrieve")
-def retrieve_news(
+async def retrieve_news(
     query: str = Query(...),
     ticker: str | None = None,
+    published_after: datetime | None = None,
+    published_before: datetime | None = None,
     k: int = 5,
+    mode: Literal["dense", "bm25", "hybrid"] | None = None,
     api_key: str = Depends(verify_api_key),
 ):
-    retriever = get_default_retriever(k=k)
-    filters = {"ticker": ticker} if ticker else None
-    docs = retriever.get_relevant_documents(query, k=k, filters=filters)
-    return {"results": docs}
+    filters = build_where(ticker, published_after, published_before)
+    # chroma + embedding calls block: dedicated pool, not the shared threadpool
+    async with get_admission("retrieve").slot(api_key):
+        docs = await run_in_pool("retrieve", _retrieve, [query], k, filters, mode)
+    return {"results": docs[0]}
+
+
+@router.post("/retrieve/batch", response_model=RetrieveBatchResponse)
+async def retrieve_news_batch(
+    req: RetrieveBatchRequest,
+    api_key: str = Depends(verify_api_key),
+):
+    if len(req.queries) > MAX_BATCH_QUERIES:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {MAX_BATCH_QUERIES} queries per request",
+        )
+    filters = build_where(req.ticker, req.published_after, req.published_before)
+    # one embedding call + one collection query for all uncached queries
+    # one provider call + one vector query, but scoring grows with the query count
+    async with get_admission("retrieve").slot(api_key, cost=max(1, len(req.queries) // 10)):
+        per_query = await run_in_pool("retrieve", _retrieve, req.queries, req.k, filters, req.mode)
+    return {"results": [{"query": q, "results": docs} for q, docs in zip(req.queries, per_query)]}
+
+
+@router.get("/retrieve/stats")
+async def retriever_stats(api_key: str = Depends(verify_api_key)):
+    retriever = await run_in_pool("retrieve", get_default_retriever)
+    return retriever.stats()
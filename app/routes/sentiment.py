@@ -1,10 +1,15 @@
-from fastapi import APIRouter, Depends
+import asyncio
+from typing import List
+from fastapi import APIRouter, Depends, HTTPException, status
 from pydantic import BaseModel
-from src.sentiment_chain import classify_text
+from src.sentiment_chain import get_sentiment_batcher
 from src.auth.api_key import verify_api_key
+from src.security.admission import get_admission
 
 router = APIRouter()
 
+MAX_BATCH_ITEMS = 100
+
 class SentimentRequest(BaseModel):
     title: str
     body: str
@@ -14,10 +19,33 @@ class SentimentResponse(BaseModel):
     confidence: float
     rationale: str
 
+class SentimentBatchRequest(BaseModel):
+    items: List[SentimentRequest]
+
+class SentimentBatchResponse(BaseModel):
+    results: List[SentimentResponse]
+
 @router.post("/sentiment", response_model=SentimentResponse)
-def analyze_sentiment(
+async def analyze_sentiment(
     req: SentimentRequest,
     api_key: str = Depends(verify_api_key),
 ):
-    result = classify_text(req.title, req.body)
-    return result
+    async with get_admission("sentiment").slot(api_key):
+        # concurrent requests are coalesced into batched provider calls
+        return await get_sentiment_batcher().submit((req.title, req.body))
+
+@router.post("/sentiment/batch", response_model=SentimentBatchResponse)
+async def analyze_sentiment_batch(
+    req: SentimentBatchRequest,
+    api_key: str = Depends(verify_api_key),
+):
+    if len(req.items) > MAX_BATCH_ITEMS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {MAX_BATCH_ITEMS} items per request",
+        )
+    # cost-weighted: a batch holds one unit of the LLM budget per article
+    async with get_admission("sentiment").slot(api_key, cost=len(req.items)):
+        batcher = get_sentiment_batcher()
+        results = await asyncio.gather(*(batcher.submit((it.title, it.body)) for it in req.items))
+    return {"results": results}
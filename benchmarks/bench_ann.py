@@ -0,0 +1,99 @@
+# benchmarks/bench_ann.py
+"""
+Recall@k vs brute force, query latency, load time and disk footprint of the
+embedded IVF vector backend (src.ann_store) on clustered synthetic embeddings.
+
+Usage:
+    python benchmarks/bench_ann.py --n 200000 --dim 384 --quantize none int8 --nprobe 4 8 16 32
+"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from src.ann_store import AnnCollection
+
+TICKERS = [f"T{i}.NS" for i in range(50)]
+
+
+def synthetic_embeddings(n: int, dim: int, clusters: int, rng) -> np.ndarray:
+    # topic clusters + noise, L2-normalized like sentence embeddings
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    x = centers[rng.integers(0, clusters, n)] + 0.6 * rng.normal(size=(n, dim)).astype(np.float32)
+    return x / np.linalg.norm(x, axis=1, keepdims=True)
+
+
+def brute_force(x, q, k, allowed=None):
+    d = np.einsum("ij,ij->i", x, x) - 2.0 * (x @ q)
+    if allowed is not None:
+        d = np.where(allowed, d, np.inf)
+    top = np.argpartition(d, k)[:k]
+    return set(top[np.isfinite(d[top])].tolist())
+
+
+def _pct(latencies):
+    ms = np.array(latencies) * 1000
+    return f"p50={np.percentile(ms, 50):6.2f}ms p95={np.percentile(ms, 95):6.2f}ms p99={np.percentile(ms, 99):6.2f}ms"
+
+
+def run(x, tickers, quantize, nprobes, queries, k, rng, chunk=20000):
+    n = len(x)
+    with tempfile.TemporaryDirectory() as tmp:
+        coll = AnnCollection("bench", root=Path(tmp), quantize=quantize)
+        t0 = time.perf_counter()
+        for lo in range(0, n, chunk):
+            hi = min(n, lo + chunk)
+            coll.upsert(
+                [str(i) for i in range(lo, hi)],
+                metadatas=[{"ticker": tickers[i], "published_at": 1_600_000_000 + 60 * i} for i in range(lo, hi)],
+                embeddings=x[lo:hi],
+            )
+        if coll.trained_rows < n:
+            coll.train()
+        print(f"[{quantize}] built {n:,} vectors in {time.perf_counter() - t0:.1f}s, {len(coll.centroids)} lists")
+        coll.close()
+
+        t0 = time.perf_counter()
+        coll = AnnCollection("bench", root=Path(tmp))
+        print(f"[{quantize}] load: {(time.perf_counter() - t0) * 1000:.1f}ms")
+        sizes = {p.name: p.stat().st_size for p in Path(tmp, "bench").iterdir()}
+        scanned = "codes.i8" if quantize == "int8" else "vectors.f32"
+        print(f"[{quantize}] scanned matrix {sizes[scanned] / 2**20:.0f}MB, total on disk {sum(sizes.values()) / 2**20:.0f}MB")
+
+        probes = x[rng.choice(n, queries, replace=False)] + 0.05 * rng.normal(size=(queries, x.shape[1])).astype(np.float32)
+        ticker_of = np.array(tickers)
+        for label, where in (("no filter", None), ("ticker", {"ticker": TICKERS[0]})):
+            allowed = None if where is None else ticker_of == TICKERS[0]
+            truth = [brute_force(x, q, k, allowed) for q in probes]
+            for nprobe in nprobes:
+                latencies, hits = [], 0
+                for q, t in zip(probes, truth):
+                    t0 = time.perf_counter()
+                    res = coll.query(query_embeddings=[q], n_results=k, where=where, nprobe=nprobe)
+                    latencies.append(time.perf_counter() - t0)
+                    hits += len(t & {int(i) for i in res["ids"][0]})
+                print(f"[{quantize}] {label:<9} nprobe={nprobe:<3} recall@{k}={hits / (k * queries):.3f}  {_pct(latencies)}")
+        coll.close()
+
+
+def main(n, dim, quantize, nprobes, queries, k):
+    rng = np.random.default_rng(7)
+    x = synthetic_embeddings(n, dim, clusters=max(10, n // 2000), rng=rng)
+    tickers = [TICKERS[i] for i in rng.integers(0, len(TICKERS), n)]
+    for q in quantize:
+        run(x, tickers, q, nprobes, queries, k, rng)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n", type=int, default=200000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--quantize", nargs="+", default=["none", "int8"])
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[4, 8, 16, 32])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+    main(args.n, args.dim, args.quantize, args.nprobe, args.queries, args.k)
@@ -0,0 +1,387 @@
+# benchmarks/bench_api.py
+"""
+Offline load test of the API and its pipelines, for catching latency
+regressions between commits.
+
+- isolated workspace: SQLite database (or --database-url), vector store,
+  BM25 index and caches in a temp dir; nothing under data/ or models/ is touched
+- synthetic prices and news (benchmarks/synthetic_data.py) indexed by the real
+  build_vectorstore pipeline; a small price model trained on them
+- fake providers with configurable latency: stub LLM (SENTIMENT_LLM_PROVIDER=stub)
+  and stub embeddings (EMBEDDING_PROVIDER=stub)
+- pipelines timed in-process: make_features, predict_next_day, NewsRetriever
+- the app runs under uvicorn; closed-loop clients drive a weighted mix of
+  /predict, /sentiment and /retrieve for --duration seconds after --warmup
+- p50/p95/p99, throughput, error and 503/429 counts per endpoint plus per-stage
+  means from /metrics are written to --out; --compare flags regressions
+  (exit status 1)
+
+Usage:
+    python benchmarks/bench_api.py --duration 30 --concurrency 32 --out bench.json
+    python benchmarks/bench_api.py --mix predict=1 sentiment=4 retrieve=5 --llm-latency-ms 300
+    python benchmarks/bench_api.py --out new.json --compare bench.json --threshold 0.15
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+API_KEY = "bench-key"
+
+
+def configure_env(workdir: Path, args):
+    # read at import time by src.*: must be set before anything from src is imported
+    os.environ.update(
+        {
+            "DATABASE_URL": args.database_url or f"sqlite:///{workdir / 'bench.db'}",
+            "CHROMA_DIR": str(workdir / "chroma"),
+            "COLLECTION_VERSION_DIR": str(workdir / "chroma"),
+            "ANN_DIR": str(workdir / "ann"),
+            "BM25_INDEX_DIR": str(workdir / "bm25"),
+            "EMBEDDING_CACHE_DIR": str(workdir / "embedding_cache"),
+            "SENTIMENT_CACHE_PATH": str(workdir / "sentiment_cache.sqlite"),
+            "PRICE_MODEL_PATH": str(workdir / "price_model.pkl"),
+            "VECTOR_BACKEND": args.vector_backend,
+            "EMBEDDING_PROVIDER": "stub",
+            "EMBEDDING_STUB_LATENCY_SEC": str(args.embed_latency_ms / 1000),
+            "SENTIMENT_LLM_PROVIDER": "stub",
+            "SENTIMENT_STUB_LATENCY_SEC": str(args.llm_latency_ms / 1000),
+            "TRACING_ENABLED": "0",
+            "API_KEY": API_KEY,
+        }
+    )
+    os.environ["PYTHONPATH"] = os.pathsep.join(filter(None, [os.getcwd(), os.environ.get("PYTHONPATH")]))
+
+
+def setup_data(args, tickers):
+    from benchmarks.synthetic_data import populate, train_price_model
+    from scripts.build_vectorstore import build_vectorstore
+    from src.db import engine
+
+    timings = {}
+    t0 = time.perf_counter()
+    counts = populate(engine, tickers, days=args.days, articles_per_day=args.articles_per_day)
+    timings["populate_sec"] = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):  # per-page progress lines
+        build_vectorstore()
+    timings["build_vectorstore_sec"] = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    train_price_model(os.environ["PRICE_MODEL_PATH"], tickers[0])
+    timings["train_model_sec"] = time.perf_counter() - t0
+    return {**counts, **timings}
+
+
+def _summary(latencies_sec, elapsed=None):
+    if not latencies_sec:
+        return {"count": 0}
+    ms = np.array(latencies_sec) * 1000
+    out = {
+        "count": len(ms),
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p95_ms": float(np.percentile(ms, 95)),
+        "p99_ms": float(np.percentile(ms, 99)),
+        "mean_ms": float(ms.mean()),
+        "max_ms": float(ms.max()),
+    }
+    if elapsed:
+        out["throughput_rps"] = len(ms) / elapsed
+    return out
+
+
+def bench_pipelines(iters: int, tickers, rng):
+    """
+    In-process latency of the functions behind each endpoint.
+    """
+    from benchmarks.synthetic_data import make_query
+    from src.features import make_features
+    from src.predict_price import predict_next_day
+    from src.retriever import NewsRetriever
+
+    retriever = NewsRetriever(k=5)
+    cases = {
+        "make_features": lambda i: make_features(rng.choice(tickers)),
+        "predict_next_day": lambda i: predict_next_day(rng.choice(tickers)),
+        # distinct queries: measures the uncached path
+        "retriever_uncached": lambda i: retriever.get_relevant_documents(f"{make_query(rng, tickers)} {i}"),
+        "retriever_cached": lambda i: retriever.get_relevant_documents("Reliance record profit crude oil"),
+    }
+    results = {}
+    for name, fn in cases.items():
+        fn(-1)  # warm model / index / caches
+        latencies = []
+        for i in range(iters):
+            t0 = time.perf_counter()
+            fn(i)
+            latencies.append(time.perf_counter() - t0)
+        results[name] = _summary(latencies)
+        print(f"  {name:<20} p50={results[name]['p50_ms']:8.2f}ms  p95={results[name]['p95_ms']:8.2f}ms  "
+              f"p99={results[name]['p99_ms']:8.2f}ms")
+    return results
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(port: int, workers: int):
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        env=dict(os.environ),
+    )
+    import httpx
+
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"server exited with {proc.returncode}")
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/health", timeout=1).status_code == 200:
+                return proc
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError("server did not become healthy within 60s")
+
+
+def _request_factory(rng, tickers, sentiment_repeat: float):
+    from benchmarks.synthetic_data import make_article, make_query
+
+    seen = []
+
+    def predict():
+        return "POST", "/api/v1/predict", {"json": {"ticker": rng.choice(tickers)}}
+
+    def sentiment():
+        if seen and rng.random() < sentiment_repeat:
+            title, body = rng.choice(seen)
+        else:
+            title, body, _ = make_article(rng, rng.choice(tickers))
+            seen.append((title, body))
+        return "POST", "/api/v1/sentiment", {"json": {"title": title, "body": body}}
+
+    def retrieve():
+        params = {"query": make_query(rng, tickers), "k": 5}
+        if rng.random() < 0.3:
+            params["ticker"] = rng.choice(tickers)
+        return "GET", "/api/v1/retrieve", {"params": params}
+
+    return {"predict": predict, "sentiment": sentiment, "retrieve": retrieve}
+
+
+async def drive_load(base_url, mix, concurrency, duration, warmup, rng, tickers, sentiment_repeat):
+    import httpx
+
+    factories = _request_factory(rng, tickers, sentiment_repeat)
+    names = list(mix)
+    weights = [mix[n] for n in names]
+    records = defaultdict(lambda: {"latencies": [], "errors": 0, "rejected": 0})
+    measure_from = stop_at = 0.0
+
+    async def worker(client):
+        while time.monotonic() < stop_at:
+            name = rng.choices(names, weights)[0]
+            method, path, kwargs = factories[name]()
+            t0 = time.perf_counter()
+            try:
+                resp = await client.request(method, path, **kwargs)
+                status = resp.status_code
+            except httpx.HTTPError:
+                status = -1
+            elapsed = time.perf_counter() - t0
+            if time.monotonic() < measure_from:
+                continue
+            rec = records[name]
+            if 200 <= status < 300:
+                rec["latencies"].append(elapsed)
+            elif status in (429, 503):
+                rec["rejected"] += 1
+            else:
+                rec["errors"] += 1
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(
+        base_url=base_url, headers={"X-API-KEY": API_KEY}, limits=limits, timeout=60
+    ) as client:
+        # one request per endpoint first: pool processes spawn and models load outside the window
+        for name in names:
+            method, path, kwargs = factories[name]()
+            await client.request(method, path, **kwargs)
+        start = time.monotonic()
+        measure_from, stop_at = start + warmup, start + warmup + duration
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        metrics_text = (await client.get("/metrics")).text
+    measured = time.monotonic() - measure_from
+
+    endpoints = {}
+    for name in names:
+        rec = records[name]
+        endpoints[name] = {**_summary(rec["latencies"], measured), "errors": rec["errors"], "rejected": rec["rejected"]}
+    total = sum(len(r["latencies"]) for r in records.values())
+    return endpoints, {"requests_ok": total, "throughput_rps": total / measured, "measured_sec": measured}, metrics_text
+
+
+def parse_stage_metrics(text: str):
+    """
+    Mean latency and count per stage from the /metrics exposition text.
+    """
+    sums, counts = {}, {}
+    for line in text.splitlines():
+        if not line.startswith("stage_latency_seconds_"):
+            continue
+        metric, value = line.rsplit(" ", 1)
+        stage = metric.split('stage="', 1)[1].split('"', 1)[0]
+        if metric.startswith("stage_latency_seconds_sum"):
+            sums[stage] = float(value)
+        elif metric.startswith("stage_latency_seconds_count"):
+            counts[stage] = int(float(value))
+    return {
+        stage: {"count": counts[stage], "mean_ms": 1000 * sums.get(stage, 0.0) / counts[stage]}
+        for stage in sorted(counts) if counts[stage]
+    }
+
+
+def compare(current: dict, baseline: dict, threshold: float):
+    """
+    Print p50/p95/p99/throughput deltas; returns the list of regressions.
+    """
+    regressions = []
+    print(f"\nComparison against baseline (threshold {threshold:.0%}):")
+    for section in ("endpoints", "pipelines"):
+        for name, cur in current.get(section, {}).items():
+            base = baseline.get(section, {}).get(name)
+            if not base or not cur.get("count") or not base.get("count"):
+                continue
+            for key in ("p50_ms", "p95_ms", "p99_ms", "throughput_rps"):
+                if key not in cur or key not in base or not base[key]:
+                    continue
+                change = cur[key] / base[key] - 1
+                worse = change < -threshold if key == "throughput_rps" else change > threshold
+                # tail percentiles of tiny samples are noisy: gate on p50/p95 and throughput
+                if worse and key != "p99_ms":
+                    regressions.append(f"{section}.{name}.{key}")
+                print(f"  {section[:-1]:<9} {name:<20} {key:<15} {base[key]:10.2f} -> {cur[key]:10.2f} "
+                      f"({change:+.1%}){'  REGRESSION' if worse and key != 'p99_ms' else ''}")
+    return regressions
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(args):
+    mix = {k: float(v) for k, v in (item.split("=") for item in args.mix)}
+    rng = random.Random(args.seed)
+
+    with tempfile.TemporaryDirectory(prefix="bench_api_") as tmp:
+        workdir = Path(args.workdir or tmp)
+        workdir.mkdir(parents=True, exist_ok=True)
+        configure_env(workdir, args)
+
+        from benchmarks.synthetic_data import tickers_for
+
+        tickers = tickers_for(args.tickers)
+        print(f"Setting up {args.tickers} tickers x {args.days} days in {workdir} ...")
+        setup = setup_data(args, tickers)
+        print(f"  {setup['price_history']:,} price rows, {setup['clean_news']:,} articles "
+              f"(populate {setup['populate_sec']:.1f}s, index {setup['build_vectorstore_sec']:.1f}s)")
+
+        pipelines = {}
+        if args.pipeline_iters:
+            print(f"Pipelines ({args.pipeline_iters} iterations each):")
+            pipelines = bench_pipelines(args.pipeline_iters, tickers, rng)
+
+        port = _free_port()
+        server = start_server(port, args.workers)
+        try:
+            print(f"Load: {args.concurrency} clients, mix {mix}, {args.warmup:.0f}s warmup + {args.duration:.0f}s ...")
+            endpoints, overall, metrics_text = asyncio.run(
+                drive_load(f"http://127.0.0.1:{port}", mix, args.concurrency, args.duration, args.warmup,
+                           rng, tickers, args.sentiment_repeat)
+            )
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+
+    for name, s in endpoints.items():
+        if s["count"]:
+            print(f"  {name:<10} n={s['count']:<6} {s['throughput_rps']:7.1f} req/s  p50={s['p50_ms']:8.2f}ms  "
+                  f"p95={s['p95_ms']:8.2f}ms  p99={s['p99_ms']:8.2f}ms  errors={s['errors']}  503/429={s['rejected']}")
+        else:
+            print(f"  {name:<10} no successful requests (errors={s['errors']}, 503/429={s['rejected']})")
+    print(f"  overall    {overall['throughput_rps']:.1f} req/s")
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "cpu_count": os.cpu_count(),
+            "args": {k: v for k, v in vars(args).items() if k not in ("out", "compare")},
+        },
+        "setup": setup,
+        "pipelines": pipelines,
+        "endpoints": endpoints,
+        "overall": overall,
+        # per uvicorn worker when --workers > 1 (each process keeps its own registry)
+        "stages": parse_stage_metrics(metrics_text),
+    }
+    if args.out:
+        Path(args.out).write_text(json.dumps(report, indent=2))
+        print(f"Wrote {args.out}")
+
+    if args.compare:
+        regressions = compare(report, json.loads(Path(args.compare).read_text()), args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+            sys.exit(1)
+        print("No regressions.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--warmup", type=float, default=3)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--mix", nargs="+", default=["predict=1", "sentiment=4", "retrieve=5"],
+                        help="endpoint=weight pairs")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--tickers", type=int, default=10)
+    parser.add_argument("--days", type=int, default=400)
+    parser.add_argument("--articles-per-day", type=float, default=3)
+    parser.add_argument("--llm-latency-ms", type=float, default=200)
+    parser.add_argument("--embed-latency-ms", type=float, default=30)
+    parser.add_argument("--sentiment-repeat", type=float, default=0.2,
+                        help="fraction of sentiment requests repeating an earlier article (cache hits)")
+    parser.add_argument("--vector-backend", choices=["chroma", "ann"], default="chroma")
+    parser.add_argument("--database-url", help="SQLAlchemy URL of a throwaway database (default: SQLite in the workdir)")
+    parser.add_argument("--workdir", help="keep the generated data here instead of a temp dir")
+    parser.add_argument("--pipeline-iters", type=int, default=20, help="0 skips the in-process pipeline timings")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--out", default="bench_api.json")
+    parser.add_argument("--compare", help="baseline JSON from an earlier run")
+    parser.add_argument("--threshold", type=float, default=0.10, help="relative change counted as a regression")
+    main(parser.parse_args())
@@ -0,0 +1,129 @@
+# benchmarks/bench_api_pools.py
+"""
+Load test: sync handlers on the shared threadpool vs async handlers with
+dedicated pools (src.executors), under a burst of slow retrieval calls.
+
+Requests beyond the admission budgets (src.security.admission) are shed
+with 503 and counted separately from the latency percentiles.
+
+Dependencies are faked (a blocking sleep for retrieval, a CPU loop for
+prediction) so it runs offline; requests go through the real routers.
+
+Usage:
+    PREDICT_POOL_KIND=thread python benchmarks/bench_api_pools.py --slow 200 --predict 40 --slow-sec 0.3
+"""
+
+import os
+import argparse
+import asyncio
+import time
+
+os.environ.setdefault("PREDICT_POOL_KIND", "thread")  # fakes are patched in-process
+
+import httpx
+import numpy as np
+from fastapi import APIRouter, Depends, FastAPI
+
+from app.routes import health, predict, retrieve
+from src.auth.api_key import API_KEY, verify_api_key
+
+HEADERS = {"X-API-KEY": API_KEY}
+
+
+def fake_retrieve(queries, k, filters, mode, slow_sec=0.3):
+    time.sleep(slow_sec)  # slow vector store / embedding provider
+    return [[{"id": "clean:1", "text": q, "metadata": {}, "distance": 0.0}] for q in queries]
+
+
+def fake_predict(ticker, cpu_iters=200000):
+    acc = 0
+    for i in range(cpu_iters):
+        acc += i * i
+    return {"ticker": ticker, "prediction": "UP", "confidence": 0.5, "date": "2024-01-01"}
+
+
+def sync_app(slow_sec: float) -> FastAPI:
+    """
+    The previous layout: plain `def` handlers sharing Starlette's threadpool.
+    """
+    router = APIRouter()
+
+    @router.get("/health")
+    def _health():
+        return {"status": "ok"}
+
+    @router.get("/api/v1/retrieve")
+    def _retrieve(query: str, k: int = 5, api_key: str = Depends(verify_api_key)):
+        return {"results": fake_retrieve([query], k, None, None, slow_sec)[0]}
+
+    @router.post("/api/v1/predict")
+    def _predict(req: predict.PredictRequest, api_key: str = Depends(verify_api_key)):
+        return fake_predict(req.ticker)
+
+    app = FastAPI()
+    app.include_router(router)
+    return app
+
+
+def pooled_app(slow_sec: float) -> FastAPI:
+    retrieve._retrieve = lambda queries, k, filters, mode: fake_retrieve(queries, k, filters, mode, slow_sec)
+    predict.predict_next_day = fake_predict
+    app = FastAPI()
+    app.include_router(health.router)
+    app.include_router(retrieve.router, prefix="/api/v1")
+    app.include_router(predict.router, prefix="/api/v1")
+    return app
+
+
+async def _timed(coro):
+    t0 = time.perf_counter()
+    r = await coro
+    if r.status_code not in (200, 503):
+        r.raise_for_status()
+    return time.perf_counter() - t0, r.status_code
+
+
+async def run(app: FastAPI, n_slow: int, n_predict: int, n_health: int):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=600) as client:
+        t0 = time.perf_counter()
+        slow = [asyncio.create_task(_timed(client.get("/api/v1/retrieve", params={"query": f"q{i}"}, headers=HEADERS)))
+                for i in range(n_slow)]
+        await asyncio.sleep(0.05)  # burst is in flight
+        preds = [asyncio.create_task(_timed(client.post("/api/v1/predict", json={"ticker": "RELIANCE.NS"}, headers=HEADERS)))
+                 for _ in range(n_predict)]
+        health_lat = []
+        for _ in range(n_health):
+            health_lat.append(await _timed(client.get("/health")))
+            await asyncio.sleep(0.01)
+        pred_lat = await asyncio.gather(*preds)
+        slow_lat = await asyncio.gather(*slow)
+        wall = time.perf_counter() - t0
+    return wall, health_lat, pred_lat, slow_lat
+
+
+def _line(name, results):
+    ms = np.array([lat for lat, code in results if code == 200]) * 1000
+    shed = sum(code == 503 for _, code in results)
+    return f"{name:<9} p50={np.percentile(ms, 50):8.1f}ms  p99={np.percentile(ms, 99):8.1f}ms  503s={shed}"
+
+
+def main(n_slow, n_predict, n_health, slow_sec):
+    for label, app in (("sync handlers (shared threadpool)", sync_app(slow_sec)),
+                       ("async handlers (dedicated pools)", pooled_app(slow_sec))):
+        wall, h, p, s = asyncio.run(run(app, n_slow, n_predict, n_health))
+        print(f"== {label}: {n_slow + n_predict + n_health} requests in {wall:.2f}s "
+              f"({(n_slow + n_predict + n_health) / wall:.0f} req/s)")
+        print("  " + _line("health", h))
+        print("  " + _line("predict", p))
+        print("  " + _line("retrieve", s))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--slow", type=int, default=200, help="Concurrent slow retrieval requests")
+    parser.add_argument("--predict", type=int, default=40)
+    parser.add_argument("--health", type=int, default=50)
+    parser.add_argument("--slow-sec", type=float, default=0.3)
+    args = parser.parse_args()
+    main(args.slow, args.predict, args.health, args.slow_sec)
@@ -0,0 +1,84 @@
+# benchmarks/bench_bm25.py
+"""
+Build time, load time and query latency of the BM25 index on synthetic articles.
+
+Usage:
+    python benchmarks/bench_bm25.py --n 1000000 --queries 500
+"""
+
+import argparse
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from src.bm25_index import BM25Index
+
+VOCAB = [f"w{i}" for i in range(50000)]
+TICKERS = [f"T{i}.NS" for i in range(200)]
+START = datetime(2020, 1, 1, tzinfo=timezone.utc)
+
+
+def _report(name, latencies):
+    lat_ms = np.array(latencies) * 1000
+    print(
+        f"  {name:<16} p50={np.percentile(lat_ms, 50):7.2f}ms  "
+        f"p95={np.percentile(lat_ms, 95):7.2f}ms  p99={np.percentile(lat_ms, 99):7.2f}ms"
+    )
+
+
+def main(n: int, queries: int, words: int, k: int, chunk: int = 100000):
+    rng = random.Random(42)
+    # zipf-like term frequencies, like real text
+    cum_weights = list(np.cumsum([1.0 / (i + 1) for i in range(len(VOCAB))]))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        idx = BM25Index(tmp)
+        start = time.perf_counter()
+        for lo in range(0, n, chunk):
+            hi = min(n, lo + chunk)
+            texts = [" ".join(rng.choices(VOCAB, cum_weights=cum_weights, k=words)) for _ in range(lo, hi)]
+            idx.add_many(
+                [f"clean:{i}" for i in range(lo, hi)],
+                texts,
+                [rng.choice(TICKERS) for _ in range(lo, hi)],
+                [START + timedelta(minutes=i) for i in range(lo, hi)],
+            )
+            print(f"  added {hi:,} docs ({hi / (time.perf_counter() - start):,.0f} docs/s)")
+        idx.save()
+        elapsed = time.perf_counter() - start
+        print(f"Indexed + saved {n:,} docs in {elapsed:.1f}s; {len(idx.vocab):,} terms, {len(idx.post_docs):,} postings")
+
+        t0 = time.perf_counter()
+        idx = BM25Index(tmp)
+        print(f"Load: {time.perf_counter() - t0:.2f}s")
+
+        # mid/low frequency terms, like ticker symbols and names in real queries
+        probes = [" ".join(rng.choices(VOCAB[50:20000], k=rng.randint(2, 4))) for _ in range(queries)]
+        mid = int((START + timedelta(minutes=n // 2)).timestamp())
+        cases = {
+            "no filter": {},
+            "ticker": {"tickers": [TICKERS[0]]},
+            "date range": {"start_ts": mid, "end_ts": mid + 7 * 24 * 3600},
+            "ticker + date": {"tickers": [TICKERS[0]], "start_ts": mid - 90 * 24 * 3600, "end_ts": mid},
+        }
+        print(f"Query latency (k={k}, {queries} queries):")
+        for name, filters in cases.items():
+            latencies = []
+            for q in probes:
+                t0 = time.perf_counter()
+                idx.search(q, k=k, **filters)
+                latencies.append(time.perf_counter() - t0)
+            _report(name, latencies)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n", type=int, default=1000000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--words", type=int, default=60)
+    parser.add_argument("--k", type=int, default=20)
+    args = parser.parse_args()
+    main(args.n, args.queries, args.words, args.k)
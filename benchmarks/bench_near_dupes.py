@@ -0,0 +1,70 @@
+# benchmarks/bench_near_dupes.py
+"""
+Insert/lookup latency of the MinHash/LSH near-duplicate index on synthetic articles.
+
+Usage:
+    python benchmarks/bench_near_dupes.py --n 1000000 --queries 2000
+"""
+
+import argparse
+import random
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from src.cleaning import NearDuplicateIndex
+
+VOCAB = [f"w{i}" for i in range(20000)]
+
+
+def synthetic_article(rng: random.Random, words: int = 80) -> str:
+    return " ".join(rng.choices(VOCAB, k=words))
+
+
+def main(n: int, queries: int, commit_every: int = 10000):
+    rng = random.Random(42)
+    with tempfile.TemporaryDirectory() as tmp:
+        idx = NearDuplicateIndex(path=Path(tmp) / "bench.sqlite")
+
+        start = time.perf_counter()
+        samples = []
+        for i in range(1, n + 1):
+            text = synthetic_article(rng)
+            idx.add(i, text)
+            if i % max(1, n // queries) == 0:
+                samples.append(text)
+            if i % commit_every == 0:
+                idx.commit()
+                print(f"  indexed {i:,} docs ({i / (time.perf_counter() - start):,.0f} docs/s)")
+        idx.commit()
+        elapsed = time.perf_counter() - start
+        print(f"Indexed {n:,} docs in {elapsed:.1f}s ({n / elapsed:,.0f} docs/s)")
+
+        # near-duplicate probes: drop one word from an indexed article
+        latencies = []
+        hits = 0
+        for text in samples[:queries]:
+            words = text.split()
+            del words[rng.randrange(len(words))]
+            t0 = time.perf_counter()
+            match = idx.query(" ".join(words))
+            latencies.append(time.perf_counter() - t0)
+            hits += match is not None
+
+        lat_ms = np.array(latencies) * 1000
+        print(f"Lookups: {len(lat_ms)}  recall: {hits / max(1, len(lat_ms)):.3f}")
+        print(
+            f"Lookup latency ms  p50={np.percentile(lat_ms, 50):.3f}  "
+            f"p95={np.percentile(lat_ms, 95):.3f}  p99={np.percentile(lat_ms, 99):.3f}"
+        )
+        idx.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=1000)
+    args = parser.parse_args()
+    main(args.n, args.queries)
@@ -0,0 +1,40 @@
+# benchmarks/bench_sentiment_async.py
+"""
+Offline throughput of the async sentiment path against the stub provider.
+
+Usage:
+    SENTIMENT_STUB_LATENCY_SEC=0.2 python benchmarks/bench_sentiment_async.py --n 500 --concurrency 1 16 64
+"""
+
+import argparse
+import asyncio
+import time
+
+from src.sentiment_chain import classify_many_async
+
+
+async def _run(n: int, concurrency: int, rate: float):
+    items = ((i, f"Company {i} shares rose on record profit", "") for i in range(n))
+    ok = 0
+    async for _, res, err in classify_many_async(
+        items, concurrency=concurrency, rate_per_sec=rate, provider="stub"
+    ):
+        ok += err is None
+    return ok
+
+
+def main(n: int, concurrencies, rate: float):
+    for c in concurrencies:
+        t0 = time.perf_counter()
+        ok = asyncio.run(_run(n, c, rate))
+        elapsed = time.perf_counter() - t0
+        print(f"concurrency={c:<4} items={ok:<6} elapsed={elapsed:.2f}s  throughput={ok / elapsed:,.1f}/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--rate", type=float, default=0, help="calls/sec, 0 = unlimited")
+    args = parser.parse_args()
+    main(args.n, args.concurrency, args.rate)
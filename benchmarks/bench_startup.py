@@ -0,0 +1,107 @@
+# benchmarks/bench_startup.py
+"""
+Cold-start cost of the API and CLI entry points, each measured in a fresh
+interpreter: per-module import time (python -X importtime) and time from
+interpreter start to the first served request.
+
+Usage:
+    python benchmarks/bench_startup.py --runs 5 --top 15
+    python benchmarks/bench_startup.py --modules app.main src.retriever scripts.query_retriever
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+FIRST_REQUEST = r"""
+import json, time
+t0 = time.perf_counter()
+from app.main import app
+t1 = time.perf_counter()
+from fastapi.testclient import TestClient
+with TestClient(app) as client:
+    status = client.get("/health").status_code
+t2 = time.perf_counter()
+print(json.dumps({"import": t1 - t0, "first_request": t2 - t0, "status": status}))
+"""
+
+
+def _env():
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [os.getcwd(), env.get("PYTHONPATH")]))
+    env.setdefault("API_KEY", "bench-key")
+    return env
+
+
+def import_times(module: str):
+    """
+    {module: (self_us, cumulative_us)} for one cold import of `module`.
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, env=_env(), check=True,
+    )
+    times = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        times[name.strip()] = (int(self_us), int(cumulative_us))
+    return times
+
+
+def report_imports(module: str, runs: int, top: int):
+    samples = defaultdict(list)
+    for _ in range(runs):
+        for name, (_, cumulative) in import_times(module).items():
+            samples[name].append(cumulative)
+    median_ms = {name: statistics.median(v) / 1000 for name, v in samples.items()}
+
+    print(f"\n{module}: {median_ms.get(module, 0.0):8.1f}ms total (median of {runs} cold imports)")
+    first_party = sorted(
+        (n for n in median_ms if n.split(".")[0] in ("app", "src", "scripts") and n != module),
+        key=median_ms.get, reverse=True,
+    )
+    print("  first-party modules (cumulative):")
+    for name in first_party[:top]:
+        print(f"    {name:<40} {median_ms[name]:8.1f}ms")
+    third_party = sorted(
+        (n for n in median_ms if "." not in n and n not in sys.stdlib_module_names and n not in ("app", "src", "scripts")),
+        key=median_ms.get, reverse=True,
+    )
+    print("  top-level third-party packages (cumulative):")
+    for name in third_party[:top]:
+        print(f"    {name:<40} {median_ms[name]:8.1f}ms")
+
+
+def report_first_request(runs: int):
+    results = []
+    for _ in range(runs):
+        proc = subprocess.run(
+            [sys.executable, "-c", FIRST_REQUEST], capture_output=True, text=True, env=_env(), check=True,
+        )
+        results.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+    imp = statistics.median(r["import"] for r in results) * 1000
+    first = statistics.median(r["first_request"] for r in results) * 1000
+    print(f"\napp.main time to first request (GET /health -> {results[0]['status']}), median of {runs}:")
+    print(f"  import app.main   {imp:8.1f}ms")
+    print(f"  first response    {first:8.1f}ms")
+
+
+def main(modules, runs, top):
+    for module in modules:
+        report_imports(module, runs, top)
+    report_first_request(runs)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--modules", nargs="+", default=["app.main", "src.retriever", "src.sentiment_chain"])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+    main(args.modules, args.runs, args.top)
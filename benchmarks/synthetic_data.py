@@ -0,0 +1,136 @@
+# benchmarks/synthetic_data.py
+"""
+Synthetic market data for offline benchmarks: price paths, news articles,
+daily sentiment and a small price model, written through the app's own
+schema so every pipeline reads them unchanged.
+
+Works on any SQLAlchemy URL (SQLite file or a throwaway Postgres).
+"""
+
+import random
+from datetime import datetime, timedelta
+
+import numpy as np
+from sqlalchemy import insert
+
+from src.schema import Base, CleanNews, DailySentiment, PriceHistory, RawNews
+
+COMPANIES = [
+    "Reliance", "Tata Motors", "Infosys", "HDFC Bank", "ICICI Bank", "Wipro", "Bharti Airtel",
+    "Larsen", "Maruti", "Sun Pharma", "Asian Paints", "Titan", "Bajaj Finance", "ITC", "Adani Ports",
+]
+POSITIVE = ["surge", "record profit", "beat estimates", "upgrade", "strong growth", "rally", "order win"]
+NEGATIVE = ["fall", "loss", "miss estimates", "downgrade", "probe", "weak demand", "margin cut"]
+NEUTRAL = ["board meeting", "AGM", "management commentary", "quarterly update", "stake sale", "guidance"]
+TOPICS = [
+    "crude oil", "monsoon", "interest rates", "rupee", "exports", "capex", "EV launch", "5G rollout",
+    "steel prices", "credit growth", "IT spending", "retail demand", "fund raise", "dividend", "buyback",
+]
+SOURCES = ["moneycontrol", "economictimes", "livemint", "business-standard", "reuters"]
+
+
+def tickers_for(n: int):
+    names = [c.split()[0].upper() for c in COMPANIES]
+    return [f"{names[i % len(names)]}{'' if i < len(names) else i}.NS" for i in range(n)]
+
+
+def company_of(ticker: str) -> str:
+    base = ticker.split(".")[0].rstrip("0123456789")
+    return next((c for c in COMPANIES if c.split()[0].upper() == base), base.title())
+
+
+def make_article(rng: random.Random, ticker: str):
+    """
+    (title, body, compound) with the tone embedded in the words.
+    """
+    tone = rng.choices((1, -1, 0), weights=(0.4, 0.35, 0.25))[0]
+    phrase = rng.choice(POSITIVE if tone > 0 else NEGATIVE if tone < 0 else NEUTRAL)
+    company, topic = company_of(ticker), rng.choice(TOPICS)
+    title = f"{company} shares {phrase} as {topic} in focus"
+    body = " ".join(
+        [
+            f"{company} ({ticker}) reported {phrase} on {topic}.",
+            f"Analysts tracking {rng.choice(TOPICS)} and {rng.choice(TOPICS)} expect volatility.",
+            f"Ref {rng.randrange(10**6)}.",
+        ]
+    )
+    compound = max(-1.0, min(1.0, tone * rng.uniform(0.2, 0.9) + rng.gauss(0, 0.1)))
+    return title, body, compound
+
+
+def make_query(rng: random.Random, tickers):
+    company = company_of(rng.choice(tickers))
+    return f"{company} {rng.choice(POSITIVE + NEGATIVE + NEUTRAL)} {rng.choice(TOPICS)}"
+
+
+def price_path(rng: np.random.Generator, days: int, start: float = 1000.0):
+    # geometric brownian motion with a little drift
+    returns = rng.normal(0.0004, 0.018, days)
+    close = start * np.exp(np.cumsum(returns))
+    open_ = close * np.exp(rng.normal(0, 0.005, days))
+    high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.006, days)))
+    low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.006, days)))
+    volume = rng.lognormal(13, 0.4, days)
+    return open_, high, low, close, volume
+
+
+def populate(engine, tickers, days: int, articles_per_day: float, seed: int = 7, chunk: int = 5000):
+    """
+    Create the schema and fill price_history, raw_news / clean_news and
+    daily_sentiment ('vader-v1'). Returns row counts.
+    """
+    Base.metadata.create_all(bind=engine)
+    rng, nprng = random.Random(seed), np.random.default_rng(seed)
+    end = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    dates = [end - timedelta(days=days - 1 - i) for i in range(days)]
+
+    prices, raw, clean, daily = [], [], [], []
+    news_id = 0
+    for ticker in tickers:
+        o, h, l, c, v = price_path(nprng, days, start=float(nprng.uniform(100, 3000)))
+        for i, d in enumerate(dates):
+            prices.append(
+                {"ticker": ticker, "date": d, "open": float(o[i]), "high": float(h[i]), "low": float(l[i]),
+                 "close": float(c[i]), "adj_close": float(c[i]), "volume": float(v[i])}
+            )
+            n = int(nprng.poisson(articles_per_day))
+            scores = []
+            for _ in range(n):
+                news_id += 1
+                title, body, compound = make_article(rng, ticker)
+                published = d + timedelta(minutes=rng.randrange(9 * 60, 18 * 60))
+                raw.append({"id": news_id, "url": f"https://example.com/{news_id}", "title": title, "body": body,
+                            "published_at": published, "source": rng.choice(SOURCES)})
+                clean.append({"id": news_id, "raw_id": news_id, "ticker": ticker, "title": title, "body": body,
+                              "published_at": published})
+                scores.append(compound)
+            if scores:
+                daily.append(
+                    {"ticker": ticker, "date": d, "avg_compound": float(np.mean(scores)), "article_count": len(scores),
+                     "pct_positive": sum(s > 0.05 for s in scores) / len(scores),
+                     "pct_negative": sum(s < -0.05 for s in scores) / len(scores), "model_version": "vader-v1"}
+                )
+
+    with engine.begin() as conn:
+        for table, rows in ((PriceHistory, prices), (RawNews, raw), (CleanNews, clean), (DailySentiment, daily)):
+            for i in range(0, len(rows), chunk):
+                conn.execute(insert(table), rows[i:i + chunk])
+    return {"price_history": len(prices), "clean_news": len(clean), "daily_sentiment": len(daily)}
+
+
+def train_price_model(path, ticker: str, n_estimators: int = 50):
+    """
+    Fit a small RandomForest on one ticker's synthetic features and save it
+    where src.predict_price loads it (PRICE_MODEL_PATH).
+    """
+    import joblib
+    from sklearn.ensemble import RandomForestClassifier
+
+    from src.features import make_features
+    from src.predict_price import FEATURE_COLUMNS
+
+    df = make_features(ticker)
+    model = RandomForestClassifier(n_estimators=n_estimators, max_depth=6, random_state=0, n_jobs=1)
+    model.fit(df[FEATURE_COLUMNS].values, df["target_class"].values)
+    joblib.dump(model, path)
+    return len(df)
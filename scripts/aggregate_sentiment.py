@@ -1,69 +1,144 @@
 # scripts/aggregate_sentiment.py
-from sqlalchemy.orm import Session
-from sqlalchemy import func
-from src.db import SessionLocal
-from src.schema import SentimentScore, DailySentiment
-import argparse
+"""
+Incrementally aggregate sentiment_scores into daily_sentiment (PostgreSQL).
 
+- Days are buckets of published_at in the exchange timezone (EXCHANGE_TIMEZONE)
+- Only (ticker, day) keys touched by sentiment_scores rows newer than the last run's
+  high-water mark are recomputed, in one INSERT ... SELECT ... ON CONFLICT DO UPDATE
+- The mark only moves to a settled id (src.watermarks.settled_max_id): the run
+  waits for transactions that could still commit sentiment_scores ids at or
+  below it, so a row whose id was assigned before a run but committed after it
+  is never left below the mark. If they do not finish within
+  WATERMARK_SETTLE_TIMEOUT_SEC the visible rows are aggregated and the mark
+  stays put (recomputing a day is idempotent)
+- The high-water mark moves in the same transaction as the upsert
+"""
 
-def aggregate_sentiment(model_version: str):
-    session: Session = SessionLocal()
-
-    q = (
-        session.query(
-            SentimentScore.ticker,
-            func.date(SentimentScore.created_at).label("date"),
-            func.avg(SentimentScore.compound).label("avg_compound"),
-            func.count(SentimentScore.id).label("article_count"),
-            func.avg(
-                func.case((SentimentScore.label == "positive", 1), else_=0)
-            ).label("pct_positive"),
-            func.avg(
-                func.case((SentimentScore.label == "negative", 1), else_=0)
-            ).label("pct_negative"),
-        )
-        .filter(SentimentScore.model_version == model_version)
-        .group_by(
-            SentimentScore.ticker,
-            func.date(SentimentScore.created_at),
-        )
+import argparse
+import time
+from sqlalchemy import text
+from src.config import EXCHANGE_TIMEZONE
+from src.db import engine
+from src.schema import Base
+from src.watermarks import get_watermark, set_watermark, settled_max_id
+
+# published_at is stored as naive UTC
+_UPSERT_SQL = text(
+    """
+    WITH touched AS (
+        SELECT DISTINCT
+            ticker,
+            (published_at AT TIME ZONE 'UTC' AT TIME ZONE :tz)::date AS day
+        FROM sentiment_scores
+        WHERE model_version = :model_version
+          AND id > :last_id AND id <= :max_id
+          AND ticker IS NOT NULL
+          AND published_at IS NOT NULL
+    ),
+    bounds AS (
+        SELECT
+            ticker,
+            day,
+            (day::timestamp AT TIME ZONE :tz) AT TIME ZONE 'UTC' AS start_utc,
+            ((day + 1)::timestamp AT TIME ZONE :tz) AT TIME ZONE 'UTC' AS end_utc
+        FROM touched
+    )
+    INSERT INTO daily_sentiment (
+        ticker, date, avg_compound, article_count, pct_positive, pct_negative,
+        model_version, computed_at
     )
+    SELECT
+        b.ticker,
+        b.day,
+        AVG(s.compound),
+        COUNT(*),
+        AVG(CASE WHEN s.label = 'positive' THEN 1.0 ELSE 0.0 END),
+        AVG(CASE WHEN s.label = 'negative' THEN 1.0 ELSE 0.0 END),
+        :model_version,
+        now()
+    FROM bounds b
+    JOIN sentiment_scores s
+      ON s.ticker = b.ticker
+     AND s.published_at >= b.start_utc
+     AND s.published_at < b.end_utc
+    WHERE s.model_version = :model_version
+    GROUP BY b.ticker, b.day
+    ON CONFLICT (ticker, date, model_version) DO UPDATE SET
+        avg_compound = EXCLUDED.avg_compound,
+        article_count = EXCLUDED.article_count,
+        pct_positive = EXCLUDED.pct_positive,
+        pct_negative = EXCLUDED.pct_negative,
+        computed_at = EXCLUDED.computed_at
+    """
+)
+
+# daily_sentiment used to be unique on (ticker, date) only
+_MIGRATE_UNIQUE_KEY_SQL = [
+    "ALTER TABLE daily_sentiment DROP CONSTRAINT IF EXISTS uix_ticker_date_daily",
+    "CREATE UNIQUE INDEX IF NOT EXISTS uix_ticker_date_model_daily "
+    "ON daily_sentiment (ticker, date, model_version)",
+]
 
-    rows = q.all()
-
-    for r in rows:
-        record = (
-            session.query(DailySentiment)
-            .filter(
-                DailySentiment.ticker == r.ticker,
-                DailySentiment.date == r.date,
-                DailySentiment.model_version == model_version,
-            )
-            .first()
-        )
 
-        if not record:
-            record = DailySentiment(
-                ticker=r.ticker,
-                date=r.date,
-                model_version=model_version,
-            )
+def ensure_schema():
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        for stmt in _MIGRATE_UNIQUE_KEY_SQL:
+            conn.execute(text(stmt))
 
-        record.avg_compound = r.avg_compound
-        record.article_count = r.article_count
-        record.pct_positive = r.pct_positive
-        record.pct_negative = r.pct_negative
 
-        session.add(record)
+def watermark_name(model_version: str) -> str:
+    return f"aggregate_sentiment:{model_version}"
 
-    session.commit()
-    session.close()
-    print(f"Aggregated sentiment for model_version={model_version}")
+
+def aggregate_sentiment(model_version: str, full: bool = False):
+    ensure_schema()
+    name = watermark_name(model_version)
+    start = time.time()
+
+    with engine.begin() as conn:
+        last_id = 0 if full else get_watermark(conn, name)
+        # reads only until here: settled_max_id waits on other transactions
+        mv = {"mv": model_version}
+        max_id = settled_max_id(conn, "sentiment_scores", "model_version = :mv", mv)
+        settled = max_id is not None
+        if not settled:
+            max_id = conn.execute(
+                text("SELECT COALESCE(MAX(id), 0) FROM sentiment_scores WHERE model_version = :mv"), mv
+            ).scalar()
+            print("Transactions writing sentiment_scores are still open; the mark stays at", last_id)
+
+        if max_id == 0:
+            print(f"No sentiment_scores for model_version={model_version}")
+            return 0
+        if max_id <= last_id:
+            print(f"No new sentiment_scores for model_version={model_version} above id {last_id}")
+            return 0
+
+        res = conn.execute(
+            _UPSERT_SQL,
+            {
+                "tz": EXCHANGE_TIMEZONE,
+                "model_version": model_version,
+                "last_id": last_id,
+                "max_id": max_id,
+            },
+        )
+        if settled:
+            set_watermark(conn, name, max_id)
+
+    print(
+        f"Aggregated sentiment for model_version={model_version}: "
+        f"{res.rowcount} (ticker, day) rows upserted, ids ({last_id}, {max_id}] "
+        f"in {time.time() - start:.2f}s"
+    )
+    return res.rowcount
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--model-version", required=True)
+    parser.add_argument("--full", action="store_true", help="Ignore the watermark and recompute every (ticker, day)")
     args = parser.parse_args()
 
-    aggregate_sentiment(args.model_version)
+    aggregate_sentiment(args.model_version, full=args.full)
@@ -0,0 +1,20 @@
+# scripts/build_sentiment_features.py
+"""
+Extend the materialized rolling sentiment layer (sentiment_features) with new days.
+Run after scripts/aggregate_sentiment.py.
+"""
+
+import argparse
+import time
+from src.sentiment_features import materialize_sentiment_features
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model-version", required=True)
+    parser.add_argument("--ticker", default=None)
+    args = parser.parse_args()
+
+    t0 = time.time()
+    n = materialize_sentiment_features(args.model_version, tickers=[args.ticker] if args.ticker else None)
+    print(f"Materialized {n} sentiment_features rows for model_version={args.model_version} "
+          f"in {time.time() - t0:.2f}s")
@@ -1,71 +1,236 @@
 # scripts/build_vectorstore.py
 """
 Builds / updates Chroma vector store using Gemini embeddings.
+Embeddings are served from the persistent embedding cache when the text was seen before.
+
+Incremental by default:
+- clean_news is read in keyset pages (id > last_id) starting at the stored
+  high-water mark (pipeline_watermarks 'vectorstore:<collection>')
+- a reader thread fetches the next page while the current one is embedded and
+  upserted (bounded queue), and the mark advances after each upserted page
+- each run re-reads a trailing window of WATERMARK_RESCAN_IDS ids below the
+  mark (src.watermarks.rescan_from) to pick up rows committed late; rows in
+  that window are only re-embedded when they differ from the stored copy
+- --full rescans every row but only re-embeds documents whose content hash
+  differs from what the collection already holds, then moves the mark to the
+  last id it read
+
+The BM25 index (src.bm25_index) is built from the same pages. It records its
+own last indexed id and is saved every BM25_SAVE_EVERY pages; a run resumes
+from the lower of the two marks, so neither index falls behind the other.
 """
 
+import argparse
+import hashlib
+import queue
+import threading
+import time
 from sqlalchemy.orm import Session
-from src.db import SessionLocal
-from src.schema import CleanNews
-from src.vectorstore import get_collection
+from src.db import SessionLocal, engine
+from src.schema import Base, CleanNews, RawNews
+from src.vectorstore import get_collection, bump_collection_version
+from src.embeddings import embed_texts, get_embedding_provider, embedding_cache_stats
+from src.embedding_cache import get_embedding_cache
+from src.watermarks import get_watermark, rescan_from, set_watermark
+from src.bm25_index import get_bm25_index
+from src.metadata_filters import to_timestamp
 
 BATCH_SIZE = 100
-
-
-def build_vectorstore():
+PREFETCH_PAGES = 2
+QUEUE_PUT_TIMEOUT = 1.0
+BM25_SAVE_EVERY = 50
+COLLECTION_NAME = "news"
+
+_END = object()
+
+
+def document_text(title, body):
+    return f"{title or ''}\n\n{body or ''}".strip()
+
+
+def content_hash(text):
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def document_metadata(row, source, text):
+    meta = {
+        "clean_id": row.id,
+        "ticker": row.ticker,
+        "source": source,
+        # epoch seconds so published_at range filters work ($gte / $lte)
+        "published_at": to_timestamp(row.published_at),
+        "title": row.title,
+        "content_hash": content_hash(text),
+    }
+    # chroma metadata values must be str/int/float/bool
+    return {k: v for k, v in meta.items() if v is not None}
+
+
+def _put(out_q, item, stop) -> bool:
+    """
+    Put into the bounded queue, giving up once the consumer has stopped.
+    """
+    while not stop.is_set():
+        try:
+            out_q.put(item, timeout=QUEUE_PUT_TIMEOUT)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+
+def _read_pages(after_id, out_q, stop):
+    """
+    Producer: keyset-paginated reads of clean_news (+ raw_news.source) into out_q.
+    Stops when `stop` is set, even if the consumer no longer drains the queue.
+    """
     session: Session = SessionLocal()
-    collection = get_collection(name="news")
-
-    offset = 0
-    total_added = 0
-
-    while True:
-        rows = (
-            session.query(CleanNews)
-            .order_by(CleanNews.id)
-            .offset(offset)
-            .limit(BATCH_SIZE)
-            .all()
-        )
-
-        if not rows:
-            break
-
-        ids = []
-        documents = []
-        metadatas = []
-
-        for r in rows:
-            doc_id = f"clean:{r.id}"
-
-            text = f"{r.title}\n\n{r.body}".strip()
-            if not text:
-                continue
-
-            ids.append(doc_id)
-            documents.append(text)
-            metadatas.append(
-                {
-                    "clean_id": r.id,
-                    "ticker": r.ticker,
-                    "source": r.source,
-                    "published_at": r.published_at.isoformat() if r.published_at else None,
-                    "title": r.title,
-                }
-            )
-
-        if documents:
-            collection.add(
-                ids=ids,
-                documents=documents,
-                metadatas=metadatas,
+    try:
+        last_id = after_id
+        while not stop.is_set():
+            rows = (
+                session.query(CleanNews, RawNews.source)
+                .outerjoin(RawNews, RawNews.id == CleanNews.raw_id)
+                .filter(CleanNews.id > last_id)
+                .order_by(CleanNews.id)
+                .limit(BATCH_SIZE)
+                .all()
             )
-            total_added += len(documents)
-
-        offset += BATCH_SIZE
-
-    session.close()
-    print(f"Vectorstore build complete. Documents added: {total_added}")
+            if not rows:
+                break
+            last_id = rows[-1][0].id
+            if not _put(out_q, (rows, last_id), stop):
+                return
+    except Exception as ex:
+        _put(out_q, ex, stop)
+    finally:
+        session.close()
+        _put(out_q, _END, stop)
+
+
+def _changed_only(collection, ids, documents, metadatas):
+    """
+    Keep documents whose text or metadata differ from the stored copy
+    (metadata too, so --full also migrates metadata format changes).
+    """
+    existing = collection.get(ids=ids, include=["metadatas"])
+    known = dict(zip(existing.get("ids", []), existing.get("metadatas") or []))
+    keep = [i for i, doc_id in enumerate(ids) if known.get(doc_id) != metadatas[i]]
+    return [ids[i] for i in keep], [documents[i] for i in keep], [metadatas[i] for i in keep]
+
+
+def build_vectorstore(compact_cache=False, full=False):
+    Base.metadata.create_all(bind=engine)
+    collection = get_collection(name=COLLECTION_NAME)
+    mark_name = f"vectorstore:{COLLECTION_NAME}"
+    bm25 = get_bm25_index(COLLECTION_NAME)
+
+    with engine.begin() as conn:
+        mark = get_watermark(conn, mark_name)
+    resume_id = min(mark, bm25.last_id)
+    start_id = 0 if full else rescan_from(resume_id)
+    print(f"Building vectorstore from clean_news.id > {start_id} ({'full rescan' if full else 'incremental'})")
+
+    pages: queue.Queue = queue.Queue(maxsize=PREFETCH_PAGES)
+    stop = threading.Event()
+    reader = threading.Thread(target=_read_pages, args=(start_id, pages, stop), daemon=True)
+    reader.start()
+
+    total_seen = 0
+    total_upserted = 0
+    read_to = mark
+    pages_since_save = 0
+    t0 = time.time()
+    try:
+        while True:
+            item = pages.get()
+            if item is _END:
+                break
+            if isinstance(item, Exception):
+                raise item
+            rows, last_id = item
+
+            ids, documents, metadatas, page_rows = [], [], [], []
+            for r, source in rows:
+                text = document_text(r.title, r.body)
+                if not text:
+                    continue
+                ids.append(f"clean:{r.id}")
+                documents.append(text)
+                metadatas.append(document_metadata(r, source, text))
+                page_rows.append(r)
+            total_seen += len(rows)
+
+            page_docs = list(zip(ids, documents, page_rows))
+            # rows at or below resume_id were indexed before (--full: all of them)
+            if ids and (full or rows[0][0].id <= resume_id):
+                ids, documents, metadatas = _changed_only(collection, ids, documents, metadatas)
+                changed = set(ids)
+                page_docs = [d for d in page_docs if d[0] in changed or d[0] not in bm25]
+
+            if page_docs:
+                bm25.add_many(
+                    [doc_id for doc_id, _, _ in page_docs],
+                    [text for _, text, _ in page_docs],
+                    [r.ticker for _, _, r in page_docs],
+                    [r.published_at for _, _, r in page_docs],
+                )
+            bm25.last_id = max(bm25.last_id, last_id)
+
+            if documents:
+                collection.upsert(
+                    ids=ids,
+                    documents=documents,
+                    metadatas=metadatas,
+                    embeddings=embed_texts(documents),
+                )
+                total_upserted += len(documents)
+                # invalidates cached retrieval results in API workers
+                bump_collection_version(COLLECTION_NAME)
+
+            pages_since_save += 1
+            if pages_since_save >= BM25_SAVE_EVERY:
+                bm25.save()
+                bump_collection_version(COLLECTION_NAME)
+                pages_since_save = 0
+
+            read_to = max(read_to, last_id)
+            if not full:
+                with engine.begin() as conn:
+                    set_watermark(conn, mark_name, read_to)
+
+            elapsed = time.time() - t0
+            print(f"  up to id={last_id}: {total_seen} rows read, {total_upserted} upserted "
+                  f"({total_seen / elapsed if elapsed else 0:.1f} docs/s)")
+    finally:
+        stop.set()
+        if pages_since_save:
+            bm25.save()
+            bump_collection_version(COLLECTION_NAME)
+
+    if full:
+        with engine.begin() as conn:
+            set_watermark(conn, mark_name, read_to)
+
+    elapsed = time.time() - t0
+    print(f"Vectorstore build complete. Documents upserted: {total_upserted} of {total_seen} read "
+          f"in {elapsed:.1f}s ({total_seen / elapsed if elapsed else 0:.1f} docs/s)")
+    print(f"BM25 index: {len(bm25)} documents, {len(bm25.vocab)} terms")
+
+    stats = embedding_cache_stats()
+    if stats:
+        print(f"Embedding cache: {stats['hits']} hits, {stats['misses']} misses "
+              f"(hit rate {stats['hit_rate']:.1%}), {stats['entries']} entries")
+    if compact_cache:
+        cache = get_embedding_cache(get_embedding_provider().cache_key)
+        if cache is not None:
+            print(f"Embedding cache compacted: {cache.compact()} rows dropped")
+    return total_upserted
 
 
 if __name__ == "__main__":
-    build_vectorstore()
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--full", action="store_true", help="Rescan all rows, re-embedding only changed documents")
+    parser.add_argument("--compact-cache", action="store_true", help="Rewrite the embedding cache without superseded rows")
+    args = parser.parse_args()
+    build_vectorstore(compact_cache=args.compact_cache, full=args.full)
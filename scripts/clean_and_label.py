@@ -1,7 +1,14 @@
 # scripts/clean_and_label.py
 """
-Load rows from raw_news (DB) and/or data/raw_news_sample.csv, clean, dedupe,
-map tickers, label sentiment (VADER), and write to clean_news and sentiment_scores.
+Load rows from raw_news (DB) and/or data/raw_news_sample.csv, clean, dedupe
+(exact within the batch, near-duplicate across runs via MinHash/LSH), map tickers,
+label sentiment (VADER), and write to clean_news and sentiment_scores.
+
+Each raw_news row is cleaned at most once: rows that already have clean_news
+rows (from an earlier run or the intraday stream, scripts/stream_news.py) are
+skipped. --from-db reads raw_news above the 'clean:raw_news' high-water mark,
+re-reading a trailing WATERMARK_RESCAN_IDS window for late commits
+(src.watermarks.rescan_from); --full ignores the mark.
 """
 
 import csv
@@ -11,18 +18,22 @@ from typing import List
 import argparse
 
 from src.config import DATA_DIR
+from sqlalchemy import func
 from src.db import SessionLocal, engine
 from src.schema import Base, RawNews, CleanNews, SentimentScore
+from src.watermarks import get_watermark, rescan_from, set_watermark
 from src.cleaning import (
     strip_html,
     normalize_timestamp,
     dedupe_records,
     map_tickers,
     label_sentiment,
+    get_near_dup_index,
 )
 
 DATA_DIR.mkdir(parents=True, exist_ok=True)
 RAW_NEWS_CSV = DATA_DIR / "raw_news_sample.csv"
+MARK_NAME = "clean:raw_news"
 
 def create_tables():
     Base.metadata.create_all(bind=engine)
@@ -43,29 +54,43 @@ def load_csv_rows(csv_path: Path):
             )
     return rows
 
-def fetch_rawnews_from_db(session):
-    return session.query(RawNews).all()
+def fetch_rawnews_from_db(session, after_id: int = 0):
+    """
+    raw_news rows above after_id that have no clean_news rows yet.
+    """
+    cleaned = session.query(CleanNews.id).filter(CleanNews.raw_id == RawNews.id).exists()
+    return (
+        session.query(RawNews)
+        .filter(RawNews.id > after_id, ~cleaned)
+        .order_by(RawNews.id)
+        .all()
+    )
+
+def is_cleaned(session, raw_id: int) -> bool:
+    return session.query(CleanNews.id).filter(CleanNews.raw_id == raw_id).first() is not None
 
 def process_and_store(rows):
     session = SessionLocal()
     inserted_clean = 0
     inserted_sent = 0
+    skipped_near_dup = 0
+    skipped_cleaned = 0
+    near_dups = get_near_dup_index()
 
     # dedupe incoming batch first (CSV-level)
     rows = dedupe_records(rows)
 
     for r in rows:
-        raw_id = None
+        raw_id = r.get("raw_id")  # set for rows read from raw_news
         # If raw news exists in DB already, we may want raw_id mapping. We'll try to insert into raw_news if not present.
         try:
+            existing = None
             # find if raw exists by url (if url present)
-            if r.get("url"):
+            if raw_id is None and r.get("url"):
                 existing = session.query(RawNews).filter(RawNews.url == r["url"]).first()
-            else:
-                existing = None
             if existing:
                 raw_id = existing.id
-            else:
+            elif raw_id is None:
                 rn = RawNews(
                     url=r.get("url"),
                     title=r.get("title") or "",
@@ -81,10 +106,22 @@ def process_and_store(rows):
             # skip problematic row
             continue
 
+        # already cleaned by an earlier run or the intraday stream
+        if is_cleaned(session, raw_id):
+            skipped_cleaned += 1
+            continue
+
         # Clean text
         clean_title = strip_html(r.get("title") or "")
         clean_body = strip_html(r.get("body") or "")
 
+        # Syndicated copies of an already-seen story keep their raw row but are not
+        # cleaned/labeled again (they would inflate article_count and LLM/embedding work)
+        cluster_id = near_dups.add(raw_id, clean_title + " " + clean_body)
+        if cluster_id != raw_id:
+            skipped_near_dup += 1
+            continue
+
         # Map tickers (may return many; we store one CleanNews per matched ticker or as ticker=NULL)
         tickers = map_tickers(clean_title + " " + clean_body)
         if not tickers:
@@ -132,19 +169,26 @@ def process_and_store(rows):
                 session.rollback()
                 continue
 
+    near_dups.commit()
     session.close()
     print(f"Inserted {inserted_clean} clean_news rows and {inserted_sent} sentiment_scores rows.")
+    print(f"Skipped {skipped_near_dup} near-duplicate articles, {skipped_cleaned} already cleaned.")
+    return inserted_clean
 
-def main(use_db: bool, csv_path: Path):
+def main(use_db: bool, csv_path: Path, full: bool = False):
     create_tables()
     rows = []
+    max_raw_id = None
     if use_db:
         session = SessionLocal()
-        raws = fetch_rawnews_from_db(session)
+        mark = 0 if full else get_watermark(session.connection(), MARK_NAME)
+        max_raw_id = session.query(func.coalesce(func.max(RawNews.id), 0)).scalar()
+        raws = fetch_rawnews_from_db(session, rescan_from(mark))
         session.close()
         for r in raws:
             rows.append(
                 {
+                    "raw_id": r.id,
                     "url": r.url,
                     "title": r.title,
                     "body": r.body,
@@ -154,14 +198,22 @@ def main(use_db: bool, csv_path: Path):
             )
     if csv_path and csv_path.exists():
         rows.extend(load_csv_rows(csv_path))
-    if not rows:
+    inserted = 0
+    if rows:
+        inserted = process_and_store(rows)
+    elif use_db:
+        print("No new raw_news rows to clean.")
+    else:
         print("No rows to process. Provide --from-db or --csv data.")
-        return
-    process_and_store(rows)
+    if max_raw_id:
+        with engine.begin() as conn:
+            set_watermark(conn, MARK_NAME, max(max_raw_id, get_watermark(conn, MARK_NAME)))
+    return inserted
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--from-db", action="store_true", dest="from_db", help="Read raw_news from DB")
     parser.add_argument("--csv", dest="csv", default=str(RAW_NEWS_CSV), help="CSV file to load (default data/raw_news_sample.csv)")
+    parser.add_argument("--full", action="store_true", help="Ignore the raw_news high-water mark (rows already cleaned are still skipped)")
     args = parser.parse_args()
-    main(use_db=args.from_db, csv_path=Path(args.csv))
+    main(use_db=args.from_db, csv_path=Path(args.csv), full=args.full)
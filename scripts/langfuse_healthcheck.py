@@ -3,6 +3,6 @@ from src.observability.langfuse_client import get_langfuse
 
 if __name__ == "__main__":
     lf = get_langfuse()
-    with lf.trace(name="healthcheck") as trace:
-        trace.output = {"status": "ok"}
+    lf.trace(name="healthcheck", output={"status": "ok"})
+    lf.flush()
     print("Langfuse healthcheck successful")
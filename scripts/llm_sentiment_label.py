@@ -3,78 +3,293 @@
 Apply LLM sentiment classifier to clean_news rows and write results to sentiment_scores table.
 
 Behavior:
-- Iterates over clean_news rows (optionally filtered by ticker/date)
-- Calls src.sentiment_chain.classify_text for each item
-- Inserts SentimentScore rows with model_version 'llm-v1'
-- Skips items that already have a sentiment_scores entry with model_version 'llm-v1' unless --force
+- Streams clean_news rows (optionally filtered by ticker/date) in id order through a
+  server-side cursor; unless --force, rows already labeled for the model version are
+  excluded in the same query (anti-join on (clean_id, model_version))
+- Classifies items concurrently via src.sentiment_chain.classify_many_async
+  (bounded concurrency + rate limit + retries), optionally packing several
+  articles per prompt (--articles-per-call)
+- --provider hf runs the local transformer (HF_SENTIMENT_MODEL) on CPU: one worker,
+  no rate limit, windows of HF_SORT_WINDOW articles length-sorted into forward
+  passes of HF_BATCH_SIZE
+- Inserts SentimentScore rows in batches of --batch-size; model_version follows the
+  provider ('llm-v1' for Gemini, e.g. 'hf-finbert-v1', 'stub-v1'), so each provider's
+  labels are kept apart and the anti-join only skips rows that provider labeled
+- Checkpoints the highest clean_id below which everything is committed; an interrupted
+  run with the same arguments resumes from there (--restart ignores the checkpoint)
 """
 
 import argparse
+import asyncio
+import json
+import time
 from pathlib import Path
-from datetime import datetime
-from sqlalchemy import and_
+from sqlalchemy import and_, exists
 from src.db import SessionLocal, engine
 from src.schema import Base, CleanNews, SentimentScore
-from src.sentiment_chain import classify_text
+from src.sentiment_chain import (
+    classify_many_async,
+    batch_stats,
+    cache_stats,
+    model_version_for,
+    GEMINI_MODEL_VERSION,
+    SENTIMENT_LLM_PROVIDER,
+)
+from src.hf_sentiment import HF_SORT_WINDOW
 
 DATA_DIR = Path(__file__).parents[1] / "data"
+CHECKPOINT_FILE = DATA_DIR / "checkpoints" / "llm_sentiment_label.json"
+MODEL_VERSION = GEMINI_MODEL_VERSION
+STREAM_CHUNK = 1000
+PROGRESS_EVERY_SEC = 10
 
 def create_tables():
     Base.metadata.create_all(bind=engine)
 
-def already_labeled(session, clean_id, model_version="llm-v1"):
-    return session.query(SentimentScore).filter(SentimentScore.clean_id == clean_id, SentimentScore.model_version == model_version).first() is not None
+# -------------------------------------------------
+# Checkpoints
+# -------------------------------------------------
+def _run_signature(model_version, ticker, start, end, force):
+    return f"{model_version}|{ticker}|{start}|{end}|{int(bool(force))}"
 
-def run(ticker=None, start=None, end=None, force=False, limit=None):
-    create_tables()
-    session = SessionLocal()
-    q = session.query(CleanNews)
+def _read_checkpoints():
+    if CHECKPOINT_FILE.exists():
+        with open(CHECKPOINT_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return {}
+
+def load_checkpoint(signature):
+    return _read_checkpoints().get(signature)
+
+def save_checkpoint(signature, last_id):
+    data = _read_checkpoints()
+    if last_id is None:
+        data.pop(signature, None)
+    else:
+        data[signature] = last_id
+    CHECKPOINT_FILE.parent.mkdir(parents=True, exist_ok=True)
+    tmp = CHECKPOINT_FILE.with_suffix(".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+    tmp.replace(CHECKPOINT_FILE)
+
+class CommitWatermark:
+    """
+    Results complete out of order; the watermark is the highest id such that every
+    dispatched id <= it has been committed. Ids that failed (classification error or
+    a rolled-back write) hold it below themselves for the rest of the run, so a
+    resumed run (id > checkpoint) still sees them.
+    """
+
+    def __init__(self, start_id=0):
+        self._unresolved = set()
+        self._failed = set()
+        self._max_dispatched = start_id
+
+    def dispatched(self, clean_id):
+        self._unresolved.add(clean_id)
+        self._max_dispatched = max(self._max_dispatched, clean_id)
+
+    def resolved(self, clean_ids):
+        self._unresolved.difference_update(clean_ids)
+
+    def failed(self, clean_ids):
+        self._unresolved.difference_update(clean_ids)
+        self._failed.update(clean_ids)
+
+    @property
+    def value(self):
+        held = self._unresolved | self._failed
+        if held:
+            return min(held) - 1
+        return self._max_dispatched
+
+# -------------------------------------------------
+# Candidate selection
+# -------------------------------------------------
+def candidate_query(session, ticker=None, start=None, end=None, force=False, after_id=None,
+                    model_version=MODEL_VERSION):
+    q = session.query(
+        CleanNews.id,
+        CleanNews.raw_id,
+        CleanNews.ticker,
+        CleanNews.published_at,
+        CleanNews.title,
+        CleanNews.body,
+    )
     if ticker:
         q = q.filter(CleanNews.ticker == ticker)
     if start:
         q = q.filter(CleanNews.published_at >= start)
     if end:
         q = q.filter(CleanNews.published_at < end)
-    q = q.order_by(CleanNews.published_at.asc())
-    if limit:
-        q = q.limit(limit)
-    rows = q.all()
-    print(f"Found {len(rows)} clean_news rows to classify (ticker={ticker}, start={start}, end={end})")
+    if after_id:
+        q = q.filter(CleanNews.id > after_id)
+    if not force:
+        q = q.filter(
+            ~exists().where(
+                and_(
+                    SentimentScore.clean_id == CleanNews.id,
+                    SentimentScore.model_version == model_version,
+                )
+            )
+        )
+    return q
+
+# -------------------------------------------------
+# Labeling loop
+# -------------------------------------------------
+def _flush(session, pending):
+    if not pending:
+        return 0
+    try:
+        session.add_all(pending)
+        session.commit()
+        return len(pending)
+    except Exception as ex:
+        session.rollback()
+        print(f"Error writing batch of {len(pending)} rows: {ex}")
+        return 0
+    finally:
+        pending.clear()
+
+async def _label_rows(write_session, rows, signature, watermark, total, concurrency=None, rate=None,
+                      batch_size=100, provider=None, articles_per_call=None, token_budget=None,
+                      model_version=MODEL_VERSION):
+    meta = {}
+
+    def items():
+        for r in rows:
+            meta[r.id] = (r.raw_id, r.ticker, r.published_at)
+            watermark.dispatched(r.id)
+            yield r.id, r.title or "", r.body or ""
+
+    pending = []
     inserted = 0
-    for r in rows:
-        if not force and already_labeled(session, r.id, model_version="llm-v1"):
-            continue
-        try:
-            title = r.title or ""
-            body = r.body or ""
-            res = classify_text(title, body)
-            ss = SentimentScore(
-                clean_id=r.id,
-                raw_id=r.raw_id,
-                ticker=r.ticker,
-                published_at=r.published_at,
-                neg=None,
-                neu=None,
-                pos=None,
-                compound=None,
-                label=res.get("label"),
-                model_version="llm-v1",
+    failed = 0
+    done = 0
+    t0 = last_report = time.time()
+
+    async def flush():
+        nonlocal inserted
+        ids = [ss.clean_id for ss in pending]
+        if not ids:
+            return
+        written = await asyncio.to_thread(_flush, write_session, pending)
+        inserted += written
+        if written:
+            watermark.resolved(ids)
+        else:
+            watermark.failed(ids)  # rolled back: the anti-join picks them up next run
+        save_checkpoint(signature, watermark.value)
+
+    async for clean_id, res, err in classify_many_async(
+        items(), concurrency=concurrency, rate_per_sec=rate, provider=provider,
+        batch_size=articles_per_call, token_budget=token_budget,
+    ):
+        done += 1
+        raw_id, ticker, published_at = meta.pop(clean_id)
+        if err is not None:
+            failed += 1
+            watermark.failed([clean_id])
+            print(f"Error classifying clean_id={clean_id}: {err}")
+        else:
+            pending.append(
+                SentimentScore(
+                    clean_id=clean_id,
+                    raw_id=raw_id,
+                    ticker=ticker,
+                    published_at=published_at,
+                    neg=None,
+                    neu=None,
+                    pos=None,
+                    compound=None,
+                    label=res.get("label"),
+                    model_version=model_version,
+                )
             )
-            session.add(ss)
-            session.commit()
-            inserted += 1
-        except Exception as ex:
-            session.rollback()
-            print(f"Error classifying clean_id={r.id}: {ex}")
-    session.close()
-    print(f"Inserted {inserted} llm sentiment rows.")
+            if len(pending) >= batch_size:
+                await flush()
+
+        now = time.time()
+        if now - last_report >= PROGRESS_EVERY_SEC:
+            last_report = now
+            rate_now = done / (now - t0)
+            eta = (total - done) / rate_now if rate_now and total else 0
+            print(f"  {done}/{total} processed, {inserted} inserted, {failed} failed, "
+                  f"{rate_now:.1f} rows/s, ETA {eta:.0f}s, checkpoint id={watermark.value}")
+    await flush()
+    return inserted, failed
+
+def run(ticker=None, start=None, end=None, force=False, limit=None,
+        concurrency=None, rate=None, batch_size=100, provider=None, articles_per_call=None,
+        restart=False):
+    create_tables()
+    model_version = model_version_for(provider)
+    signature = _run_signature(model_version, ticker, start, end, force)
+    after_id = None if restart else load_checkpoint(signature)
+    if after_id:
+        print(f"Resuming from checkpoint: clean_id > {after_id}")
+
+    read_session = SessionLocal()
+    write_session = SessionLocal()
+    q = candidate_query(read_session, ticker=ticker, start=start, end=end, force=force, after_id=after_id,
+                        model_version=model_version)
+    total = q.count()
+    if limit:
+        total = min(total, limit)
+    print(f"Found {total} clean_news rows to classify for {model_version} "
+          f"(ticker={ticker}, start={start}, end={end})")
+
+    q = q.order_by(CleanNews.id.asc())
+    if limit:
+        q = q.limit(limit)
+    rows = q.execution_options(stream_results=True).yield_per(STREAM_CHUNK)
+
+    token_budget = None
+    if (provider or SENTIMENT_LLM_PROVIDER).lower() == "hf":
+        # CPU inference: parallelism comes from batching + intra-op threads, not extra workers
+        concurrency = concurrency or 1
+        rate = 0 if rate is None else rate
+        # one call = a window that classify_texts length-sorts into HF_BATCH_SIZE forward passes
+        articles_per_call = articles_per_call or HF_SORT_WINDOW
+        token_budget = 10 ** 9
+    t0 = time.time()
+    inserted, failed = asyncio.run(
+        _label_rows(write_session, rows, signature, CommitWatermark(after_id or 0), total,
+                    concurrency=concurrency, rate=rate, batch_size=batch_size, provider=provider,
+                    articles_per_call=articles_per_call, token_budget=token_budget,
+                    model_version=model_version)
+    )
+    elapsed = time.time() - t0
+    read_session.close()
+    write_session.close()
+    # completed: next run with the same arguments starts from the anti-join again
+    save_checkpoint(signature, None)
+    print(f"Inserted {inserted} {model_version} sentiment rows ({failed} failed) in {elapsed:.1f}s "
+          f"({inserted / elapsed if elapsed else 0:.1f} rows/s).")
+    stats = batch_stats()
+    if stats["calls"]:
+        print(f"Batched calls: {stats['calls']}, articles/call: {stats['articles_per_call']:.2f}, "
+              f"individual fallbacks: {stats['fallbacks']}")
+    cstats = cache_stats()
+    if cstats:
+        print(f"Cache hits: {cstats['hits']}, misses: {cstats['misses']}, hit rate: {cstats['hit_rate']:.1%}")
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--ticker", default=None)
     parser.add_argument("--start", default=None, help="YYYY-MM-DD")
     parser.add_argument("--end", default=None, help="YYYY-MM-DD (exclusive)")
-    parser.add_argument("--force", action="store_true", help="Recompute and overwrite existing llm-v1 entries")
+    parser.add_argument("--force", action="store_true", help="Recompute and overwrite the provider's existing entries")
     parser.add_argument("--limit", type=int, default=None)
+    parser.add_argument("--concurrency", type=int, default=None, help="Max in-flight LLM calls (default SENTIMENT_CONCURRENCY)")
+    parser.add_argument("--rate", type=float, default=None, help="Max LLM calls/sec, 0 = unlimited (default SENTIMENT_RATE_PER_SEC)")
+    parser.add_argument("--batch-size", type=int, default=100, help="Rows per DB commit")
+    parser.add_argument("--provider", default=None, help="gemini | hf | stub (default SENTIMENT_LLM_PROVIDER)")
+    parser.add_argument("--articles-per-call", type=int, default=None, help="Articles packed per LLM prompt (default SENTIMENT_BATCH_SIZE)")
+    parser.add_argument("--restart", action="store_true", help="Ignore any checkpoint from an interrupted run")
     args = parser.parse_args()
-    run(ticker=args.ticker, start=args.start, end=args.end, force=args.force, limit=args.limit)
+    run(ticker=args.ticker, start=args.start, end=args.end, force=args.force, limit=args.limit,
+        concurrency=args.concurrency, rate=args.rate, batch_size=args.batch_size, provider=args.provider,
+        articles_per_call=args.articles_per_call, restart=args.restart)
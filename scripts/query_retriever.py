@@ -4,7 +4,7 @@ Quick CLI to query the retriever (semantic search) and print top-k results.
 """
 
 import argparse
-from src.retriever import get_default_retriever
+from src.retriever import get_default_retriever, build_where
 from pprint import pprint
 
 def main():
@@ -12,12 +12,15 @@ def main():
     parser.add_argument("--q", "--query", dest="query", required=True)
     parser.add_argument("--k", dest="k", type=int, default=5)
     parser.add_argument("--ticker", dest="ticker", default=None, help="Optional ticker filter (exact match e.g. RELIANCE.NS)")
+    parser.add_argument("--after", dest="after", default=None, help="Only news published at/after this ISO datetime")
+    parser.add_argument("--before", dest="before", default=None, help="Only news published at/before this ISO datetime")
+    parser.add_argument("--mode", dest="mode", choices=["dense", "bm25", "hybrid"], default=None, help="Retrieval mode (default: RETRIEVER_MODE)")
     args = parser.parse_args()
 
     retriever = get_default_retriever(k=args.k)
-    filters = {"ticker": args.ticker} if args.ticker else None
-    docs = retriever.get_relevant_documents(args.query, k=args.k, filters=filters)
-    print(f"Found {len(docs)} documents (query='{args.query}', ticker={args.ticker})\n")
+    filters = build_where(args.ticker, args.after, args.before)
+    docs = retriever.get_relevant_documents(args.query, k=args.k, filters=filters, mode=args.mode)
+    print(f"Found {len(docs)} documents (query='{args.query}', ticker={args.ticker}, mode={args.mode or 'default'})\n")
     for i, d in enumerate(docs, start=1):
         print(f"--- RESULT {i} ---")
         print("ID:", d.get("id"))
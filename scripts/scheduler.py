@@ -1,37 +1,184 @@
 # scripts/scheduler.py
-from apscheduler.schedulers.blocking import BlockingScheduler
+"""
+Daily pipeline, run in-process by src.pipeline:
+
+    ingest -> clean -> aggregate ---------> features ---------> train -> predictions
+                    |-> aggregate_vader -> features_vader --/
+                    \\-> vectorstore
+
+aggregate/features cover PIPELINE_MODEL_VERSION; the *_vader stages cover the
+VADER labels written by clean_and_label.py and the intraday stream
+(scripts/stream_news.py). The stream keeps vader daily_sentiment current with
+running sums; aggregate_vader recomputes the touched days from sentiment_scores
+and so reconciles them every night.
+
+Stages whose inputs did not change since their last successful run are
+skipped; vectorstore runs alongside aggregate/features/train. Every stage
+outcome is recorded in pipeline_stage_runs.
+
+Usage:
+  PYTHONPATH=. python scripts/scheduler.py            # daily at 6 AM IST
+  PYTHONPATH=. python scripts/scheduler.py --once     # one run now
+  PYTHONPATH=. python scripts/scheduler.py --resume   # continue the last failed run
+  PYTHONPATH=. python scripts/scheduler.py --history
+"""
+
+import os
+import sys
+import argparse
 from datetime import datetime
-import subprocess
+from functools import partial
 
+from sqlalchemy import text
 
-def run_pipeline():
-    print("Starting daily pipeline:", datetime.utcnow())
+from src.db import engine
+from src.pipeline import Stage, run_pipeline, run_history, table_mark
 
-    subprocess.run(
-        ["python", "scripts/clean_and_label.py", "--from-db"],
-        check=True,
-    )
-    subprocess.run(
-        ["python", "scripts/aggregate_sentiment.py", "--model-version", "llm-gemini-v1"],
-        check=True,
-    )
-    subprocess.run(
-        ["python", "scripts/build_vectorstore.py"],
-        check=True,
-    )
-    subprocess.run(
-        ["python", "scripts/train_price_model.py"],
-        check=True,
+PIPELINE_MODEL_VERSION = os.getenv("PIPELINE_MODEL_VERSION", "llm-gemini-v1")
+PIPELINE_TICKERS = [t.strip() for t in os.getenv("PIPELINE_TICKERS", "RELIANCE.NS").split(",") if t.strip()]
+PIPELINE_PRICE_DAYS = int(os.getenv("PIPELINE_PRICE_DAYS", "60"))
+TRAIN_TICKER = PIPELINE_TICKERS[0]
+VADER_MODEL_VERSION = "vader-v1"  # clean_and_label.py / stream_news.py labels
+
+
+def _count(table: str) -> int:
+    with engine.connect() as conn:
+        return conn.execute(text(f"SELECT COUNT(*) FROM {table}")).scalar()
+
+
+def ingest():
+    from scripts.ingest_sample import (
+        RAW_NEWS_CSV,
+        create_tables,
+        fetch_price_history,
+        load_news_csv_to_db,
+        load_price_csv_to_db,
     )
 
-    print("Pipeline completed successfully")
+    create_tables()
+    before = _count("raw_news") + _count("price_history")
+    if RAW_NEWS_CSV.exists():
+        load_news_csv_to_db(RAW_NEWS_CSV)
+    for ticker in PIPELINE_TICKERS:
+        df = fetch_price_history(ticker, period_days=PIPELINE_PRICE_DAYS)
+        if df is not None:
+            load_price_csv_to_db(df)
+    return _count("raw_news") + _count("price_history") - before
+
+
+def clean():
+    from scripts.clean_and_label import main
+
+    return main(use_db=True, csv_path=None)
+
+
+def aggregate(model_version: str):
+    from scripts.aggregate_sentiment import aggregate_sentiment
+
+    return aggregate_sentiment(model_version)
+
+
+def features(model_version: str):
+    from src.sentiment_features import materialize_sentiment_features
+
+    return materialize_sentiment_features(model_version)
+
+
+def vectorstore():
+    from scripts.build_vectorstore import build_vectorstore
+
+    return build_vectorstore()
+
+
+def train():
+    from src.train_price_model import train_model
+
+    train_model(TRAIN_TICKER)
+
+
+def predictions():
+    from src.predict_price import snapshot_predictions
+
+    return snapshot_predictions(PIPELINE_TICKERS)
+
+
+def _model_inputs(conn):
+    return [
+        table_mark(conn, "price_history"),
+        table_mark(conn, "daily_sentiment", column="computed_at"),
+        table_mark(conn, "sentiment_features", column="computed_at"),
+    ]
+
+
+def _prediction_inputs(conn):
+    from src.predict_price import MODEL_PATH
+
+    return _model_inputs(conn) + [MODEL_PATH.stat().st_mtime_ns if MODEL_PATH.exists() else None]
+
+
+def _sentiment_stages(model_version: str, suffix: str = ""):
+    """
+    aggregate -> features for one sentiment model_version.
+    """
+    mv = {"mv": model_version}
+    return [
+        Stage(f"aggregate{suffix}", partial(aggregate, model_version), deps=("clean",),
+              inputs=lambda c: table_mark(c, "sentiment_scores", "model_version = :mv", mv)),
+        Stage(f"features{suffix}", partial(features, model_version), deps=(f"aggregate{suffix}",),
+              inputs=lambda c: table_mark(c, "daily_sentiment", "model_version = :mv", mv, column="computed_at")),
+    ]
+
+
+def build_stages():
+    sentiment = _sentiment_stages(PIPELINE_MODEL_VERSION)
+    if VADER_MODEL_VERSION != PIPELINE_MODEL_VERSION:
+        sentiment += _sentiment_stages(VADER_MODEL_VERSION, "_vader")
+    return [
+        Stage("ingest", ingest),
+        Stage("clean", clean, deps=("ingest",), inputs=lambda c: table_mark(c, "raw_news")),
+        *sentiment,
+        Stage("vectorstore", vectorstore, deps=("clean",), inputs=lambda c: table_mark(c, "clean_news")),
+        Stage("train", train, deps=tuple(s.name for s in sentiment if s.name.startswith("features")),
+              inputs=_model_inputs),
+        Stage("predictions", predictions, deps=("train",), inputs=_prediction_inputs),
+    ]
+
+
+def run_daily(resume: bool = False) -> bool:
+    print("Starting daily pipeline:", datetime.utcnow())
+    results = run_pipeline(build_stages(), resume=resume)
+
+    print(f"{'stage':<16} {'status':<10} {'seconds':>8} {'rows':>8}")
+    for name, r in results.items():
+        rows = "-" if r["rows"] is None else r["rows"]
+        print(f"{name:<16} {r['status']:<10} {r['duration_sec']:>8.2f} {rows:>8}")
+
+    ok = all(r["status"] not in ("failed", "blocked") for r in results.values())
+    print("Pipeline completed successfully" if ok else "Pipeline failed; rerun with --resume")
+    return ok
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--once", action="store_true", help="Run the pipeline now and exit")
+    parser.add_argument("--resume", action="store_true", help="Continue the latest run from its failed stage")
+    parser.add_argument("--history", action="store_true", help="Show recent stage executions")
+    args = parser.parse_args()
+
+    if args.history:
+        for row in run_history():
+            print(row.started_at, row.run_id[:8], f"{row.stage:<16}", f"{row.status:<10}",
+                  f"{row.duration_sec or 0:.2f}s", f"rows={row.rows}", row.error or "")
+        sys.exit(0)
+    if args.once or args.resume:
+        sys.exit(0 if run_daily(resume=args.resume) else 1)
+
+    from apscheduler.schedulers.blocking import BlockingScheduler
+
     scheduler = BlockingScheduler(timezone="Asia/Kolkata")
 
     # Run every day at 6 AM IST
-    scheduler.add_job(run_pipeline, "cron", hour=6, minute=0)
+    scheduler.add_job(run_daily, "cron", hour=6, minute=0)
 
     print("Scheduler started (daily at 6 AM IST)")
     scheduler.start()
@@ -0,0 +1,409 @@
+# scripts/stream_news.py
+"""
+Intraday streaming mode: newly inserted raw_news rows become signals as they
+arrive instead of waiting for the 6 AM batch (scripts/scheduler.py).
+
+Per micro-batch of new articles:
+- clean, near-duplicate check, ticker mapping and VADER sentiment (src.cleaning)
+  -> clean_news / sentiment_scores, the same rows clean_and_label.py writes
+- daily_sentiment for each (ticker, exchange-timezone day) is updated from
+  running sums: the batch's count-weighted means are merged into the stored
+  row in the upsert, nothing is re-aggregated
+- those rows, the daily_sentiment update and the stream's high-water mark
+  ('stream:raw_news') commit in one transaction, so a restart neither drops
+  nor double-counts an article
+- the cleaned documents are embedded into the vector store and BM25 index
+- sentiment_features of the affected tickers are re-materialized from their
+  first changed day (PostgreSQL), then their prediction snapshots
+  (prediction_snapshots) are refreshed
+- end-to-end lag, raw_news.created_at -> snapshot refreshed, goes to the
+  stream_lag_seconds histogram (--metrics-port serves /metrics)
+
+Sources: TablePollSource polls raw_news (default); QueueSource is an
+in-process queue of raw_news ids standing in for a message broker.
+Raw rows that already have clean_news rows (nightly clean_and_label.py, a
+redelivery) are skipped, so each article is counted once. TablePollSource
+also re-reads the trailing WATERMARK_RESCAN_IDS window below the mark every
+STREAM_RESCAN_SEC for ids that committed late.
+The nightly pipeline's aggregate_vader stage (scripts/scheduler.py) recomputes
+touched days from sentiment_scores, which reconciles the running sums.
+
+Usage:
+  PYTHONPATH=. python scripts/stream_news.py [--poll-interval 2] [--metrics-port 9108] [--from-start]
+"""
+
+import os
+import time
+import queue
+import signal
+import argparse
+import threading
+from datetime import datetime, time as dtime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import DateTime, and_, bindparam, func, insert, select, text
+
+from src.cleaning import get_near_dup_index, label_sentiment, map_tickers, strip_html
+from src.config import EXCHANGE_TIMEZONE
+from src.db import engine
+from src.observability import metrics
+from src.schema import Base, CleanNews, RawNews, SentimentScore
+from src.watermarks import get_watermark, rescan_from, set_watermark
+
+STREAM_MODEL_VERSION = "vader-v1"
+MARK_NAME = "stream:raw_news"
+COLLECTION_NAME = "news"
+STREAM_BATCH_SIZE = int(os.getenv("STREAM_BATCH_SIZE", "100"))
+STREAM_POLL_INTERVAL_SEC = float(os.getenv("STREAM_POLL_INTERVAL_SEC", "2.0"))
+STREAM_BM25_SAVE_SEC = float(os.getenv("STREAM_BM25_SAVE_SEC", "30"))
+STREAM_RESCAN_SEC = float(os.getenv("STREAM_RESCAN_SEC", "60"))
+
+# merges the batch's (count, means) into the stored day; all SET expressions read the old row
+_DAILY_RUNNING_SUM_SQL = text(
+    """
+    INSERT INTO daily_sentiment (
+        ticker, date, avg_compound, article_count, pct_positive, pct_negative,
+        model_version, computed_at
+    )
+    VALUES (
+        :ticker, :date, :avg_compound, :article_count, :pct_positive, :pct_negative,
+        :model_version, CURRENT_TIMESTAMP
+    )
+    ON CONFLICT (ticker, date, model_version) DO UPDATE SET
+        avg_compound = (COALESCE(daily_sentiment.avg_compound, 0) * COALESCE(daily_sentiment.article_count, 0)
+                        + EXCLUDED.avg_compound * EXCLUDED.article_count)
+                       / (COALESCE(daily_sentiment.article_count, 0) + EXCLUDED.article_count),
+        pct_positive = (COALESCE(daily_sentiment.pct_positive, 0) * COALESCE(daily_sentiment.article_count, 0)
+                        + EXCLUDED.pct_positive * EXCLUDED.article_count)
+                       / (COALESCE(daily_sentiment.article_count, 0) + EXCLUDED.article_count),
+        pct_negative = (COALESCE(daily_sentiment.pct_negative, 0) * COALESCE(daily_sentiment.article_count, 0)
+                        + EXCLUDED.pct_negative * EXCLUDED.article_count)
+                       / (COALESCE(daily_sentiment.article_count, 0) + EXCLUDED.article_count),
+        article_count = COALESCE(daily_sentiment.article_count, 0) + EXCLUDED.article_count,
+        computed_at = EXCLUDED.computed_at
+    """
+).bindparams(bindparam("date", type_=DateTime))
+
+
+def _load_raw(conn, where, limit=None):
+    q = select(RawNews.__table__).where(where).order_by(RawNews.id)
+    if limit:
+        q = q.limit(limit)
+    return conn.execute(q).all()
+
+
+def _cleaned_raw_ids(conn, raw_ids) -> set:
+    if not raw_ids:
+        return set()
+    return set(conn.execute(
+        select(CleanNews.raw_id).where(CleanNews.raw_id.in_(list(raw_ids))).distinct()
+    ).scalars())
+
+
+class TablePollSource:
+    """
+    Tails raw_news by id above the stream's high-water mark. When idle it
+    re-reads the rescan window below the mark for rows that committed after a
+    higher id was consumed and were neither cleaned nor seen as near-duplicates.
+    """
+
+    def __init__(self, poll_interval: float = STREAM_POLL_INTERVAL_SEC, batch_size: int = STREAM_BATCH_SIZE,
+                 rescan_interval: float = STREAM_RESCAN_SEC):
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self.rescan_interval = rescan_interval
+        self._next_rescan = 0.0
+
+    def _late_rows(self, conn, after_id: int):
+        cleaned = select(CleanNews.id).where(CleanNews.raw_id == RawNews.id).exists()
+        rows = _load_raw(conn, and_(RawNews.id > rescan_from(after_id), RawNews.id <= after_id, ~cleaned))
+        near_dups = get_near_dup_index()
+        return [r for r in rows if near_dups.cluster_of(r.id) is None][:self.batch_size]
+
+    def next_batch(self, after_id: int, stop: threading.Event):
+        with engine.connect() as conn:
+            rows = _load_raw(conn, RawNews.id > after_id, self.batch_size)
+            if not rows and time.monotonic() >= self._next_rescan:
+                self._next_rescan = time.monotonic() + self.rescan_interval
+                rows = self._late_rows(conn, after_id)
+        if not rows:
+            stop.wait(self.poll_interval)
+        return rows
+
+
+class QueueSource:
+    """
+    In-process stand-in for a broker: producers put() the id of each raw_news
+    row after committing it. Ids are consumed as delivered, so the mark only
+    records progress; redelivery after a restart is the broker's concern.
+    """
+
+    def __init__(self, maxsize: int = 10000, batch_size: int = STREAM_BATCH_SIZE, wait: float = 1.0):
+        self.queue: "queue.Queue[int]" = queue.Queue(maxsize=maxsize)
+        self.batch_size = batch_size
+        self.wait = wait
+
+    def put(self, raw_id: int):
+        self.queue.put(raw_id)
+
+    def next_batch(self, after_id: int, stop: threading.Event):
+        try:
+            ids = [self.queue.get(timeout=self.wait)]
+        except queue.Empty:
+            return []
+        while len(ids) < self.batch_size:
+            try:
+                ids.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        with engine.connect() as conn:
+            return _load_raw(conn, RawNews.id.in_(ids))
+
+
+def exchange_day(published_at: datetime) -> datetime:
+    # published_at is stored as naive UTC; days are exchange-timezone dates (as in aggregate_sentiment)
+    local = published_at.replace(tzinfo=timezone.utc).astimezone(ZoneInfo(EXCHANGE_TIMEZONE))
+    return datetime.combine(local.date(), dtime())
+
+
+def _age_seconds(created_at) -> float:
+    if created_at is None:
+        return 0.0
+    if created_at.tzinfo is None:
+        created_at = created_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (datetime.now(timezone.utc) - created_at).total_seconds())
+
+
+def store_batch(conn, rows, near_dups):
+    """
+    Clean, label and insert one batch inside the caller's transaction.
+    Returns (clean_news rows as CleanNews objects with their sources, {(ticker, day): sums},
+    raw rows that produced signals, near-duplicates skipped).
+    """
+    docs, sums, kept, skipped = [], {}, [], 0
+    cleaned = _cleaned_raw_ids(conn, [r.id for r in rows])
+    for r in rows:
+        if r.id in cleaned:
+            continue  # already cleaned and counted (nightly run, redelivery)
+        title, body = strip_html(r.title or ""), strip_html(r.body or "")
+        if near_dups.add(r.id, title + " " + body) != r.id:
+            skipped += 1
+            continue
+        kept.append(r)
+        sent = label_sentiment((title + ". " + (body or ""))[:10000])
+        for ticker in map_tickers(title + " " + body) or [None]:
+            clean = CleanNews(raw_id=r.id, ticker=ticker, title=title, body=body, published_at=r.published_at)
+            clean.id = conn.execute(
+                insert(CleanNews).values(
+                    raw_id=r.id, ticker=ticker, title=title, body=body, published_at=r.published_at
+                )
+            ).inserted_primary_key[0]
+            conn.execute(
+                insert(SentimentScore).values(
+                    clean_id=clean.id,
+                    raw_id=r.id,
+                    ticker=ticker,
+                    published_at=r.published_at,
+                    model_version=STREAM_MODEL_VERSION,
+                    **sent,
+                )
+            )
+            docs.append((clean, r.source))
+            if ticker and r.published_at is not None:
+                s = sums.setdefault((ticker, exchange_day(r.published_at)), [0, 0.0, 0, 0])
+                s[0] += 1
+                s[1] += sent["compound"] or 0.0
+                s[2] += sent["label"] == "positive"
+                s[3] += sent["label"] == "negative"
+
+    for (ticker, day), (n, compound, pos, neg) in sums.items():
+        conn.execute(
+            _DAILY_RUNNING_SUM_SQL,
+            {
+                "ticker": ticker,
+                "date": day,
+                "avg_compound": compound / n,
+                "article_count": n,
+                "pct_positive": pos / n,
+                "pct_negative": neg / n,
+                "model_version": STREAM_MODEL_VERSION,
+            },
+        )
+    return docs, sums, kept, skipped
+
+
+def index_documents(docs):
+    """
+    Embed and upsert streamed clean_news rows into the vector store and the
+    (in-memory) BM25 index; the caller decides when to save BM25.
+    """
+    from scripts.build_vectorstore import document_metadata, document_text
+    from src.bm25_index import get_bm25_index
+    from src.embeddings import embed_texts
+    from src.vectorstore import bump_collection_version, get_collection
+
+    ids, documents, metadatas, page = [], [], [], []
+    for row, source in docs:
+        doc = document_text(row.title, row.body)
+        if not doc:
+            continue
+        ids.append(f"clean:{row.id}")
+        documents.append(doc)
+        metadatas.append(document_metadata(row, source, doc))
+        page.append(row)
+    if not ids:
+        return 0
+
+    get_collection(name=COLLECTION_NAME).upsert(
+        ids=ids, documents=documents, metadatas=metadatas, embeddings=embed_texts(documents)
+    )
+    # BM25's own last_id / the vectorstore watermark stay with the batch build, which
+    # re-upserts these ids idempotently
+    get_bm25_index(COLLECTION_NAME).add_many(
+        ids, documents, [r.ticker for r in page], [r.published_at for r in page]
+    )
+    bump_collection_version(COLLECTION_NAME)
+    return len(ids)
+
+
+def refresh_features(tickers) -> int:
+    from src.sentiment_features import materialize_sentiment_features
+
+    # src.sentiment_features upserts with PostgreSQL ON CONFLICT; other backends skip it
+    if not tickers or engine.dialect.name != "postgresql":
+        return 0
+    return materialize_sentiment_features(STREAM_MODEL_VERSION, tickers=sorted(tickers))
+
+
+def refresh_predictions(tickers) -> int:
+    from src.predict_price import MODEL_PATH, snapshot_predictions
+
+    if not tickers or not MODEL_PATH.exists():
+        return 0
+    return snapshot_predictions(sorted(tickers), skip_errors=True)
+
+
+def _start_mark(from_start: bool) -> int:
+    with engine.begin() as conn:
+        mark = get_watermark(conn, MARK_NAME)
+        if mark == 0 and not from_start:
+            # first run: older rows belong to the nightly batch
+            mark = conn.execute(select(func.coalesce(func.max(RawNews.id), 0))).scalar()
+            set_watermark(conn, MARK_NAME, mark)
+    return mark
+
+
+def run_stream(source=None, stop: threading.Event = None, from_start: bool = False,
+               predictions: bool = True) -> dict:
+    """
+    Consume `source` until `stop` is set. Returns running totals.
+    """
+    source = source or TablePollSource()
+    stop = stop or threading.Event()
+    Base.metadata.create_all(bind=engine)
+    if engine.dialect.name == "postgresql":
+        from scripts.aggregate_sentiment import ensure_schema
+
+        ensure_schema()  # (ticker, date, model_version) conflict target
+    near_dups = get_near_dup_index()
+    mark = _start_mark(from_start)
+    print(f"Streaming raw_news from id > {mark}")
+
+    totals = {"articles": 0, "near_dup": 0, "clean_rows": 0, "daily_rows": 0, "feature_rows": 0,
+              "indexed": 0, "predictions": 0}
+    bm25_dirty, last_save = False, time.monotonic()
+    while not stop.is_set():
+        rows = source.next_batch(mark, stop)
+        if rows:
+            with metrics.timer("stream_store"):
+                with engine.begin() as conn:
+                    docs, sums, kept, skipped = store_batch(conn, rows, near_dups)
+                    mark = max(mark, max(r.id for r in rows))
+                    set_watermark(conn, MARK_NAME, mark)
+            near_dups.commit()
+
+            with metrics.timer("stream_index"):
+                indexed = index_documents(docs)
+            bm25_dirty = bm25_dirty or indexed > 0
+            touched = {t for t, _ in sums}
+            with metrics.timer("stream_features"):
+                featured = refresh_features(touched)
+            with metrics.timer("stream_predict"):
+                refreshed = refresh_predictions(touched) if predictions else 0
+
+            for r in kept:
+                metrics.histogram("stream_lag_seconds").observe(_age_seconds(r.created_at))
+            metrics.inc("stream_articles_total", len(kept), result="processed")
+            metrics.inc("stream_articles_total", skipped, result="near_dup")
+
+            for key, n in (("articles", len(rows)), ("near_dup", skipped), ("clean_rows", len(docs)),
+                           ("daily_rows", len(sums)), ("feature_rows", featured), ("indexed", indexed),
+                           ("predictions", refreshed)):
+                totals[key] += n
+            lag = max((_age_seconds(r.created_at) for r in kept), default=0.0)
+            print(f"up to id={mark}: {len(rows)} articles ({skipped} near-dup), {len(docs)} clean rows, "
+                  f"{len(sums)} daily rows, {featured} feature rows, {refreshed} predictions, max lag {lag:.2f}s")
+
+        if bm25_dirty and (not rows or time.monotonic() - last_save >= STREAM_BM25_SAVE_SEC):
+            _save_bm25()
+            bm25_dirty, last_save = False, time.monotonic()
+
+    if bm25_dirty:
+        _save_bm25()
+    near_dups.commit()
+    return totals
+
+
+def _save_bm25():
+    from src.bm25_index import get_bm25_index
+    from src.vectorstore import bump_collection_version
+
+    get_bm25_index(COLLECTION_NAME).save()
+    bump_collection_version(COLLECTION_NAME)
+
+
+def serve_metrics(port: int):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = metrics.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("0.0.0.0", port), Handler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--poll-interval", type=float, default=STREAM_POLL_INTERVAL_SEC)
+    parser.add_argument("--batch-size", type=int, default=STREAM_BATCH_SIZE)
+    parser.add_argument("--metrics-port", type=int, default=None, help="Serve /metrics (Prometheus) on this port")
+    parser.add_argument("--from-start", action="store_true",
+                        help="On first run, consume existing raw_news too instead of only new rows")
+    parser.add_argument("--no-predictions", action="store_true", help="Skip prediction snapshot refresh")
+    args = parser.parse_args()
+
+    if args.metrics_port:
+        serve_metrics(args.metrics_port)
+        print(f"Metrics on :{args.metrics_port}/metrics")
+
+    # finish the current batch and save the BM25 index before exiting
+    stop = threading.Event()
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+
+    totals = run_stream(
+        TablePollSource(args.poll_interval, args.batch_size),
+        stop=stop,
+        from_start=args.from_start,
+        predictions=not args.no_predictions,
+    )
+    print("Stream stopped:", ", ".join(f"{k}={v}" for k, v in totals.items()))
@@ -0,0 +1,485 @@
+# src/ann_store.py
+"""
+Embedded IVF vector index over memory-mapped embeddings (VECTOR_BACKEND=ann).
+
+AnnCollection implements the subset of the Chroma collection API the
+pipeline uses (upsert / get / query / count, Chroma-shaped results, squared
+L2 distances), so it is a drop-in for src.vectorstore.get_collection.
+
+On disk (ANN_DIR/<name>/), all row-aligned and append-only:
+- vectors.f32   float32 embeddings (rows x dim)
+- codes.i8      int8 codes (per-dimension scale), written once trained with ANN_QUANTIZE=int8
+- list.i32      IVF list (nearest centroid) per row, -1 before training
+- alive.u8      0 for rows superseded by a later upsert of the same id
+- ticker.i32    ticker code per row (-1 = none), for prefiltering
+- ts.i64        published_at epoch seconds per row (INT64 min = none)
+- layout.npz    rows grouped by list (rows appended later are scanned as a tail)
+- ivf.npz       centroids (+ int8 scale)
+- docs.sqlite   id <-> row, document text and metadata
+
+Until ANN_TRAIN_MIN rows exist the index is a flat (exact) scan. Training runs
+k-means on a sample (again whenever the index grows ANN_RETRAIN_GROWTH-fold); queries then scan the ANN_NPROBE nearest lists, filtered
+on ticker / published_at before any distance is computed. With int8 codes the
+top candidates are re-ranked on the float32 vectors.
+
+Several processes share a collection: build_vectorstore and the intraday
+stream write, API workers read. upsert() and train() hold an fcntl lock on
+<name>/lock and re-read the row count (and any newer training) from disk under
+it, so writers never number rows from a stale count; only the lock holder
+truncates torn column tails. train() writes list.i32 / codes.i8 to a temp file
+and renames it, so processes that have the old file mapped keep valid pages.
+A reader calls refresh() when the collection version changes to re-stat the
+columns, remap them and reload ivf/layout.
+"""
+
+import os
+import json
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from src.file_lock import file_lock
+from src.metadata_filters import parse_where, to_timestamp
+
+ANN_DIR = Path(os.getenv("ANN_DIR", str(Path(__file__).parents[1] / "data" / "ann")))
+ANN_QUANTIZE = os.getenv("ANN_QUANTIZE", "none")  # none | int8
+ANN_TRAIN_MIN = int(os.getenv("ANN_TRAIN_MIN", "10000"))
+ANN_NPROBE = int(os.getenv("ANN_NPROBE", "16"))
+ANN_RERANK = int(os.getenv("ANN_RERANK", "4"))  # int8: re-rank k * ANN_RERANK candidates exactly
+ANN_RETRAIN_GROWTH = float(os.getenv("ANN_RETRAIN_GROWTH", "4"))  # retrain once rows grow this much
+ANN_KMEANS_ITERS = int(os.getenv("ANN_KMEANS_ITERS", "12"))
+ANN_KMEANS_SAMPLE = int(os.getenv("ANN_KMEANS_SAMPLE", "100000"))
+
+_NO_TS = np.iinfo(np.int64).min
+_COLUMNS = {
+    "vectors": ("vectors.f32", np.float32),
+    "codes": ("codes.i8", np.int8),
+    "lists": ("list.i32", np.int32),
+    "alive": ("alive.u8", np.uint8),
+    "tickers": ("ticker.i32", np.int32),
+    "ts": ("ts.i64", np.int64),
+}
+_SCAN_CHUNK = 65536
+
+
+def _sq_l2(x: np.ndarray, q: np.ndarray) -> np.ndarray:
+    return np.einsum("ij,ij->i", x, x) - 2.0 * (x @ q) + float(q @ q)
+
+
+def kmeans(x: np.ndarray, n_clusters: int, iters: int = ANN_KMEANS_ITERS, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centroids = x[rng.choice(len(x), n_clusters, replace=False)].copy()
+    for _ in range(iters):
+        assign = _nearest(x, centroids)
+        order = np.argsort(assign, kind="stable")
+        counts = np.bincount(assign, minlength=n_clusters)
+        empty = counts == 0
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        centroids[~empty] = np.add.reduceat(x[order], starts[~empty], axis=0) / counts[~empty, None]
+        # re-seed empty lists from random points
+        centroids[empty] = x[rng.choice(len(x), int(empty.sum()), replace=False)]
+    return centroids
+
+
+def _savez(path: Path, **arrays):
+    """
+    np.savez via a temp file + rename, so a reader refreshing mid-write sees the old or new file.
+    """
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        np.savez(f, **arrays)
+    os.replace(tmp, path)
+
+
+def _replace_column(path: Path, chunks):
+    """
+    Rewrite a column file via a temp file + rename: truncating it in place
+    would SIGBUS readers that have it memory-mapped.
+    """
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        for chunk in chunks:
+            f.write(chunk.tobytes())
+    os.replace(tmp, path)
+
+
+def _nearest(x: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    c_norm = np.einsum("ij,ij->i", centroids, centroids)
+    out = np.empty(len(x), dtype=np.int32)
+    # bound the (rows x centroids) distance block to ~64MB
+    step = max(1, (1 << 24) // len(centroids))
+    for lo in range(0, len(x), step):
+        chunk = np.asarray(x[lo:lo + step], dtype=np.float32)
+        out[lo:lo + len(chunk)] = np.argmin(c_norm[None, :] - 2.0 * chunk @ centroids.T, axis=1)
+    return out
+
+
+class AnnCollection:
+    def __init__(self, name: str, root: Path = ANN_DIR, quantize: str = ANN_QUANTIZE, nprobe: int = ANN_NPROBE):
+        self.name = name
+        self.dir = Path(root) / name
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.quantize = quantize
+        self.nprobe = nprobe
+        self._lock = threading.RLock()
+        self._lock_path = self.dir / "lock"
+        self._ivf_stamp = None
+
+        self._db = sqlite3.connect(str(self.dir / "docs.sqlite"), check_same_thread=False)
+        self._db.executescript(
+            """
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS docs (
+                id TEXT PRIMARY KEY,
+                row INTEGER NOT NULL UNIQUE,
+                document TEXT,
+                metadata TEXT
+            );
+            CREATE TABLE IF NOT EXISTS tickers (ticker TEXT PRIMARY KEY, code INTEGER NOT NULL);
+            """
+        )
+        self._ticker_codes = dict(self._db.execute("SELECT ticker, code FROM tickers"))
+
+        self.dim: Optional[int] = None
+        self.rows = 0
+        self.centroids: Optional[np.ndarray] = None
+        self.scale: Optional[np.ndarray] = None
+        self.list_ptr = np.zeros(1, dtype=np.int64)
+        self.list_rows = np.zeros(0, dtype=np.int64)
+        self.sorted_rows = 0
+        self.trained_rows = 0
+        self._cols: Dict[str, Optional[np.ndarray]] = {}
+        # torn tails are left to the next writer (it holds the lock)
+        self._open(truncate=False)
+
+    # -------------------------------------------------
+    # Storage
+    # -------------------------------------------------
+    def _path(self, col: str) -> Path:
+        return self.dir / _COLUMNS[col][0]
+
+    def _row_bytes(self, col: str) -> int:
+        return np.dtype(_COLUMNS[col][1]).itemsize * (self.dim if col in ("vectors", "codes") else 1)
+
+    def _open(self, truncate: bool = True):
+        meta_path = self.dir / "meta.json"
+        if meta_path.exists():
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            self.dim = meta["dim"]
+            self.quantize = meta.get("quantize", self.quantize)
+        if self.dim is None:
+            return
+        # rows = shortest column, so a torn append is ignored (the sqlite row is the commit point)
+        committed = self._db.execute("SELECT COALESCE(MAX(row) + 1, 0) FROM docs").fetchone()[0]
+        lengths = [committed]
+        for col in _COLUMNS:
+            path = self._path(col)
+            if col == "codes" and not path.exists():
+                continue
+            size = path.stat().st_size if path.exists() else 0
+            lengths.append(size // self._row_bytes(col))
+        self.rows = min(lengths)
+        # drop torn tails so the next append lines up with its row number
+        for col in _COLUMNS if truncate else ():
+            path = self._path(col)
+            if path.exists() and path.stat().st_size > self.rows * self._row_bytes(col):
+                os.truncate(path, self.rows * self._row_bytes(col))
+        self._load_ivf()
+        self._remap()
+
+    def _load_ivf(self):
+        ivf = self.dir / "ivf.npz"
+        layout = self.dir / "layout.npz"
+        stamp = tuple(p.stat().st_mtime_ns if p.exists() else None for p in (ivf, layout))
+        if stamp == self._ivf_stamp:
+            return
+        self._ivf_stamp = stamp
+        if ivf.exists():
+            with np.load(ivf) as data:
+                self.centroids = data["centroids"]
+                self.scale = data["scale"] if "scale" in data else None
+                self.trained_rows = int(data["trained_rows"])
+            with np.load(layout) as data:
+                self.list_ptr = data["list_ptr"]
+                self.list_rows = data["list_rows"]
+                self.sorted_rows = int(data["sorted_rows"])
+
+    def refresh(self):
+        """
+        Pick up rows, training and layout written by another process (the
+        vectorstore build) since this collection was opened. Torn tails are
+        left alone: they may be an append still in progress.
+        """
+        with self._lock:
+            self._ticker_codes = dict(self._db.execute("SELECT ticker, code FROM tickers"))
+            self._open(truncate=False)
+
+    def _remap(self):
+        self._cols = {}
+        for col, (fname, dtype) in _COLUMNS.items():
+            path = self.dir / fname
+            if not self.rows or not path.exists():
+                self._cols[col] = None
+                continue
+            shape = (self.rows, self.dim) if col in ("vectors", "codes") else (self.rows,)
+            mode = "r+" if col == "alive" else "r"
+            self._cols[col] = np.memmap(path, dtype=dtype, mode=mode, shape=shape)
+
+    def _append(self, col: str, values: np.ndarray):
+        with open(self._path(col), "ab") as f:
+            f.write(np.ascontiguousarray(values, dtype=_COLUMNS[col][1]).tobytes())
+
+    def _ticker_code(self, ticker: Optional[str]) -> int:
+        if not ticker:
+            return -1
+        code = self._ticker_codes.get(ticker)
+        if code is None:
+            code = self._ticker_codes[ticker] = len(self._ticker_codes)
+            self._db.execute("INSERT INTO tickers (ticker, code) VALUES (?, ?)", (ticker, code))
+        return code
+
+    def _encode(self, vectors: np.ndarray) -> np.ndarray:
+        return np.clip(np.rint(vectors / self.scale), -127, 127).astype(np.int8)
+
+    # -------------------------------------------------
+    # Training / layout
+    # -------------------------------------------------
+    def train(self, n_lists: Optional[int] = None):
+        """
+        (Re)build IVF centroids from a sample of live rows and regroup all rows by list.
+        """
+        with self._lock, file_lock(self._lock_path):
+            self._open()
+            self._train(n_lists)
+
+    def _train(self, n_lists: Optional[int] = None):
+        # caller holds self._lock and the file lock
+        if not self.rows:
+            return
+        live = np.flatnonzero(self._cols["alive"])
+        if not len(live):
+            return
+        n_lists = n_lists or max(1, min(int(np.sqrt(len(live))), len(live) // 39))
+        rng = np.random.default_rng(0)
+        sample = np.sort(rng.choice(live, min(len(live), ANN_KMEANS_SAMPLE), replace=False))
+        x = np.asarray(self._cols["vectors"][sample], dtype=np.float32)
+        self.centroids = kmeans(x, n_lists).astype(np.float32)
+        self.trained_rows = len(live)
+        arrays = {"centroids": self.centroids, "trained_rows": self.trained_rows}
+        if self.quantize == "int8":
+            self.scale = np.maximum(np.abs(x).max(axis=0), 1e-12).astype(np.float32) / 127.0
+            arrays["scale"] = self.scale
+
+        _replace_column(self._path("lists"), [_nearest(self._cols["vectors"], self.centroids)])
+        if self.quantize == "int8":
+            vectors = self._cols["vectors"]
+            _replace_column(self._path("codes"), (
+                self._encode(np.asarray(vectors[lo:lo + _SCAN_CHUNK])) for lo in range(0, self.rows, _SCAN_CHUNK)
+            ))
+        _savez(self.dir / "ivf.npz", **arrays)
+        self._remap()
+        self._relayout()
+
+    def _relayout(self):
+        lists = np.asarray(self._cols["lists"])
+        live = np.flatnonzero(self._cols["alive"])
+        order = live[np.argsort(lists[live], kind="stable")]
+        counts = np.bincount(lists[live], minlength=len(self.centroids))
+        self.list_ptr = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        self.list_rows = order.astype(np.int64)
+        self.sorted_rows = self.rows
+        _savez(self.dir / "layout.npz", list_ptr=self.list_ptr, list_rows=self.list_rows, sorted_rows=self.sorted_rows)
+
+    # -------------------------------------------------
+    # Chroma-compatible API
+    # -------------------------------------------------
+    def count(self) -> int:
+        return self._db.execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+
+    def upsert(
+        self,
+        ids: Sequence[str],
+        documents: Optional[Sequence[str]] = None,
+        metadatas: Optional[Sequence[Dict[str, Any]]] = None,
+        embeddings: Optional[Sequence[Sequence[float]]] = None,
+    ):
+        if embeddings is None:
+            from src.embeddings import embed_texts
+
+            embeddings = embed_texts(documents)
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        documents = documents or [None] * len(ids)
+        metadatas = metadatas or [{}] * len(ids)
+
+        with self._lock, file_lock(self._lock_path):
+            # rows, ticker codes and training may have moved in another writer process
+            self._ticker_codes = dict(self._db.execute("SELECT ticker, code FROM tickers"))
+            self._open()
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+                tmp = self.dir / "meta.json.tmp"
+                tmp.write_text(json.dumps({"dim": self.dim, "quantize": self.quantize}), encoding="utf-8")
+                os.replace(tmp, self.dir / "meta.json")
+            if vectors.shape[1] != self.dim:
+                raise ValueError(f"Embedding dim {vectors.shape[1]} != collection dim {self.dim}")
+
+            placeholders = ",".join("?" * len(ids))
+            superseded = [r for (r,) in self._db.execute(f"SELECT row FROM docs WHERE id IN ({placeholders})", list(ids))]
+            start = self.rows
+            rows = np.arange(start, start + len(ids))
+
+            self._append("vectors", vectors)
+            if self.centroids is not None:
+                self._append("lists", _nearest(vectors, self.centroids))
+                if self.scale is not None:
+                    self._append("codes", self._encode(vectors))
+            else:
+                self._append("lists", np.full(len(ids), -1))
+            self._append("alive", np.ones(len(ids)))
+            self._append("tickers", [self._ticker_code((m or {}).get("ticker")) for m in metadatas])
+            ts = [to_timestamp((m or {}).get("published_at")) for m in metadatas]
+            self._append("ts", [_NO_TS if t is None else t for t in ts])
+
+            with self._db:
+                self._db.execute(f"DELETE FROM docs WHERE id IN ({placeholders})", list(ids))
+                self._db.executemany(
+                    "INSERT INTO docs (id, row, document, metadata) VALUES (?, ?, ?, ?)",
+                    [(i, int(r), d, json.dumps(m or {})) for i, r, d, m in zip(ids, rows, documents, metadatas)],
+                )
+            self.rows += len(ids)
+            self._remap()
+            if superseded:
+                self._cols["alive"][superseded] = 0
+                self._cols["alive"].flush()
+
+            if self.centroids is None and self.rows >= ANN_TRAIN_MIN:
+                self._train()
+            elif self.centroids is not None and self.rows > ANN_RETRAIN_GROWTH * self.trained_rows:
+                self._train()
+            elif self.centroids is not None and self.rows - self.sorted_rows > self.sorted_rows:
+                self._relayout()
+
+    def _fetch(self, rows: Sequence[int]) -> Dict[int, tuple]:
+        if not len(rows):
+            return {}
+        placeholders = ",".join("?" * len(rows))
+        return {
+            row: (doc_id, document, json.loads(metadata))
+            for doc_id, row, document, metadata in self._db.execute(
+                f"SELECT id, row, document, metadata FROM docs WHERE row IN ({placeholders})",
+                [int(r) for r in rows],
+            )
+        }
+
+    def get(self, ids: Optional[Sequence[str]] = None, include: Optional[List[str]] = None, **_) -> Dict[str, Any]:
+        include = include or ["documents", "metadatas"]
+        if ids is None:
+            found = list(self._db.execute("SELECT id, document, metadata FROM docs ORDER BY row"))
+        else:
+            placeholders = ",".join("?" * len(ids))
+            by_id = {
+                r[0]: r
+                for r in self._db.execute(f"SELECT id, document, metadata FROM docs WHERE id IN ({placeholders})", list(ids))
+            }
+            found = [by_id[i] for i in ids if i in by_id]
+        out: Dict[str, Any] = {"ids": [r[0] for r in found]}
+        if "documents" in include:
+            out["documents"] = [r[1] for r in found]
+        if "metadatas" in include:
+            out["metadatas"] = [json.loads(r[2]) for r in found]
+        return out
+
+    def _candidates(self, q: np.ndarray, nprobe: int) -> np.ndarray:
+        if self.centroids is None:
+            return np.arange(self.rows)
+        probe = np.argsort(_sq_l2(self.centroids, q))[:nprobe]
+        parts = [self.list_rows[self.list_ptr[c]:self.list_ptr[c + 1]] for c in probe]
+        if self.rows > self.sorted_rows:
+            tail = np.arange(self.sorted_rows, self.rows)
+            parts.append(tail[np.isin(self._cols["lists"][self.sorted_rows:self.rows], probe)])
+        return np.concatenate(parts)
+
+    def _prefilter(self, rows: np.ndarray, tickers=None, start_ts=None, end_ts=None) -> np.ndarray:
+        keep = self._cols["alive"][rows].astype(bool)
+        if tickers is not None:
+            codes = [self._ticker_codes[t] for t in tickers if t in self._ticker_codes]
+            keep &= np.isin(self._cols["tickers"][rows], codes)
+        if start_ts is not None or end_ts is not None:
+            ts = self._cols["ts"][rows]
+            keep &= ts != _NO_TS
+            if start_ts is not None:
+                keep &= ts >= start_ts
+            if end_ts is not None:
+                keep &= ts <= end_ts
+        return rows[keep]
+
+    def _search_one(self, q: np.ndarray, k: int, filters: Dict[str, Any], nprobe: int):
+        n_lists = 1 if self.centroids is None else len(self.centroids)
+        while True:
+            rows = self._prefilter(self._candidates(q, nprobe), **filters)
+            # selective filters can leave too few rows in the probed lists: widen the probe
+            if len(rows) >= k or nprobe >= n_lists:
+                break
+            nprobe = min(n_lists, nprobe * 4)
+        if not len(rows):
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+        rerank = self.scale is not None and self._cols["codes"] is not None
+        depth = k * ANN_RERANK if rerank else k
+        best_rows, best_dist = [], []
+        for lo in range(0, len(rows), _SCAN_CHUNK):
+            chunk = np.sort(rows[lo:lo + _SCAN_CHUNK])
+            if rerank:
+                x = self._cols["codes"][chunk].astype(np.float32) * self.scale
+            else:
+                x = np.asarray(self._cols["vectors"][chunk])
+            dist = _sq_l2(x, q)
+            if len(dist) > depth:
+                top = np.argpartition(dist, depth)[:depth]
+                chunk, dist = chunk[top], dist[top]
+            best_rows.append(chunk)
+            best_dist.append(dist)
+        rows, dist = np.concatenate(best_rows), np.concatenate(best_dist)
+        if rerank:
+            order = np.sort(rows)
+            dist = _sq_l2(np.asarray(self._cols["vectors"][order]), q)
+            rows = order
+        top = np.argsort(dist, kind="stable")[:k]
+        return rows[top], dist[top]
+
+    def query(
+        self,
+        query_embeddings: Optional[Sequence[Sequence[float]]] = None,
+        query_texts: Optional[Sequence[str]] = None,
+        n_results: int = 10,
+        where: Optional[Dict[str, Any]] = None,
+        include: Optional[List[str]] = None,
+        nprobe: Optional[int] = None,
+        **_,
+    ) -> Dict[str, List[list]]:
+        if query_embeddings is None:
+            from src.embeddings import embed_texts
+
+            query_embeddings = embed_texts(query_texts, task_type="retrieval_query")
+        filters = parse_where(where)
+        out: Dict[str, List[list]] = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        with self._lock:
+            if not self.rows:
+                return {key: [[] for _ in query_embeddings] for key in out}
+            for q in np.asarray(query_embeddings, dtype=np.float32):
+                rows, dist = self._search_one(q, n_results, filters, nprobe or self.nprobe)
+                docs = self._fetch(rows)
+                out["ids"].append([docs[r][0] for r in rows])
+                out["documents"].append([docs[r][1] for r in rows])
+                out["metadatas"].append([docs[r][2] for r in rows])
+                out["distances"].append([float(d) for d in dist])
+        return out
+
+    def close(self):
+        with self._lock:
+            self._cols = {}
+            self._db.close()
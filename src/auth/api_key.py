@@ -5,11 +5,14 @@ from fastapi.security import APIKeyHeader
 
 API_KEY_NAME = "X-API-KEY"
 API_KEY = os.getenv("API_KEY", "dev-secret-key")
+# additional client keys (comma-separated); rate limits and admission budgets are per key
+API_KEYS = {API_KEY} | {k.strip() for k in os.getenv("API_KEYS", "").split(",") if k.strip()}
 
 api_key_header = APIKeyHeader(name=API_KEY_NAME, auto_error=False)
 
-def verify_api_key(api_key: str = Security(api_key_header)):
-    if api_key != API_KEY:
+# async so auth never waits on the shared threadpool
+async def verify_api_key(api_key: str = Security(api_key_header)):
+    if api_key not in API_KEYS:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid or missing API key",
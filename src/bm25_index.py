@@ -0,0 +1,379 @@
+# src/bm25_index.py
+"""
+Local BM25 inverted index over the news collection (exact-match retrieval for
+tickers, numbers and names that dense embeddings blur, e.g. "Q3 EBITDA", "Jio").
+
+Storage is array-backed (CSR):
+- vocab            term -> term index
+- term_ptr         int64[V+1], postings of term t are [term_ptr[t], term_ptr[t+1])
+- post_docs        uint32 doc rows, sorted within each term
+- post_tf          uint16 term frequencies
+- per-doc columns  doc_ids, doc_len, ticker code, published_ts, alive
+
+New documents go to flat pending (term, doc, tf) arrays and are merged into
+the CSR arrays (vectorized) before the next search or save; only the pending
+postings are sorted, the existing runs are copied into place. Re-adding a doc id
+tombstones its old row; merges drop tombstoned postings.
+
+On disk (BM25_INDEX_DIR/<name>/) each save writes a new generation directory
+and then flips the CURRENT pointer, so readers never see a half-written index.
+Arrays are opened with mmap, so loading is near-instant.
+
+The batch build and the intraday stream both save the same index. save() holds
+an fcntl lock on <name>/lock; if another process saved a newer generation since
+this index was loaded, that generation's documents this index lacks are merged
+in first, so neither writer drops the other's documents.
+"""
+
+import os
+import re
+import json
+import shutil
+import threading
+from array import array
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.file_lock import file_lock
+from src.metadata_filters import to_timestamp
+
+BM25_INDEX_DIR = Path(os.getenv("BM25_INDEX_DIR", str(Path(__file__).parents[1] / "data" / "bm25")))
+BM25_K1 = float(os.getenv("BM25_K1", "1.2"))
+BM25_B = float(os.getenv("BM25_B", "0.75"))
+
+# keeps "q3", "ebitda", "7.5", "m&m", "reliance.ns" as single tokens
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:[.&'][a-z0-9]+)*")
+_NO_TS = np.iinfo(np.int64).min
+_ARRAYS = ("term_ptr", "post_docs", "post_tf", "doc_len", "doc_ticker", "doc_ts", "alive", "doc_ids")
+
+_indexes: Dict[str, "BM25Index"] = {}
+_indexes_lock = threading.Lock()
+
+
+def _read_generation(path: Path) -> str:
+    pointer = path / "CURRENT"
+    return pointer.read_text().strip() if pointer.exists() else ""
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN_RE.findall((text or "").lower())
+
+
+class BM25Index:
+    def __init__(self, path: Optional[Path] = None, k1: float = BM25_K1, b: float = BM25_B):
+        self.path = Path(path) if path else None
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+
+        self.vocab: Dict[str, int] = {}
+        self.tickers: Dict[str, int] = {}
+        self.last_id = 0
+        self.term_ptr = np.zeros(1, dtype=np.int64)
+        self.post_docs = np.zeros(0, dtype=np.uint32)
+        self.post_tf = np.zeros(0, dtype=np.uint16)
+        self.doc_len = np.zeros(0, dtype=np.uint32)
+        self.doc_ticker = np.zeros(0, dtype=np.int32)
+        self.doc_ts = np.zeros(0, dtype=np.int64)
+        self.alive = np.zeros(0, dtype=bool)
+        self.doc_ids = np.zeros(0, dtype="U1")
+        self.generation = ""
+
+        self._row_of: Optional[Dict[str, int]] = None
+        self._total_len = 0
+        self._live = 0
+        self._pending_terms = array("I")
+        self._pending_docs = array("I")
+        self._pending_tf = array("H")
+        self._new_docs: List[Tuple[str, int, int, int]] = []  # (doc_id, len, ticker code, ts)
+        self._dead_rows: List[int] = []
+
+        if self.path is not None:
+            self._load()
+
+    # -------------------------------------------------
+    # Persistence
+    # -------------------------------------------------
+    def _load(self):
+        self.generation = _read_generation(self.path)
+        if not self.generation:
+            return
+        gen = self.path / self.generation
+        with open(gen / "meta.json", "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        self.vocab = meta["vocab"]
+        self.tickers = meta["tickers"]
+        self.last_id = meta["last_id"]
+        for name in _ARRAYS:
+            setattr(self, name, np.load(gen / f"{name}.npy", mmap_mode="r"))
+        self._live = int(meta["live"])
+        self._total_len = int(meta["total_len"])
+
+    def save(self):
+        self.path.mkdir(parents=True, exist_ok=True)
+        with self._lock, file_lock(self.path / "lock"):
+            old = _read_generation(self.path)
+            if old and old != self.generation:
+                self._absorb(BM25Index(self.path, k1=self.k1, b=self.b))
+            self._merge()
+            gen_name = f"gen-{int(old.split('-')[1]) + 1 if old else 1:06d}"
+            gen = self.path / gen_name
+            if gen.exists():
+                shutil.rmtree(gen)
+            gen.mkdir()
+            for name in _ARRAYS:
+                np.save(gen / f"{name}.npy", np.asarray(getattr(self, name)))
+            with open(gen / "meta.json", "w", encoding="utf-8") as f:
+                json.dump({
+                    "vocab": self.vocab,
+                    "tickers": self.tickers,
+                    "last_id": self.last_id,
+                    "live": self._live,
+                    "total_len": self._total_len,
+                }, f)
+            tmp = self.path / "CURRENT.tmp"
+            tmp.write_text(gen_name)
+            os.replace(tmp, self.path / "CURRENT")
+            self.generation = gen_name
+            for name in _ARRAYS:
+                setattr(self, name, np.load(gen / f"{name}.npy", mmap_mode="r"))
+            # keep the previous generation for readers that are still opening it
+            for stale in self.path.glob("gen-*"):
+                if stale.name not in (gen_name, old):
+                    shutil.rmtree(stale, ignore_errors=True)
+
+    def _absorb(self, other: "BM25Index"):
+        """
+        Queue other's live documents that this index does not hold as pending
+        rows (postings copied from its CSR arrays). Caller holds self._lock.
+        """
+        rows = self._rows()
+        other_ids = np.asarray(other.doc_ids)
+        take = np.flatnonzero(np.asarray(other.alive, dtype=bool) & ~np.isin(other_ids, list(rows)))
+        self.last_id = max(self.last_id, other.last_id)
+        if not len(take):
+            return
+
+        next_row = len(self.doc_len) + len(self._new_docs)
+        new_row = np.full(len(other_ids), -1, dtype=np.int64)
+        new_row[take] = next_row + np.arange(len(take))
+
+        words = [""] * len(other.vocab)
+        for term, i in other.vocab.items():
+            words[i] = term
+        term_map = np.asarray([self.vocab.setdefault(t, len(self.vocab)) for t in words], dtype=np.uint32)
+        other_ptr = np.asarray(other.term_ptr)
+        terms = np.repeat(np.arange(len(other_ptr) - 1), np.diff(other_ptr))
+        docs = np.asarray(other.post_docs)
+        sel = new_row[docs] >= 0
+        # term-major with rows ascending, as _merge expects of pending postings
+        self._pending_terms.frombytes(term_map[terms[sel]].tobytes())
+        self._pending_docs.frombytes(new_row[docs[sel]].astype(np.uint32).tobytes())
+        self._pending_tf.frombytes(np.asarray(other.post_tf)[sel].astype(np.uint16).tobytes())
+
+        tickers = {code: t for t, code in other.tickers.items()}
+        for i in take.tolist():
+            code = int(other.doc_ticker[i])
+            if code >= 0:
+                code = self.tickers.setdefault(tickers[code], len(self.tickers))
+            doc_id = str(other_ids[i])
+            self._new_docs.append((doc_id, int(other.doc_len[i]), code, int(other.doc_ts[i])))
+            rows[doc_id] = int(new_row[i])
+
+    # -------------------------------------------------
+    # Indexing
+    # -------------------------------------------------
+    def _rows(self) -> Dict[str, int]:
+        if self._row_of is None:
+            self._row_of = {doc_id: i for i, doc_id in enumerate(self.doc_ids.tolist()) if self.alive[i]}
+        return self._row_of
+
+    def __len__(self) -> int:
+        return self._live + len(self._new_docs) - len(self._dead_rows)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self._rows()
+
+    def add(self, doc_id: str, text: str, ticker: Optional[str] = None, published_at=None):
+        self.add_many([doc_id], [text], [ticker], [published_at])
+
+    def add_many(
+        self,
+        doc_ids: Sequence[str],
+        texts: Sequence[str],
+        tickers: Optional[Sequence[Optional[str]]] = None,
+        published_at: Optional[Sequence] = None,
+    ):
+        """
+        Index (or re-index) documents; takes effect at the next search or save.
+        """
+        n = len(doc_ids)
+        tickers = tickers or [None] * n
+        published_at = published_at or [None] * n
+        with self._lock:
+            rows = self._rows()
+            next_row = len(self.doc_len) + len(self._new_docs)
+            for doc_id, text, ticker, ts in zip(doc_ids, texts, tickers, published_at):
+                if doc_id in rows:
+                    self._dead_rows.append(rows[doc_id])
+                counts = Counter(tokenize(text))
+                for term, tf in counts.items():
+                    term_idx = self.vocab.get(term)
+                    if term_idx is None:
+                        term_idx = self.vocab[term] = len(self.vocab)
+                    self._pending_terms.append(term_idx)
+                    self._pending_docs.append(next_row)
+                    self._pending_tf.append(min(tf, 65535))
+                ticker_code = -1
+                if ticker:
+                    ticker_code = self.tickers.setdefault(ticker, len(self.tickers))
+                ts = to_timestamp(ts)
+                self._new_docs.append((doc_id, sum(counts.values()), ticker_code, _NO_TS if ts is None else ts))
+                rows[doc_id] = next_row
+                next_row += 1
+
+    def _merge(self):
+        if not self._new_docs and not self._dead_rows:
+            return
+        new_ids, new_len, new_ticker, new_ts = zip(*self._new_docs) if self._new_docs else ((), (), (), ())
+        alive = np.concatenate([np.asarray(self.alive), np.ones(len(new_ids), dtype=bool)])
+        doc_len = np.concatenate([np.asarray(self.doc_len), np.asarray(new_len, dtype=np.uint32)])
+        alive[np.asarray(self._dead_rows, dtype=np.int64)] = False
+
+        # pending postings are the only unsorted part: sort them by term (stable, so
+        # doc rows stay ascending) and interleave them after each term's existing
+        # run; new rows are all above old ones, so every term stays doc-sorted
+        p_terms = np.frombuffer(self._pending_terms, dtype=np.uint32)
+        order = np.argsort(p_terms, kind="stable")
+        p_terms = p_terms[order]
+        p_docs = np.frombuffer(self._pending_docs, dtype=np.uint32)[order]
+        p_tf = np.frombuffer(self._pending_tf, dtype=np.uint16)[order]
+
+        n_terms = len(self.vocab)
+        old_ptr = np.asarray(self.term_ptr)
+        old_cnt = np.zeros(n_terms, dtype=np.int64)
+        old_cnt[:len(old_ptr) - 1] = np.diff(old_ptr)
+        new_cnt = np.bincount(p_terms, minlength=n_terms)
+        new_before = np.concatenate([[0], np.cumsum(new_cnt)[:-1]]).astype(np.int64)
+        n_old, n_new = int(old_ptr[-1]), len(p_terms)
+
+        docs = np.empty(n_old + n_new, dtype=np.uint32)
+        tfs = np.empty(n_old + n_new, dtype=np.uint16)
+        old_dest = np.arange(n_old, dtype=np.int64) + np.repeat(new_before[:len(old_ptr) - 1], old_cnt[:len(old_ptr) - 1])
+        new_dest = np.arange(n_new, dtype=np.int64) + np.cumsum(old_cnt)[p_terms]
+        docs[old_dest], tfs[old_dest] = self.post_docs, self.post_tf
+        docs[new_dest], tfs[new_dest] = p_docs, p_tf
+        counts = old_cnt + new_cnt
+
+        # drop postings of tombstoned rows (no re-sort: filtering keeps the order)
+        keep = alive[docs]
+        if not keep.all():
+            terms = np.repeat(np.arange(n_terms, dtype=np.int64), counts)
+            counts = counts - np.bincount(terms[~keep], minlength=n_terms)
+            docs, tfs = docs[keep], tfs[keep]
+
+        self.post_docs = docs
+        self.post_tf = tfs
+        self.term_ptr = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        self.doc_len = doc_len
+        self.alive = alive
+        self.doc_ticker = np.concatenate([np.asarray(self.doc_ticker), np.asarray(new_ticker, dtype=np.int32)])
+        self.doc_ts = np.concatenate([np.asarray(self.doc_ts), np.asarray(new_ts, dtype=np.int64)])
+        self.doc_ids = np.concatenate([np.asarray(self.doc_ids), np.asarray(new_ids, dtype=str)])
+        self._live = int(alive.sum())
+        self._total_len = int(doc_len[alive].sum())
+
+        self._pending_terms = array("I")
+        self._pending_docs = array("I")
+        self._pending_tf = array("H")
+        self._new_docs = []
+        self._dead_rows = []
+
+    # -------------------------------------------------
+    # Search
+    # -------------------------------------------------
+    def _filter_mask(
+        self,
+        tickers: Optional[Iterable[str]],
+        start_ts: Optional[int],
+        end_ts: Optional[int],
+    ) -> Optional[np.ndarray]:
+        mask = None
+        if tickers is not None:
+            codes = [self.tickers[t] for t in tickers if t in self.tickers]
+            mask = np.isin(self.doc_ticker, codes)
+        if start_ts is not None or end_ts is not None:
+            ts = self.doc_ts
+            in_range = ts != _NO_TS
+            if start_ts is not None:
+                in_range &= ts >= start_ts
+            if end_ts is not None:
+                in_range &= ts <= end_ts
+            mask = in_range if mask is None else mask & in_range
+        return mask
+
+    def search(
+        self,
+        query: str,
+        k: int = 10,
+        tickers: Optional[Iterable[str]] = None,
+        start_ts: Optional[int] = None,
+        end_ts: Optional[int] = None,
+    ) -> List[Tuple[str, float]]:
+        """
+        Top-k (doc_id, score). Ticker / date filters restrict candidates before scoring.
+        """
+        with self._lock:
+            self._merge()
+            # consistent snapshot: a concurrent merge swaps these arrays
+            term_ptr, post_docs, post_tf = self.term_ptr, self.post_docs, self.post_tf
+            doc_len, doc_ids = self.doc_len, self.doc_ids
+            n_docs, total_len = self._live, self._total_len
+            mask = self._filter_mask(tickers, start_ts, end_ts)
+            # add_many grows vocab in place; resolve terms against the same snapshot
+            vocab = self.vocab
+            term_ids = [vocab[t] for t in dict.fromkeys(tokenize(query)) if t in vocab]
+        if not term_ids or not n_docs:
+            return []
+
+        avgdl = total_len / n_docs
+        scores = np.zeros(len(doc_len), dtype=np.float32)
+        touched = []
+        for t in term_ids:
+            lo, hi = term_ptr[t], term_ptr[t + 1]
+            docs = post_docs[lo:hi]
+            # idf over the whole corpus so filtered and unfiltered scores are comparable
+            df = hi - lo
+            idf = np.log(1.0 + (n_docs - df + 0.5) / (df + 0.5))
+            tf = post_tf[lo:hi]
+            if mask is not None:
+                sel = mask[docs]
+                docs, tf = docs[sel], tf[sel]
+            if not len(docs):
+                continue
+            tf = tf.astype(np.float32)
+            norm = self.k1 * (1.0 - self.b + self.b * doc_len[docs] / avgdl)
+            scores[docs] += idf * tf * (self.k1 + 1.0) / (tf + norm)
+            touched.append(docs)
+        if not touched:
+            return []
+
+        candidates = np.unique(np.concatenate(touched))
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k)[:k]]
+        candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return [(str(doc_ids[i]), float(scores[i])) for i in candidates]
+
+
+def get_bm25_index(name: str = "news", reload: bool = False) -> BM25Index:
+    """
+    Process-wide index per collection; reload=True re-opens the latest saved generation.
+    """
+    with _indexes_lock:
+        idx = _indexes.get(name)
+        if idx is None or (reload and idx.generation != _read_generation(BM25_INDEX_DIR / name)):
+            idx = _indexes[name] = BM25Index(BM25_INDEX_DIR / name)
+        return idx
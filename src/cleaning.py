@@ -1,5 +1,9 @@
 # src/cleaning.py
 import re
+import hashlib
+import sqlite3
+import zlib
+import numpy as np
 from bs4 import BeautifulSoup
 from dateutil import parser as date_parser
 from typing import Optional, Dict, Any, List, Tuple
@@ -69,7 +73,8 @@ def map_tickers(text: str) -> List[str]:
 
 def dedupe_records(records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     """
-    Simple dedupe on (url) then title+body fingerprint.
+    Simple dedupe on (url) then title+body fingerprint (exact, within the batch).
+    Near-duplicates across runs are handled by NearDuplicateIndex below.
     records: list of dicts with keys 'url','title','body','published_at','source'
     """
     seen_urls = set()
@@ -109,3 +114,175 @@ def label_sentiment(text: str) -> Dict[str, Any]:
         "compound": comp,
         "label": label,
     }
+
+# -------------------------------------------------
+# Near-duplicate detection (MinHash + LSH banding)
+# -------------------------------------------------
+NEAR_DUP_DB = Path(__file__).parents[1] / "data" / "near_dupes.sqlite"
+
+MINHASH_PERMUTATIONS = 128
+LSH_BANDS = 32  # 4 rows per band -> candidate threshold ~0.42 Jaccard
+NEAR_DUP_THRESHOLD = 0.7
+SHINGLE_SIZE = 3
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+_near_dup_index = None
+
+
+def _shingles(text: str, size: int = SHINGLE_SIZE) -> set:
+    words = re.findall(r"\w+", (text or "").lower())
+    if len(words) < size:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+class NearDuplicateIndex:
+    """
+    Persistent MinHash/LSH index over article text (SQLite file).
+
+    Each document is keyed by an integer id (raw_news.id) and assigned a cluster id:
+    the id of the first indexed document whose estimated Jaccard similarity is
+    >= threshold, or its own id when nothing similar has been seen before.
+    """
+
+    def __init__(
+        self,
+        path: Path = NEAR_DUP_DB,
+        num_perm: int = MINHASH_PERMUTATIONS,
+        bands: int = LSH_BANDS,
+        threshold: float = NEAR_DUP_THRESHOLD,
+        seed: int = 1,
+    ):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, 1 << 32, size=num_perm, dtype=np.uint64)
+        self._b = rng.randint(0, 1 << 32, size=num_perm, dtype=np.uint64)
+
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.executescript(
+            """
+            PRAGMA journal_mode=WAL;
+            PRAGMA synchronous=NORMAL;
+            CREATE TABLE IF NOT EXISTS minhash_docs (
+                doc_id INTEGER PRIMARY KEY,
+                cluster_id INTEGER NOT NULL,
+                signature BLOB NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS minhash_buckets (
+                bucket INTEGER NOT NULL,
+                doc_id INTEGER NOT NULL,
+                PRIMARY KEY (bucket, doc_id)
+            ) WITHOUT ROWID;
+            """
+        )
+
+    def signature(self, text: str) -> Optional[np.ndarray]:
+        shingles = _shingles(text)
+        if not shingles:
+            return None
+        hv = np.fromiter(
+            (zlib.crc32(s.encode("utf-8")) for s in shingles),
+            dtype=np.uint64,
+            count=len(shingles),
+        )
+        # (a * x + b) mod p, truncated to 32 bits; uint64 overflow wraps, which is fine for hashing
+        phv = ((np.outer(hv, self._a) + self._b) % _MERSENNE_PRIME) & _MAX_HASH
+        return phv.min(axis=0).astype(np.uint32)
+
+    def _buckets(self, sig: np.ndarray) -> List[int]:
+        out = []
+        for band in range(self.bands):
+            chunk = sig[band * self.rows:(band + 1) * self.rows].tobytes()
+            digest = hashlib.blake2b(
+                chunk, digest_size=8, person=band.to_bytes(2, "little")
+            ).digest()
+            out.append(int.from_bytes(digest, "little", signed=True))
+        return out
+
+    def _best_match(self, sig: np.ndarray, buckets: List[int]) -> Optional[Tuple[int, float]]:
+        placeholders = ",".join("?" * len(buckets))
+        rows = self._conn.execute(
+            f"""
+            SELECT d.cluster_id, d.signature FROM minhash_docs d
+            WHERE d.doc_id IN (
+                SELECT DISTINCT doc_id FROM minhash_buckets WHERE bucket IN ({placeholders})
+            )
+            """,
+            buckets,
+        ).fetchall()
+
+        best = None
+        for cluster_id, blob in rows:
+            other = np.frombuffer(blob, dtype=np.uint32)
+            sim = float(np.count_nonzero(other == sig)) / self.num_perm
+            if sim >= self.threshold and (best is None or sim > best[1]):
+                best = (cluster_id, sim)
+        return best
+
+    def query(self, text: str) -> Optional[Tuple[int, float]]:
+        """
+        Returns (cluster_id, estimated_jaccard) of the closest indexed near-duplicate, or None.
+        """
+        sig = self.signature(text)
+        if sig is None:
+            return None
+        return self._best_match(sig, self._buckets(sig))
+
+    def cluster_of(self, doc_id: int) -> Optional[int]:
+        row = self._conn.execute(
+            "SELECT cluster_id FROM minhash_docs WHERE doc_id = ?", (doc_id,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def add(self, doc_id: int, text: str) -> int:
+        """
+        Index a document (idempotent per doc_id) and return its cluster id.
+        Call commit() to persist; batches of inserts share one transaction.
+        """
+        existing = self.cluster_of(doc_id)
+        if existing is not None:
+            return existing
+
+        sig = self.signature(text)
+        if sig is None:
+            return doc_id
+
+        buckets = self._buckets(sig)
+        match = self._best_match(sig, buckets)
+        cluster_id = match[0] if match else doc_id
+
+        self._conn.execute(
+            "INSERT INTO minhash_docs (doc_id, cluster_id, signature) VALUES (?, ?, ?)",
+            (doc_id, cluster_id, sig.tobytes()),
+        )
+        self._conn.executemany(
+            "INSERT OR IGNORE INTO minhash_buckets (bucket, doc_id) VALUES (?, ?)",
+            [(b, doc_id) for b in buckets],
+        )
+        return cluster_id
+
+    def commit(self):
+        self._conn.commit()
+
+    def count(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM minhash_docs").fetchone()[0]
+
+    def close(self):
+        self._conn.commit()
+        self._conn.close()
+
+
+def get_near_dup_index() -> NearDuplicateIndex:
+    global _near_dup_index
+    if _near_dup_index is None:
+        _near_dup_index = NearDuplicateIndex()
+    return _near_dup_index
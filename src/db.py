@@ -1,20 +1,207 @@
+# src/db.py
+"""
+One engine factory for the whole process.
+
+- engine / SessionLocal   sync engine (psycopg2) for scripts, ORM sessions and feature reads
+- get_async_engine()      optional asyncpg engine for API read paths (DB_ASYNC_ENABLED=1)
+- read_connection() / async_read_connection()
+                          timed pool checkouts; pool_stats() reports checkout latency
+                          percentiles, timeouts and pool saturation per engine
+
+Postgres connections get a server-side statement_timeout. Compiled SQL is cached
+per engine (query_cache_size); the asyncpg engine also keeps a per-connection
+prepared statement cache, so repeated read queries skip parse/plan.
+"""
+
+import os
+import time
+import threading
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import Deque, Dict, Optional
+
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeout
 from sqlalchemy.orm import sessionmaker, declarative_base
 from src.config import DATABASE_URL
 
-engine = create_engine(
-    DATABASE_URL,
-    pool_pre_ping=True,
-    pool_size=10,
-    max_overflow=20,
-)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "30000"))
+DB_QUERY_CACHE_SIZE = int(os.getenv("DB_QUERY_CACHE_SIZE", "500"))
+
+DB_ASYNC_ENABLED = os.getenv("DB_ASYNC_ENABLED", "0") == "1"
+DB_ASYNC_POOL_SIZE = int(os.getenv("DB_ASYNC_POOL_SIZE", "10"))
+DB_ASYNC_MAX_OVERFLOW = int(os.getenv("DB_ASYNC_MAX_OVERFLOW", "10"))
+DB_PREPARED_STATEMENT_CACHE_SIZE = int(os.getenv("DB_PREPARED_STATEMENT_CACHE_SIZE", "256"))
+
+_CHECKOUT_SAMPLES = 2048
+
+
+def async_database_url(url: str = DATABASE_URL) -> str:
+    """
+    ASYNC_DATABASE_URL, or DATABASE_URL with the driver switched to asyncpg.
+    """
+    if os.getenv("ASYNC_DATABASE_URL"):
+        return os.environ["ASYNC_DATABASE_URL"]
+    u = make_url(url)
+    if u.get_backend_name() == "postgresql":
+        u = u.set(drivername="postgresql+asyncpg")
+    return u.render_as_string(hide_password=False)
+
+
+def _engine_kwargs(url, pool_size: int, max_overflow: int) -> dict:
+    kwargs = {"pool_pre_ping": True, "query_cache_size": DB_QUERY_CACHE_SIZE}
+    if url.get_backend_name() != "sqlite":
+        # sqlite uses its own single-connection pools
+        kwargs.update(
+            pool_size=pool_size,
+            max_overflow=max_overflow,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
+        )
+    return kwargs
+
+
+def make_engine(url: str = DATABASE_URL, pool_size: int = DB_POOL_SIZE, max_overflow: int = DB_MAX_OVERFLOW):
+    u = make_url(url)
+    kwargs = _engine_kwargs(u, pool_size, max_overflow)
+    if u.get_backend_name() == "postgresql" and DB_STATEMENT_TIMEOUT_MS > 0:
+        kwargs["connect_args"] = {"options": f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"}
+    return create_engine(u, **kwargs)
+
+
+def make_async_engine(
+    url: Optional[str] = None,
+    pool_size: int = DB_ASYNC_POOL_SIZE,
+    max_overflow: int = DB_ASYNC_MAX_OVERFLOW,
+):
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    u = make_url(url or async_database_url())
+    kwargs = _engine_kwargs(u, pool_size, max_overflow)
+    if u.get_backend_name() == "postgresql":
+        u = u.update_query_dict({"prepared_statement_cache_size": str(DB_PREPARED_STATEMENT_CACHE_SIZE)})
+        if DB_STATEMENT_TIMEOUT_MS > 0:
+            kwargs["connect_args"] = {"server_settings": {"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)}}
+    return create_async_engine(u, **kwargs)
+
+
+class _PoolMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._checkouts: Deque[float] = deque(maxlen=_CHECKOUT_SAMPLES)
+        self.count = 0
+        self.timeouts = 0
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._checkouts.append(seconds)
+            self.count += 1
+
+    def timeout(self):
+        with self._lock:
+            self.timeouts += 1
+
+    def stats(self, pool) -> Dict[str, float]:
+        import numpy as np
+
+        with self._lock:
+            ms = np.array(self._checkouts) * 1000 if self._checkouts else np.zeros(1)
+        out = {
+            "checkouts": self.count,
+            "checkout_timeouts": self.timeouts,
+            "checkout_ms_p50": float(np.percentile(ms, 50)),
+            "checkout_ms_p95": float(np.percentile(ms, 95)),
+            "checkout_ms_p99": float(np.percentile(ms, 99)),
+        }
+        if hasattr(pool, "checkedout") and hasattr(pool, "size"):
+            capacity = pool.size() + max(0, getattr(pool, "_max_overflow", 0))
+            out.update(
+                checked_out=pool.checkedout(),
+                pool_size=pool.size(),
+                pool_capacity=capacity,
+                saturation=pool.checkedout() / capacity if capacity else 0.0,
+            )
+        return out
+
+
+engine = make_engine()
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+_sync_metrics = _PoolMetrics()
+_async_metrics = _PoolMetrics()
+_async_engine = None
+_async_lock = threading.Lock()
+
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+
+def get_async_engine():
+    """
+    Process-wide async engine, created on first use. Requires DB_ASYNC_ENABLED=1
+    and the asyncpg driver.
+    """
+    global _async_engine
+    if not DB_ASYNC_ENABLED:
+        raise RuntimeError("Async database engine is disabled (set DB_ASYNC_ENABLED=1)")
+    with _async_lock:
+        if _async_engine is None:
+            _async_engine = make_async_engine()
+        return _async_engine
+
+
+@contextmanager
+def read_connection():
+    start = time.perf_counter()
+    try:
+        conn = engine.connect()
+    except PoolTimeout:
+        _sync_metrics.timeout()
+        raise
+    _sync_metrics.record(time.perf_counter() - start)
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+@asynccontextmanager
+async def async_read_connection():
+    conn = get_async_engine().connect()
+    start = time.perf_counter()
+    try:
+        await conn.start()
+    except PoolTimeout:
+        _async_metrics.timeout()
+        raise
+    _async_metrics.record(time.perf_counter() - start)
+    try:
+        yield conn
+    finally:
+        await conn.close()
+
+
+async def dispose_async_engine():
+    global _async_engine
+    if _async_engine is not None:
+        await _async_engine.dispose()
+        _async_engine = None
+
+
+def pool_stats() -> Dict[str, Dict[str, float]]:
+    stats = {"sync": _sync_metrics.stats(engine.pool)}
+    if _async_engine is not None:
+        stats["async"] = _async_metrics.stats(_async_engine.sync_engine.pool)
+    return stats
@@ -0,0 +1,227 @@
+# src/embedding_cache.py
+"""
+Persistent embedding cache keyed by (embedding model, task type, hash of normalized text).
+
+On-disk layout per model (EMBEDDING_CACHE_DIR/<model key>/):
+- vectors.f32  append-only float32 matrix (rows x dim), read through np.memmap
+- keys.u64     append-only uint64 text hashes, row-aligned with vectors.f32
+- meta.json    {"model": ..., "dim": ...}
+
+The hash -> row index is rebuilt in memory from keys.u64 on open. Rows written
+by an interrupted append (vectors without a key) are ignored. compact() rewrites
+both files without superseded or unwanted rows.
+
+Several processes share one directory (build_vectorstore, stream_news).
+Appends and compaction hold an exclusive fcntl lock on <dir>/lock and number
+rows from the file sizes under it, never from this process's own count; a lookup miss re-reads keys appended since (or the whole
+file after another process compacted it).
+"""
+
+import os
+import re
+import json
+import hashlib
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # non-POSIX: single writer per directory
+    fcntl = None
+
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "1") == "1"
+EMBEDDING_CACHE_DIR = Path(
+    os.getenv("EMBEDDING_CACHE_DIR", str(Path(__file__).parents[1] / "data" / "embedding_cache"))
+)
+
+_caches: Dict[str, "EmbeddingCache"] = {}
+_caches_lock = threading.Lock()
+
+
+def text_hash(text: str, task_type: str = "") -> int:
+    normalized = re.sub(r"\s+", " ", text or "").strip()
+    digest = hashlib.blake2b(f"{task_type}\x00{normalized}".encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+class EmbeddingCache:
+    def __init__(self, model_key: str, root: Path = EMBEDDING_CACHE_DIR):
+        self.model_key = model_key
+        self.dir = Path(root) / re.sub(r"[^A-Za-z0-9_.-]+", "_", model_key)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self._vectors_path = self.dir / "vectors.f32"
+        self._keys_path = self.dir / "keys.u64"
+        self._meta_path = self.dir / "meta.json"
+        self._lock_path = self.dir / "lock"
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "writes": 0}
+        self.dim: Optional[int] = None
+        self._index: Dict[int, int] = {}
+        self._rows = 0
+        self._keys_ino: Optional[int] = None
+        self._mmap: Optional[np.memmap] = None
+        with self._lock, self._file_lock(shared=True):
+            self._refresh()
+
+    # -------------------------------------------------
+    # Storage
+    # -------------------------------------------------
+    @contextmanager
+    def _file_lock(self, shared: bool = False):
+        if fcntl is None:
+            yield
+            return
+        with open(self._lock_path, "a+b") as f:
+            fcntl.flock(f, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _load_meta(self):
+        if self.dim is None and self._meta_path.exists():
+            with open(self._meta_path, "r", encoding="utf-8") as f:
+                self.dim = json.load(f)["dim"]
+
+    def _aligned_rows(self) -> int:
+        """
+        Rows present in both files (a crashed append can leave vectors without keys).
+        """
+        keys = self._keys_path.stat().st_size // 8 if self._keys_path.exists() else 0
+        vectors = self._vectors_path.stat().st_size // (4 * self.dim) if self._vectors_path.exists() else 0
+        return min(keys, vectors)
+
+    def _refresh(self):
+        """
+        Index rows appended since the last look, by any process. Caller holds the file lock.
+        """
+        self._load_meta()
+        if self.dim is None or not self._keys_path.exists():
+            return
+        ino = self._keys_path.stat().st_ino
+        if ino != self._keys_ino:
+            # first open, or another process compacted (replaced) the files
+            self._keys_ino = ino
+            self._index, self._rows = {}, 0
+        end = self._aligned_rows()
+        if end <= self._rows:
+            return
+        keys = np.fromfile(self._keys_path, dtype=np.uint64, count=end - self._rows, offset=self._rows * 8)
+        # later rows win for duplicate keys
+        for i, k in enumerate(keys):
+            self._index[int(k)] = self._rows + i
+        self._rows = end
+        self._remap()
+
+    def _remap(self):
+        if self._rows and self.dim:
+            self._mmap = np.memmap(self._vectors_path, dtype=np.float32, mode="r", shape=(self._rows, self.dim))
+        else:
+            self._mmap = None
+
+    def _init_dim(self, dim: int):
+        self.dim = dim
+        with open(self._meta_path, "w", encoding="utf-8") as f:
+            json.dump({"model": self.model_key, "dim": dim}, f)
+
+    # -------------------------------------------------
+    # Public API
+    # -------------------------------------------------
+    def get_many(self, hashes: Sequence[int]) -> List[Optional[np.ndarray]]:
+        with self._lock:
+            if any(h not in self._index for h in hashes):
+                with self._file_lock(shared=True):
+                    self._refresh()
+            out = []
+            for h in hashes:
+                row = self._index.get(h)
+                if row is None:
+                    self._stats["misses"] += 1
+                    out.append(None)
+                else:
+                    self._stats["hits"] += 1
+                    out.append(self._mmap[row])
+            return out
+
+    def put_many(self, hashes: Sequence[int], vectors: Sequence[Sequence[float]]):
+        if not hashes:
+            return
+        arr = np.asarray(vectors, dtype=np.float32)
+        with self._lock, self._file_lock():
+            self._load_meta()
+            if self.dim is None:
+                self._init_dim(arr.shape[1])
+            if arr.shape[1] != self.dim:
+                raise ValueError(f"Embedding dim {arr.shape[1]} != cached dim {self.dim} for {self.model_key}")
+            # drop a crashed writer's unkeyed tail so the new rows line up in both files
+            rows = self._aligned_rows()
+            for path, width in ((self._vectors_path, 4 * self.dim), (self._keys_path, 8)):
+                if path.exists() and path.stat().st_size != rows * width:
+                    os.truncate(path, rows * width)
+            # vectors first: a crash between the two writes leaves an unreferenced row, never a bad key
+            with open(self._vectors_path, "ab") as f:
+                f.write(arr.tobytes())
+            with open(self._keys_path, "ab") as f:
+                f.write(np.asarray(hashes, dtype=np.uint64).tobytes())
+            self._stats["writes"] += len(hashes)
+            # indexes other processes' rows too, then ours at their real offsets
+            self._refresh()
+
+    def compact(self, keep: Optional[Iterable[int]] = None) -> int:
+        """
+        Rewrite the cache keeping one row per live key (optionally only keys in `keep`).
+        Returns the number of rows dropped.
+        """
+        with self._lock, self._file_lock():
+            self._refresh()
+            if not self._rows:
+                return 0
+            if keep is None:
+                live = self._index
+            else:
+                keep = set(keep)
+                live = {h: r for h, r in self._index.items() if h in keep}
+            hashes = np.fromiter(live.keys(), dtype=np.uint64, count=len(live))
+            rows = np.fromiter(live.values(), dtype=np.int64, count=len(live))
+            order = np.argsort(rows)
+            hashes, rows = hashes[order], rows[order]
+
+            tmp_vectors = self._vectors_path.with_suffix(".tmp")
+            tmp_keys = self._keys_path.with_suffix(".tmp")
+            np.ascontiguousarray(self._mmap[rows]).tofile(tmp_vectors)
+            hashes.tofile(tmp_keys)
+            self._mmap = None
+            os.replace(tmp_vectors, self._vectors_path)
+            os.replace(tmp_keys, self._keys_path)
+
+            dropped = self._rows - len(rows)
+            self._index = {int(h): i for i, h in enumerate(hashes)}
+            self._rows = len(rows)
+            self._keys_ino = self._keys_path.stat().st_ino
+            self._remap()
+            return dropped
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._index)
+            stats["rows"] = self._rows
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+
+def get_embedding_cache(model_key: str) -> Optional[EmbeddingCache]:
+    """
+    Process-wide cache per model, or None when EMBEDDING_CACHE_ENABLED=0.
+    """
+    if not EMBEDDING_CACHE_ENABLED:
+        return None
+    with _caches_lock:
+        if model_key not in _caches:
+            _caches[model_key] = EmbeddingCache(model_key)
+        return _caches[model_key]
@@ -1,25 +1,232 @@
 # src/embeddings.py
 """
-Gemini embeddings for Chroma vector store.
+Embeddings for the Chroma vector store.
+
+- Pluggable providers (EMBEDDING_PROVIDER): "gemini" (default), "local"
+  (sentence-transformers, EMBEDDING_LOCAL_MODEL) for offline runs and tests,
+  or "stub" (hashed bag of words, configurable latency) for benchmarks
+- Texts are split into batches of the provider's max batch size; up to
+  EMBEDDING_MAX_IN_FLIGHT batches run concurrently, each retried with jittered
+  exponential backoff; results come back in input order
+- Document vectors (task type in EMBEDDING_CACHE_TASK_TYPES) are cached on
+  disk by (model, task type, normalized text hash) (src.embedding_cache);
+  repeated texts are embedded once. Query embeddings are not persisted: user
+  queries are unbounded, so they only live in the retriever's in-memory LRU
+
+Providers produce different dimensions: a collection must be built and queried
+with the same provider.
 """
 
 import os
-import google.generativeai as genai
+import re
+import time
+import random
+import hashlib
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
 from typing import List
 
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+from src.embedding_cache import get_embedding_cache, text_hash
+from src.observability.metrics import timer
 
+EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "gemini")
 EMBEDDING_MODEL = "models/embedding-001"
+EMBEDDING_LOCAL_MODEL = os.getenv("EMBEDDING_LOCAL_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+EMBEDDING_MAX_IN_FLIGHT = int(os.getenv("EMBEDDING_MAX_IN_FLIGHT", "4"))
+EMBEDDING_MAX_RETRIES = int(os.getenv("EMBEDDING_MAX_RETRIES", "4"))
+EMBEDDING_BACKOFF_BASE_SEC = float(os.getenv("EMBEDDING_BACKOFF_BASE_SEC", "0.5"))
+EMBEDDING_BACKOFF_MAX_SEC = float(os.getenv("EMBEDDING_BACKOFF_MAX_SEC", "20"))
+EMBEDDING_STUB_DIM = int(os.getenv("EMBEDDING_STUB_DIM", "256"))
+EMBEDDING_STUB_LATENCY_SEC = float(os.getenv("EMBEDDING_STUB_LATENCY_SEC", "0.05"))
+EMBEDDING_CACHE_TASK_TYPES = ("retrieval_document",)
 
-def embed_texts(texts: List[str]) -> List[List[float]]:
-    embeddings = []
 
-    for text in texts:
-        result = genai.embed_content(
-            model=EMBEDDING_MODEL,
-            content=text,
-            task_type="retrieval_document",
+class EmbeddingProvider(ABC):
+    """
+    Interface: embed one batch (<= max_batch_size texts), returning vectors in order.
+    """
+
+    name = "base"
+    model = ""
+    max_batch_size = 1
+
+    @property
+    def cache_key(self) -> str:
+        return f"{self.name}:{self.model}"
+
+    @abstractmethod
+    def embed_batch(self, texts: List[str], task_type: str) -> List[List[float]]:
+        ...
+
+
+class GeminiEmbeddingProvider(EmbeddingProvider):
+    name = "gemini"
+    max_batch_size = 100  # batchEmbedContents limit
+
+    def __init__(self, model: str = EMBEDDING_MODEL):
+        self.model = model
+        self._genai = None
+
+    def _client(self):
+        if self._genai is None:
+            # deferred: the SDK import is slow and only this provider needs it
+            import google.generativeai as genai
+
+            genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+            self._genai = genai
+        return self._genai
+
+    def embed_batch(self, texts: List[str], task_type: str) -> List[List[float]]:
+        result = self._client().embed_content(
+            model=self.model,
+            content=texts,
+            task_type=task_type,
         )
-        embeddings.append(result["embedding"])
+        return result["embedding"]
+
+
+class SentenceTransformerProvider(EmbeddingProvider):
+    """
+    Local CPU embeddings; the model is loaded once, on first use.
+    """
+
+    name = "local"
+    max_batch_size = 256
+
+    def __init__(self, model: str = EMBEDDING_LOCAL_MODEL):
+        self.model = model
+        self._st = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._st is None:
+            with self._lock:
+                if self._st is None:
+                    from sentence_transformers import SentenceTransformer
+
+                    self._st = SentenceTransformer(self.model, device="cpu")
+        return self._st
+
+    def embed_batch(self, texts: List[str], task_type: str) -> List[List[float]]:
+        vectors = self._load().encode(texts, batch_size=64, normalize_embeddings=True)
+        return vectors.tolist()
+
+
+class StubEmbeddingProvider(EmbeddingProvider):
+    """
+    Offline and deterministic: signed feature hashing of the words, L2-normalized,
+    after a fixed per-batch delay (EMBEDDING_STUB_LATENCY_SEC). Texts sharing
+    words land close together, so retrieval results are meaningful.
+    """
+
+    name = "stub"
+    max_batch_size = 100
+
+    def __init__(self, dim: int = EMBEDDING_STUB_DIM):
+        import numpy as np
 
+        self._np = np
+        self.dim = dim
+        self.model = f"hash-{dim}"
+
+    def _vector(self, text: str):
+        v = self._np.zeros(self.dim, dtype=self._np.float32)
+        for word in re.findall(r"\w+", text.lower()):
+            h = int.from_bytes(hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest(), "little")
+            v[h % self.dim] += 1.0 if (h >> 63) else -1.0
+        norm = float(self._np.linalg.norm(v))
+        return v / norm if norm else v
+
+    def embed_batch(self, texts: List[str], task_type: str) -> List[List[float]]:
+        time.sleep(EMBEDDING_STUB_LATENCY_SEC)
+        return [self._vector(t).tolist() for t in texts]
+
+
+_PROVIDERS = {
+    "gemini": GeminiEmbeddingProvider,
+    "local": SentenceTransformerProvider,
+    "stub": StubEmbeddingProvider,
+}
+
+_provider = None
+_executor = None
+
+
+def get_embedding_provider() -> EmbeddingProvider:
+    global _provider
+    if _provider is None:
+        name = EMBEDDING_PROVIDER.lower()
+        if name not in _PROVIDERS:
+            raise ValueError(f"Unknown embedding provider: {name}")
+        _provider = _PROVIDERS[name]()
+    return _provider
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=EMBEDDING_MAX_IN_FLIGHT, thread_name_prefix="embed")
+    return _executor
+
+
+def _embed_with_retries(provider: EmbeddingProvider, texts: List[str], task_type: str) -> List[List[float]]:
+    for attempt in range(EMBEDDING_MAX_RETRIES + 1):
+        try:
+            with timer("embedding_call"):
+                vectors = provider.embed_batch(texts, task_type)
+            if len(vectors) != len(texts):
+                raise RuntimeError(f"{provider.name} returned {len(vectors)} embeddings for {len(texts)} texts")
+            return vectors
+        except Exception:
+            if attempt == EMBEDDING_MAX_RETRIES:
+                raise
+            time.sleep(random.uniform(0, min(EMBEDDING_BACKOFF_MAX_SEC, EMBEDDING_BACKOFF_BASE_SEC * (2 ** attempt))))
+
+
+def _embed_uncached(provider: EmbeddingProvider, texts: List[str], task_type: str) -> List[List[float]]:
+    size = provider.max_batch_size
+    batches = [texts[i:i + size] for i in range(0, len(texts), size)]
+
+    if len(batches) == 1:
+        return _embed_with_retries(provider, batches[0], task_type)
+
+    # executor.map preserves input order
+    embeddings = []
+    for vectors in _get_executor().map(lambda b: _embed_with_retries(provider, b, task_type), batches):
+        embeddings.extend(vectors)
     return embeddings
+
+
+def embed_texts(texts: List[str], task_type: str = "retrieval_document") -> List[List[float]]:
+    texts = list(texts)
+    if not texts:
+        return []
+    provider = get_embedding_provider()
+    cache = get_embedding_cache(provider.cache_key) if task_type in EMBEDDING_CACHE_TASK_TYPES else None
+    if cache is None:
+        return _embed_uncached(provider, texts, task_type)
+
+    hashes = [text_hash(t, task_type) for t in texts]
+    cached = cache.get_many(hashes)
+
+    # embed each distinct missing text once
+    missing = {}
+    for h, t, v in zip(hashes, texts, cached):
+        if v is None and h not in missing:
+            missing[h] = t
+    fresh = {}
+    if missing:
+        vectors = _embed_uncached(provider, list(missing.values()), task_type)
+        cache.put_many(list(missing.keys()), vectors)
+        fresh = dict(zip(missing.keys(), vectors))
+
+    return [
+        fresh[h] if v is None else v.tolist()
+        for h, v in zip(hashes, cached)
+    ]
+
+
+def embedding_cache_stats() -> dict:
+    cache = get_embedding_cache(get_embedding_provider().cache_key)
+    return cache.stats() if cache is not None else {}
@@ -0,0 +1,77 @@
+# src/executors.py
+"""
+Dedicated, independently sized worker pools for blocking work called from
+async request handlers, so a slow dependency only exhausts its own pool
+(not Starlette's shared threadpool that every sync `def` handler uses):
+
+- predict    CPU-bound feature building + model scoring (PREDICT_POOL_KIND=process|thread)
+- retrieve   blocking vector-store / embedding calls (threads)
+- local_ml   local model inference, e.g. the HF sentiment provider (threads)
+
+Network-bound providers with native async clients (Gemini) are awaited
+directly and never take a pool worker.
+"""
+
+import os
+import asyncio
+import functools
+import threading
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+from src.observability import metrics
+
+POOL_SIZES = {
+    "predict": int(os.getenv("PREDICT_POOL_SIZE", str(min(4, os.cpu_count() or 1)))),
+    "retrieve": int(os.getenv("RETRIEVE_POOL_SIZE", "32")),
+    "local_ml": int(os.getenv("LOCAL_ML_POOL_SIZE", "1")),
+}
+POOL_KINDS = {
+    "predict": os.getenv("PREDICT_POOL_KIND", "process"),
+    "retrieve": "thread",
+    "local_ml": "thread",
+}
+
+_pools: Dict[str, Executor] = {}
+_lock = threading.Lock()
+
+
+def get_pool(name: str) -> Executor:
+    with _lock:
+        if name not in _pools:
+            if name not in POOL_SIZES:
+                raise ValueError(f"Unknown pool: {name}")
+            if POOL_KINDS[name] == "process":
+                # spawn: workers must not inherit the parent's DB connections or threads
+                _pools[name] = ProcessPoolExecutor(
+                    max_workers=POOL_SIZES[name],
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            else:
+                _pools[name] = ThreadPoolExecutor(max_workers=POOL_SIZES[name], thread_name_prefix=name)
+        return _pools[name]
+
+
+def _call_and_drain_metrics(fn: Callable[..., Any], *args, **kwargs):
+    # runs in a worker process: hand back the stage metrics it recorded with the result
+    result = fn(*args, **kwargs)
+    return result, metrics.drain()
+
+
+async def run_in_pool(name: str, fn: Callable[..., Any], *args, **kwargs) -> Any:
+    loop = asyncio.get_running_loop()
+    if POOL_KINDS[name] == "process":
+        result, deltas = await loop.run_in_executor(
+            get_pool(name), functools.partial(_call_and_drain_metrics, fn, *args, **kwargs)
+        )
+        metrics.merge(deltas)
+        return result
+    return await loop.run_in_executor(get_pool(name), functools.partial(fn, *args, **kwargs))
+
+
+def shutdown_pools(wait: bool = True):
+    with _lock:
+        for pool in _pools.values():
+            pool.shutdown(wait=wait, cancel_futures=True)
+        _pools.clear()
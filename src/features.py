@@ -2,33 +2,89 @@
 """
 Feature engineering: merge price_history + daily_sentiment (vader) + llm sentiment.
 Creates daily supervised learning dataset for next-day price direction prediction.
+Rolling / decayed sentiment columns are joined from the materialized
+sentiment_features table (see src/sentiment_features.py).
+
+Inputs are read per ticker, either through the shared sync engine
+(load_feature_inputs) or the async engine on API read paths
+(load_feature_inputs_async); build_features turns them into the dataset.
 """
 
 import pandas as pd
-from sqlalchemy import create_engine
-from src.config import DATABASE_URL
 from sqlalchemy import text
+from src.db import read_connection, async_read_connection
+from src.observability.metrics import timer
+from src.sentiment_features import (
+    load_sentiment_features,
+    load_sentiment_features_async,
+    FEATURE_COLUMNS as SENTIMENT_FEATURE_COLUMNS,
+)
+
+PRICE_COLUMNS = ["ticker", "date", "open", "high", "low", "close", "adj_close", "volume"]
+SENTIMENT_COLUMNS = ["ticker", "date", "avg_compound", "article_count", "pct_positive", "pct_negative", "model_version"]
+
+_PRICES_SQL = f"SELECT {', '.join(PRICE_COLUMNS)} FROM price_history"
+_SENTIMENT_SQL = f"SELECT {', '.join(SENTIMENT_COLUMNS)} FROM daily_sentiment"
+
+
+def _ticker_query(sql: str, ticker=None):
+    where = " WHERE ticker = :t" if ticker is not None else ""
+    return text(f"{sql}{where} ORDER BY date ASC"), ({"t": ticker} if ticker is not None else {})
+
+
+def load_price_history(ticker=None):
+    q, params = _ticker_query(_PRICES_SQL, ticker)
+    with read_connection() as conn:
+        return pd.read_sql(q, conn, params=params, parse_dates=["date"])
+
+def load_daily_sentiment(ticker=None):
+    q, params = _ticker_query(_SENTIMENT_SQL, ticker)
+    with read_connection() as conn:
+        return pd.read_sql(q, conn, params=params, parse_dates=["date"])
+
 
-engine = create_engine(DATABASE_URL)
+def load_feature_inputs(ticker: str, sentiment_model: str = "vader-v1"):
+    with timer("db_load"):
+        return (
+            load_price_history(ticker),
+            load_daily_sentiment(ticker),
+            load_sentiment_features(ticker, sentiment_model),
+        )
 
-def load_price_history():
-    q = """
-    SELECT ticker, date, open, high, low, close, adj_close, volume
-    FROM price_history
-    ORDER BY date ASC
+
+async def _fetch_frame(sql: str, ticker: str, columns) -> pd.DataFrame:
+    q, params = _ticker_query(sql, ticker)
+    async with async_read_connection() as conn:
+        rows = (await conn.execute(q, params)).all()
+    df = pd.DataFrame(rows, columns=columns)
+    df["date"] = pd.to_datetime(df["date"])
+    return df
+
+
+async def load_feature_inputs_async(ticker: str, sentiment_model: str = "vader-v1"):
+    """
+    Same inputs as load_feature_inputs, read through the async engine so the
+    event loop never blocks on the database.
     """
-    return pd.read_sql(q, engine, parse_dates=["date"])
+    with timer("db_load"):
+        return (
+            await _fetch_frame(_PRICES_SQL, ticker, PRICE_COLUMNS),
+            await _fetch_frame(_SENTIMENT_SQL, ticker, SENTIMENT_COLUMNS),
+            await load_sentiment_features_async(ticker, sentiment_model),
+        )
 
-def load_daily_sentiment():
-    q = """
-    SELECT ticker, date, avg_compound, article_count, pct_positive, pct_negative, model_version
-    FROM daily_sentiment
-    ORDER BY date ASC
+
+def make_features(ticker="RELIANCE.NS", sentiment_model="vader-v1", inputs=None):
+    """
+    `inputs` is a (prices, daily_sentiment, sentiment_features) tuple already
+    loaded for this ticker; it is read through the sync engine when omitted.
     """
-    return pd.read_sql(q, engine, parse_dates=["date"])
+    prices, sent, rolling = inputs if inputs is not None else load_feature_inputs(ticker, sentiment_model)
+    with timer("feature_build"):
+        return build_features(prices, sent, rolling, ticker, sentiment_model)
 
-def make_features(ticker="RELIANCE.NS", sentiment_model="vader-v1"):
-    prices = load_price_history()
+
+def build_features(prices, sent, rolling, ticker, sentiment_model="vader-v1"):
     prices = prices[prices["ticker"] == ticker].copy()
 
     # returns
@@ -38,7 +94,6 @@ def make_features(ticker="RELIANCE.NS", sentiment_model="vader-v1"):
     prices["vol_change"] = prices["volume"].pct_change()
 
     # sentiment
-    sent = load_daily_sentiment()
     sent = sent[(sent["ticker"] == ticker) & (sent["model_version"] == sentiment_model)]
 
     df = prices.merge(sent, on=["ticker", "date"], how="left")
@@ -49,6 +104,10 @@ def make_features(ticker="RELIANCE.NS", sentiment_model="vader-v1"):
     df["pct_negative"] = df["pct_negative"].fillna(0)
     df["article_count"] = df["article_count"].fillna(0)
 
+    # materialized rolling sentiment (no per-request window computation)
+    df = df.merge(rolling.drop(columns=["ticker"]), on="date", how="left")
+    df[SENTIMENT_FEATURE_COLUMNS] = df[SENTIMENT_FEATURE_COLUMNS].astype(float).fillna(0)
+
     # Target variable: next-day direction
     df["target"] = df["return_1d"].shift(-1)
     df["target_class"] = df["target"].apply(lambda x: 1 if x > 0 else 0)
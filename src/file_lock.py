@@ -0,0 +1,31 @@
+# src/file_lock.py
+"""
+Advisory fcntl lock on a file, for on-disk indexes written by several
+processes (the nightly build, the intraday stream, API workers).
+"""
+
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # non-POSIX: single writer per directory
+    fcntl = None
+
+
+@contextmanager
+def file_lock(path: Path, shared: bool = False):
+    """
+    Hold an exclusive (or shared) lock on `path`, created if missing.
+    Locks are per open file: do not nest two on the same path in one process.
+    """
+    if fcntl is None:
+        yield
+        return
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a+b") as f:
+        fcntl.flock(f, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
@@ -0,0 +1,98 @@
+# src/hf_sentiment.py
+"""
+Local CPU transformer sentiment classifier (HF_SENTIMENT_MODEL, default ProsusAI/finbert).
+
+- Tokenizer/model loaded once per process (torch/transformers imported lazily)
+- Inputs sorted by token length and batched, each batch padded to its longest item;
+  callers pass a window of HF_SORT_WINDOW texts so the sort has something to reorder
+- Intra-op threads set by HF_NUM_THREADS; inference is serialized so concurrent
+  callers don't oversubscribe the CPU
+"""
+
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Any, List
+
+from dotenv import load_dotenv
+
+load_dotenv(Path(__file__).parents[1] / ".env")
+
+HF_SENTIMENT_MODEL = os.getenv("HF_SENTIMENT_MODEL") or "ProsusAI/finbert"
+HF_BATCH_SIZE = int(os.getenv("HF_BATCH_SIZE", "32"))
+HF_SORT_WINDOW = int(os.getenv("HF_SORT_WINDOW", str(HF_BATCH_SIZE * 8)))
+HF_MAX_LENGTH = int(os.getenv("HF_MAX_LENGTH", "256"))
+HF_NUM_THREADS = int(os.getenv("HF_NUM_THREADS", "0"))  # 0 = torch default
+
+_tokenizer = None
+_model = None
+_load_lock = threading.Lock()
+_infer_lock = threading.Lock()
+
+
+def _load():
+    global _tokenizer, _model
+    if _model is None:
+        with _load_lock:
+            if _model is None:
+                import torch
+                from transformers import AutoTokenizer, AutoModelForSequenceClassification
+
+                if HF_NUM_THREADS > 0:
+                    torch.set_num_threads(HF_NUM_THREADS)
+                _tokenizer = AutoTokenizer.from_pretrained(HF_SENTIMENT_MODEL)
+                model = AutoModelForSequenceClassification.from_pretrained(HF_SENTIMENT_MODEL)
+                model.to("cpu")
+                model.eval()
+                _model = model
+    return _tokenizer, _model
+
+
+def _normalize_label(raw: str) -> str:
+    raw = str(raw).lower()
+    if raw.startswith("pos"):
+        return "positive"
+    if raw.startswith("neg"):
+        return "negative"
+    return "neutral"
+
+
+def article_text(title: str, body: str) -> str:
+    return f"{title or ''}. {body or ''}".strip()
+
+
+def classify_texts(texts: List[str], batch_size: int = None) -> List[Dict[str, Any]]:
+    """
+    Returns one {"label", "confidence", "rationale"} dict per input text, in input order.
+    The whole list is length-sorted and cut into forward passes of batch_size.
+    """
+    if not texts:
+        return []
+    import torch
+
+    tokenizer, model = _load()
+    batch_size = batch_size or HF_BATCH_SIZE
+    id2label = model.config.id2label
+
+    # tokenize once without padding, then pad per length-sorted batch
+    encoded = tokenizer(list(texts), truncation=True, max_length=HF_MAX_LENGTH)
+    order = sorted(range(len(texts)), key=lambda i: len(encoded["input_ids"][i]))
+
+    results: List[Dict[str, Any]] = [None] * len(texts)
+    with _infer_lock, torch.inference_mode():
+        for start in range(0, len(order), batch_size):
+            idx = order[start:start + batch_size]
+            batch = tokenizer.pad(
+                {k: [encoded[k][i] for i in idx] for k in encoded.keys()},
+                padding="longest",
+                return_tensors="pt",
+            )
+            probs = torch.softmax(model(**batch).logits, dim=-1)
+            conf, pred = probs.max(dim=-1)
+            for j, i in enumerate(idx):
+                results[i] = {
+                    "label": _normalize_label(id2label[int(pred[j])]),
+                    "confidence": float(conf[j]),
+                    "rationale": f"hf:{HF_SENTIMENT_MODEL}",
+                }
+    return results
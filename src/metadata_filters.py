@@ -0,0 +1,54 @@
+# src/metadata_filters.py
+"""
+Chroma-style `where` clauses -> column filters for the local indexes
+(BM25 and the ANN vector backend), which keep ticker and published time as
+columns and apply them before scoring.
+
+Supported: ticker ($eq / $in), published_at ranges ($gt/$gte/$lt/$lte), $and.
+"""
+
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+
+def to_timestamp(value) -> Optional[int]:
+    """
+    datetime / ISO string / epoch number -> epoch seconds (naive datetimes are UTC).
+    """
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)) or hasattr(value, "dtype"):
+        return int(value)
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp())
+
+
+def parse_where(where: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Returns kwargs among tickers / start_ts / end_ts (inclusive bounds).
+    Raises ValueError for clauses the column filters cannot express.
+    """
+    args: Dict[str, Any] = {}
+    if not where:
+        return args
+    clauses = where["$and"] if "$and" in where else [{k: v} for k, v in where.items()]
+    for clause in clauses:
+        for key, cond in clause.items():
+            if not isinstance(cond, dict):
+                cond = {"$eq": cond}
+            for op, value in cond.items():
+                if key == "ticker" and op in ("$eq", "$in"):
+                    tickers = [value] if op == "$eq" else list(value)
+                    args["tickers"] = tickers if "tickers" not in args else [t for t in args["tickers"] if t in tickers]
+                elif key == "published_at" and op in ("$gt", "$gte"):
+                    ts = to_timestamp(value) + (op == "$gt")
+                    args["start_ts"] = max(ts, args.get("start_ts", ts))
+                elif key == "published_at" and op in ("$lt", "$lte"):
+                    ts = to_timestamp(value) - (op == "$lt")
+                    args["end_ts"] = min(ts, args.get("end_ts", ts))
+                else:
+                    raise ValueError(f"Unsupported filter: {key} {op}")
+    return args
@@ -0,0 +1,85 @@
+# src/micro_batch.py
+"""
+Async request coalescer: concurrent callers submit single items, which are
+collected for up to max_wait_ms (or until max_batch_size items are waiting)
+and dispatched as one batch call. Each caller's future resolves with its own result
+(or its own exception: batch_fn may return an Exception in an item's slot).
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+
+class MicroBatcher:
+    def __init__(
+        self,
+        batch_fn: Callable[[List[Any]], Awaitable[List[Any]]],
+        max_batch_size: int = 16,
+        max_wait_ms: float = 5.0,
+        max_in_flight: int = 8,
+    ):
+        """
+        batch_fn: async fn taking a list of items and returning results in the same order;
+            an Exception in a slot fails only that item's caller.
+        max_in_flight: batches allowed to run concurrently; later batches wait their turn.
+        """
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._sem = asyncio.Semaphore(max_in_flight)
+        self._pending: List[Tuple[Any, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks = set()
+        self._stats = {"items": 0, "batches": 0, "errors": 0}
+
+    async def submit(self, item: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        self._pending.append((item, fut))
+        self._stats["items"] += 1
+
+        if len(self._pending) >= self.max_batch_size:
+            self._dispatch()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._dispatch)
+        return await fut
+
+    def _dispatch(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        while self._pending:
+            batch = self._pending[:self.max_batch_size]
+            self._pending = self._pending[self.max_batch_size:]
+            task = asyncio.ensure_future(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: List[Tuple[Any, asyncio.Future]]):
+        # callers that gave up (cancelled) don't need work done for them
+        batch = [(item, fut) for item, fut in batch if not fut.done()]
+        if not batch:
+            return
+        async with self._sem:
+            self._stats["batches"] += 1
+            try:
+                results = await self.batch_fn([item for item, _ in batch])
+                for (_, fut), res in zip(batch, results):
+                    if fut.done():
+                        continue
+                    if isinstance(res, Exception):
+                        self._stats["errors"] += 1
+                        fut.set_exception(res)
+                    else:
+                        fut.set_result(res)
+            except Exception as e:
+                self._stats["errors"] += 1
+                for _, fut in batch:
+                    if not fut.done():
+                        fut.set_exception(e)
+
+    def stats(self) -> Dict[str, float]:
+        stats = dict(self._stats)
+        stats["avg_batch_size"] = stats["items"] / stats["batches"] if stats["batches"] else 0.0
+        stats["pending"] = len(self._pending)
+        return stats
@@ -1,5 +1,4 @@
 # src/observability/langfuse_client.py
-from langfuse import Langfuse
 import os
 
 _langfuse = None
@@ -7,6 +6,9 @@ _langfuse = None
 def get_langfuse():
     global _langfuse
     if _langfuse is None:
+        # deferred: the client import is slow; created on the first traced call
+        from langfuse import Langfuse
+
         _langfuse = Langfuse(
             public_key=os.getenv("LANGFUSE_PUBLIC_KEY"),
             secret_key=os.getenv("LANGFUSE_SECRET_KEY"),
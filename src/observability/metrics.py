@@ -0,0 +1,188 @@
+# src/observability/metrics.py
+"""
+In-process metrics, exported in the Prometheus text format (GET /metrics).
+Independent of Langfuse, so stage latency is still recorded when tracing is
+down.
+
+- timer(stage)            context manager -> stage_latency_seconds{stage} histogram;
+                          an exception also counts stage_errors_total{stage}
+- observe(stage, seconds) record an already measured duration
+- inc(name, **labels)     counters, e.g. cache_requests_total{cache, result}
+
+Histograms use fixed buckets; an observation is one bisect and a locked
+increment. Work run in the spawn-based predict pool records into the
+worker's registry; drain() / merge() ship those deltas back to the API
+process (see src.executors).
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, List, Tuple
+
+# seconds; covers sub-millisecond cache hits up to slow LLM calls
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+HELP = {
+    "stage_latency_seconds": ("histogram", "Latency of one pipeline stage"),
+    "stage_errors_total": ("counter", "Stage executions that raised"),
+    "cache_requests_total": ("counter", "Cache lookups by cache and result (hit/miss)"),
+    "traces_total": ("counter", "Trace outcomes (unsampled, dropped, exported, failed)"),
+    "stream_lag_seconds": ("histogram", "raw_news insert to refreshed prediction snapshot, per streamed article"),
+    "stream_articles_total": ("counter", "Articles consumed by the intraday stream by result (processed/near_dup)"),
+}
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    __slots__ = ("_lock", "counts", "sum", "count")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = [0] * (len(BUCKETS) + 1)  # last slot: above the largest bucket
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        i = bisect_left(BUCKETS, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+
+class Counter:
+    __slots__ = ("_lock", "value")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+
+_lock = threading.Lock()
+_histograms: Dict[Tuple[str, LabelKey], Histogram] = {}
+_counters: Dict[Tuple[str, LabelKey], Counter] = {}
+
+
+def _labels(labels: Dict[str, str]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def histogram(name: str, **labels) -> Histogram:
+    key = (name, _labels(labels))
+    h = _histograms.get(key)
+    if h is None:
+        with _lock:
+            h = _histograms.setdefault(key, Histogram())
+    return h
+
+
+def counter(name: str, **labels) -> Counter:
+    key = (name, _labels(labels))
+    c = _counters.get(key)
+    if c is None:
+        with _lock:
+            c = _counters.setdefault(key, Counter())
+    return c
+
+
+def inc(name: str, amount: float = 1.0, **labels):
+    counter(name, **labels).inc(amount)
+
+
+def observe(stage: str, seconds: float):
+    histogram("stage_latency_seconds", stage=stage).observe(seconds)
+
+
+class timer:
+    """
+    with timer("inference"): ...
+    """
+
+    __slots__ = ("stage", "start")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        observe(self.stage, time.perf_counter() - self.start)
+        if exc_type is not None:
+            inc("stage_errors_total", stage=self.stage)
+        return False
+
+
+def drain() -> dict:
+    """
+    Snapshot and reset this process's metrics (for shipping to another process).
+    """
+    with _lock:
+        hists, counters = list(_histograms.items()), list(_counters.items())
+        _histograms.clear()
+        _counters.clear()
+    return {
+        "histograms": [(key, h.counts, h.sum, h.count) for key, h in hists if h.count],
+        "counters": [(key, c.value) for key, c in counters if c.value],
+    }
+
+
+def merge(deltas: dict):
+    for (name, labels), counts, total, count in deltas.get("histograms", ()):
+        h = histogram(name, **dict(labels))
+        with h._lock:
+            h.counts = [a + b for a, b in zip(h.counts, counts)]
+            h.sum += total
+            h.count += count
+    for (name, labels), value in deltas.get("counters", ()):
+        counter(name, **dict(labels)).inc(value)
+
+
+def _fmt_labels(labels: LabelKey, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    pairs = labels + extra
+    if not pairs:
+        return ""
+    escaped = (v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+def render() -> str:
+    """
+    All metrics in the Prometheus text exposition format (version 0.0.4).
+    """
+    with _lock:
+        hists = sorted(_histograms.items())
+        counters = sorted(_counters.items())
+
+    lines: List[str] = []
+    seen = set()
+
+    def header(name: str):
+        if name not in seen:
+            seen.add(name)
+            kind, text = HELP.get(name, ("counter" if name.endswith("_total") else "histogram", name))
+            lines.append(f"# HELP {name} {text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+    for (name, labels), h in hists:
+        header(name)
+        with h._lock:
+            counts, total, count = list(h.counts), h.sum, h.count
+        cumulative = 0
+        for bound, n in zip(BUCKETS, counts):
+            cumulative += n
+            lines.append(f"{name}_bucket{_fmt_labels(labels, (('le', repr(bound)),))} {cumulative}")
+        lines.append(f"{name}_bucket{_fmt_labels(labels, (('le', '+Inf'),))} {count}")
+        lines.append(f"{name}_sum{_fmt_labels(labels)} {total}")
+        lines.append(f"{name}_count{_fmt_labels(labels)} {count}")
+    for (name, labels), c in counters:
+        header(name)
+        lines.append(f"{name}{_fmt_labels(labels)} {c.value}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,238 @@
+# src/observability/tracing.py
+"""
+Tracing facade in front of Langfuse, kept off the request path.
+
+    with trace("price_prediction", input={...}, metadata={...}) as t:
+        t.output = result
+        t.score("confidence", 0.8)
+
+- disabled (TRACING_ENABLED=0, or no Langfuse keys): trace() hands back a
+  shared no-op span; the Langfuse client is never created
+- head-based sampling per trace name, decided when the trace starts
+  (TRACE_SAMPLE_RATE default, TRACE_SAMPLE_RATES="name=rate,...")
+- finished spans go to a bounded queue drained by one background thread
+  that exports them to Langfuse in batches; a full queue drops the span
+  instead of blocking the caller
+- outcomes are counted in traces_total{result=unsampled|dropped|exported|failed}
+  (src.observability.metrics); tracing_stats() has the same numbers
+"""
+
+import os
+import time
+import uuid
+import queue
+import atexit
+import random
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from src.observability import metrics
+
+TRACING_ENABLED = os.getenv(
+    "TRACING_ENABLED",
+    "1" if os.getenv("LANGFUSE_PUBLIC_KEY") and os.getenv("LANGFUSE_SECRET_KEY") else "0",
+) == "1"
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "1.0"))
+TRACE_QUEUE_SIZE = int(os.getenv("TRACE_QUEUE_SIZE", "1000"))
+TRACE_BATCH_SIZE = int(os.getenv("TRACE_BATCH_SIZE", "50"))
+TRACE_FLUSH_INTERVAL_SEC = float(os.getenv("TRACE_FLUSH_INTERVAL_SEC", "1.0"))
+
+
+def _parse_rates(spec: str) -> Dict[str, float]:
+    rates = {}
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        name, _, rate = part.partition("=")
+        rates[name.strip()] = float(rate)
+    return rates
+
+
+TRACE_SAMPLE_RATES = _parse_rates(os.getenv("TRACE_SAMPLE_RATES", ""))
+
+
+class _NoopSpan:
+    """
+    Accepts the Span interface and discards everything.
+    """
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def __setattr__(self, name, value):
+        pass
+
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        return {}
+
+    def score(self, name: str, value: float):
+        pass
+
+    def error(self, message: str):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Span:
+    __slots__ = ("id", "name", "input", "output", "metadata", "scores", "error_message", "start", "_t0", "duration")
+
+    def __init__(self, name: str, input: Any = None, metadata: Optional[Dict[str, Any]] = None):
+        self.id = uuid.uuid4().hex
+        self.name = name
+        self.input = input
+        self.output = None
+        self.metadata = dict(metadata or {})
+        self.scores: List[tuple] = []
+        self.error_message: Optional[str] = None
+        self.start = datetime.now(timezone.utc)
+        self._t0 = time.perf_counter()
+        self.duration = 0.0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration = time.perf_counter() - self._t0
+        self.metadata.setdefault("latency_sec", self.duration)
+        if exc is not None and self.error_message is None:
+            self.error_message = f"{exc_type.__name__}: {exc}"
+        _get_exporter().submit(self)
+        return False
+
+    def score(self, name: str, value: float):
+        self.scores.append((name, float(value)))
+
+    def error(self, message: str):
+        self.error_message = message
+
+
+class _Exporter:
+    def __init__(self, maxsize: int = TRACE_QUEUE_SIZE):
+        self._queue: "queue.Queue[Span]" = queue.Queue(maxsize=maxsize)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.counts = {"dropped": 0, "exported": 0, "failed": 0}
+
+    def submit(self, span: Span):
+        self._ensure_thread()
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self._count("dropped")
+
+    def _count(self, result: str, n: int = 1):
+        with self._lock:
+            self.counts[result] += n
+        metrics.inc("traces_total", n, result=result)
+
+    def _ensure_thread(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="trace-export", daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                batch = [self._queue.get(timeout=TRACE_FLUSH_INTERVAL_SEC)]
+            except queue.Empty:
+                continue
+            while len(batch) < TRACE_BATCH_SIZE:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._export(batch)
+            for _ in batch:
+                self._queue.task_done()
+
+    def _export(self, batch: List[Span]):
+        try:
+            from src.observability.langfuse_client import get_langfuse
+
+            lf = get_langfuse()
+            for span in batch:
+                metadata = dict(span.metadata)
+                if span.error_message is not None:
+                    metadata["error"] = span.error_message
+                lf_trace = lf.trace(
+                    id=span.id,
+                    name=span.name,
+                    input=span.input,
+                    output=span.output,
+                    metadata=metadata,
+                    timestamp=span.start,
+                )
+                for name, value in span.scores:
+                    lf_trace.score(name=name, value=value)
+            # the Langfuse client batches network calls on its own thread; push them now
+            lf.flush()
+            self._count("exported", len(batch))
+        except Exception:
+            self._count("failed", len(batch))
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """
+        Wait until queued spans have been handed to Langfuse.
+        """
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def stats(self) -> Dict[str, int]:
+        return {**self.counts, "queued": self._queue.qsize(), "max_queue": self._queue.maxsize}
+
+
+_exporter: Optional[_Exporter] = None
+_exporter_lock = threading.Lock()
+
+
+def _get_exporter() -> _Exporter:
+    global _exporter
+    if _exporter is None:
+        with _exporter_lock:
+            if _exporter is None:
+                _exporter = _Exporter()
+                atexit.register(_exporter.flush)
+    return _exporter
+
+
+def sample_rate(name: str) -> float:
+    return TRACE_SAMPLE_RATES.get(name, TRACE_SAMPLE_RATE)
+
+
+def trace(name: str, input: Any = None, metadata: Optional[Dict[str, Any]] = None):
+    """
+    Context manager yielding a Span (or the no-op span when tracing is
+    disabled or this trace is not sampled).
+    """
+    if not TRACING_ENABLED:
+        return NOOP_SPAN
+    if random.random() >= sample_rate(name):
+        metrics.inc("traces_total", result="unsampled")
+        return NOOP_SPAN
+    return Span(name, input, metadata)
+
+
+def flush(timeout: float = 5.0) -> bool:
+    return _exporter.flush(timeout) if _exporter is not None else True
+
+
+def tracing_stats() -> Dict[str, Any]:
+    return {
+        "enabled": TRACING_ENABLED,
+        "sample_rate": TRACE_SAMPLE_RATE,
+        "sample_rates": TRACE_SAMPLE_RATES,
+        **(_exporter.stats() if _exporter is not None else {}),
+    }
@@ -0,0 +1,252 @@
+# src/pipeline.py
+"""
+In-process pipeline runner with declared stage dependencies.
+
+    stages = [
+        Stage("clean", clean_fn, inputs=raw_news_mark),
+        Stage("aggregate", aggregate_fn, deps=("clean",), inputs=scores_mark),
+    ]
+    results = run_pipeline(stages)
+
+- a stage starts as soon as all of its deps are done; independent stages run
+  in parallel (PIPELINE_MAX_WORKERS threads)
+- `inputs(conn)` fingerprints what the stage reads (max ids, row counts,
+  latest computed_at); when it equals the fingerprint of the stage's last
+  successful run the stage is skipped. Stages without `inputs` always run.
+- `fn()` returns the number of rows it wrote (or None)
+- every outcome (status, duration, rows, fingerprint, error) is a row in
+  pipeline_stage_runs. A failed stage blocks its dependents; run_pipeline(
+  resume=True) continues the latest run, re-running only the stages that
+  did not finish in it.
+"""
+
+import os
+import json
+import time
+import uuid
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+
+from sqlalchemy import desc, insert, select, text, update
+
+from src.db import engine
+from src.schema import PipelineStageRun
+
+PIPELINE_MAX_WORKERS = int(os.getenv("PIPELINE_MAX_WORKERS", "2"))
+
+DONE = ("succeeded", "skipped")
+
+
+class Stage:
+    __slots__ = ("name", "fn", "deps", "inputs")
+
+    def __init__(
+        self,
+        name: str,
+        fn: Callable[[], Optional[int]],
+        deps: Sequence[str] = (),
+        inputs: Optional[Callable[[Any], Any]] = None,
+    ):
+        self.name = name
+        self.fn = fn
+        self.deps = tuple(deps)
+        self.inputs = inputs
+
+
+def _validate(stages: Sequence[Stage]) -> Dict[str, Stage]:
+    by_name = {}
+    for s in stages:
+        if s.name in by_name:
+            raise ValueError(f"Duplicate stage {s.name!r}")
+        by_name[s.name] = s
+    for s in stages:
+        missing = [d for d in s.deps if d not in by_name]
+        if missing:
+            raise ValueError(f"Stage {s.name!r} depends on unknown stage(s) {missing}")
+
+    # Kahn's algorithm; anything left over sits on a cycle
+    indegree = {s.name: len(s.deps) for s in stages}
+    ready = [n for n, d in indegree.items() if d == 0]
+    seen = 0
+    while ready:
+        name = ready.pop()
+        seen += 1
+        for s in stages:
+            if name in s.deps:
+                indegree[s.name] -= 1
+                if indegree[s.name] == 0:
+                    ready.append(s.name)
+    if seen != len(stages):
+        raise ValueError(f"Stage dependencies contain a cycle: {sorted(n for n, d in indegree.items() if d)}")
+    return by_name
+
+
+def _now():
+    return datetime.now(timezone.utc)
+
+
+def fingerprint(stage: Stage) -> Optional[str]:
+    if stage.inputs is None:
+        return None
+    with engine.connect() as conn:
+        return json.dumps(stage.inputs(conn), default=str, sort_keys=True)
+
+
+def _last_fingerprint(conn, stage: str) -> Optional[str]:
+    return conn.execute(
+        select(PipelineStageRun.input_fingerprint)
+        .where(PipelineStageRun.stage == stage, PipelineStageRun.status.in_(DONE))
+        .order_by(desc(PipelineStageRun.id))
+        .limit(1)
+    ).scalar()
+
+
+def _record(run_id: str, stage: str, **values) -> int:
+    with engine.begin() as conn:
+        return conn.execute(
+            insert(PipelineStageRun).values(run_id=run_id, stage=stage, **values)
+        ).inserted_primary_key[0]
+
+
+def _finish(row_id: int, **values):
+    with engine.begin() as conn:
+        conn.execute(update(PipelineStageRun).where(PipelineStageRun.id == row_id).values(**values))
+
+
+def _run_stage(run_id: str, stage: Stage) -> Dict[str, Any]:
+    fp = fingerprint(stage)
+    if fp is not None:
+        with engine.connect() as conn:
+            if _last_fingerprint(conn, stage.name) == fp:
+                now = _now()
+                _record(run_id, stage.name, status="skipped", started_at=now, finished_at=now,
+                        duration_sec=0.0, rows=0, input_fingerprint=fp)
+                return {"status": "skipped", "duration_sec": 0.0, "rows": 0}
+
+    row_id = _record(run_id, stage.name, status="running", started_at=_now(), input_fingerprint=fp)
+    t0 = time.perf_counter()
+    try:
+        rows = stage.fn()
+    except Exception as e:
+        duration = time.perf_counter() - t0
+        traceback.print_exc()
+        error = f"{type(e).__name__}: {e}"
+        _finish(row_id, status="failed", finished_at=_now(), duration_sec=duration, error=error)
+        return {"status": "failed", "duration_sec": duration, "rows": None, "error": error}
+
+    duration = time.perf_counter() - t0
+    rows = rows if isinstance(rows, int) else None
+    _finish(row_id, status="succeeded", finished_at=_now(), duration_sec=duration, rows=rows)
+    return {"status": "succeeded", "duration_sec": duration, "rows": rows}
+
+
+def _resumable_run() -> Tuple[Optional[str], Dict[str, str]]:
+    """
+    (run_id, {stage: status}) of the latest run's finished stages, or
+    (None, {}) when the latest run has nothing left to do.
+    """
+    with engine.connect() as conn:
+        run_id = conn.execute(
+            select(PipelineStageRun.run_id).order_by(desc(PipelineStageRun.id)).limit(1)
+        ).scalar()
+        if run_id is None:
+            return None, {}
+        rows = conn.execute(
+            select(PipelineStageRun.stage, PipelineStageRun.status)
+            .where(PipelineStageRun.run_id == run_id)
+            .order_by(PipelineStageRun.id)
+        ).all()
+    statuses = dict(rows)  # latest attempt per stage wins
+    if all(s in DONE for s in statuses.values()):
+        return None, {}
+    return run_id, {stage: s for stage, s in statuses.items() if s in DONE}
+
+
+def run_pipeline(stages: Sequence[Stage], resume: bool = False,
+                 max_workers: int = PIPELINE_MAX_WORKERS) -> Dict[str, Dict[str, Any]]:
+    """
+    Run every stage once in dependency order. Returns {stage: {"status",
+    "duration_sec", "rows"[, "error"]}} with status succeeded, skipped,
+    failed, blocked (a dependency failed) or resumed (done in the run being
+    resumed).
+    """
+    by_name = _validate(stages)
+    PipelineStageRun.__table__.create(bind=engine, checkfirst=True)
+
+    run_id, carried = _resumable_run() if resume else (None, {})
+    if resume and run_id is None:
+        print("Nothing to resume: the latest pipeline run finished every stage.")
+    if run_id:
+        print(f"Resuming pipeline run {run_id}")
+    else:
+        run_id = uuid.uuid4().hex
+        print(f"Starting pipeline run {run_id}")
+
+    results: Dict[str, Dict[str, Any]] = {
+        name: {"status": "resumed", "duration_sec": 0.0, "rows": None}
+        for name in carried if name in by_name
+    }
+    pending = [s.name for s in stages if s.name not in results]
+    running = {}
+
+    def done(name: str) -> bool:
+        return results.get(name, {}).get("status") in DONE + ("resumed",)
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="pipeline") as pool:
+        while pending or running:
+            progressed = False
+            for name in list(pending):
+                deps = by_name[name].deps
+                if any(results.get(d, {}).get("status") in ("failed", "blocked") for d in deps):
+                    pending.remove(name)
+                    results[name] = {"status": "blocked", "duration_sec": 0.0, "rows": None}
+                    _record(run_id, name, status="blocked")
+                    progressed = True
+                elif all(done(d) for d in deps):
+                    pending.remove(name)
+                    print(f"[{name}] starting")
+                    running[pool.submit(_run_stage, run_id, by_name[name])] = name
+            if progressed and not running:
+                continue  # let the block cascade to dependents
+            if not running:
+                break
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for f in finished:
+                name = running.pop(f)
+                results[name] = f.result()
+                r = results[name]
+                print(f"[{name}] {r['status']} in {r['duration_sec']:.2f}s, rows={r['rows']}")
+
+    return results
+
+
+def run_history(limit: int = 20):
+    """
+    Latest stage executions, newest first (for inspection / the CLI).
+    """
+    with engine.connect() as conn:
+        return conn.execute(
+            select(
+                PipelineStageRun.run_id,
+                PipelineStageRun.stage,
+                PipelineStageRun.status,
+                PipelineStageRun.duration_sec,
+                PipelineStageRun.rows,
+                PipelineStageRun.started_at,
+                PipelineStageRun.error,
+            )
+            .order_by(desc(PipelineStageRun.id))
+            .limit(limit)
+        ).all()
+
+
+def table_mark(conn, table: str, where: str = "", params: Optional[dict] = None, column: str = "id"):
+    """
+    (row count, max(column)) of a table: cheap input fingerprint for stages
+    whose inputs only grow or are upserted with a fresh timestamp.
+    """
+    sql = f"SELECT COUNT(*), MAX({column}) FROM {table}" + (f" WHERE {where}" if where else "")
+    count, latest = conn.execute(text(sql), params or {}).one()
+    return [count, latest]
@@ -1,11 +1,13 @@
 # src/predict_price.py
-import joblib
+import os
 from pathlib import Path
-from src.features import make_features
-from src.observability.langfuse_client import get_langfuse
-import time
+from src.observability.tracing import trace
+from src.observability.metrics import timer
 
-MODEL_PATH = Path(__file__).parents[1] / "models" / "price_model.pkl"
+MODEL_PATH = Path(os.getenv("PRICE_MODEL_PATH", str(Path(__file__).parents[1] / "models" / "price_model.pkl")))
+
+_model = None
+_model_mtime = None
 
 FEATURE_COLUMNS = [
     "return_1d",
@@ -19,26 +21,46 @@ FEATURE_COLUMNS = [
 ]
 
 
-def predict_next_day(ticker="RELIANCE.NS"):
-    lf = get_langfuse()
-    start = time.time()
+def get_model():
+    """
+    Loaded once per process; reloaded when the model file is replaced.
+    """
+    global _model, _model_mtime
+    import joblib
+
+    mtime = MODEL_PATH.stat().st_mtime_ns
+    if _model is None or mtime != _model_mtime:
+        with timer("model_load"):
+            _model = joblib.load(MODEL_PATH)
+        _model_mtime = mtime
+    return _model
+
 
-    with lf.trace(
-        name="price_prediction",
+def predict_next_day(ticker="RELIANCE.NS", inputs=None):
+    """
+    `inputs`: feature inputs already read by the caller (see
+    src.features.load_feature_inputs_async); read here when omitted.
+    """
+    # pandas / SQLAlchemy / feature code load on first prediction, not at API import
+    from src.features import make_features
+
+    with trace(
+        "price_prediction",
         input={"ticker": ticker},
         metadata={
             "model": "RandomForest",
             "model_version": "price-v1",
         },
-    ) as trace:
-        model = joblib.load(MODEL_PATH)
-        df = make_features(ticker)
+    ) as span:
+        model = get_model()
+        df = make_features(ticker, inputs=inputs)
 
         row = df.iloc[-1]
         X = row[FEATURE_COLUMNS].values.reshape(1, -1)
 
-        pred = model.predict(X)[0]
-        proba = model.predict_proba(X)[0][1]
+        with timer("inference"):
+            pred = model.predict(X)[0]
+            proba = model.predict_proba(X)[0][1]
 
         result = {
             "ticker": ticker,
@@ -47,8 +69,51 @@ def predict_next_day(ticker="RELIANCE.NS"):
             "date": str(row["date"]),
         }
 
-        trace.output = result
-        trace.score(name="confidence", value=proba)
-        trace.metadata["latency_sec"] = time.time() - start
+        span.output = result
+        span.score("confidence", proba)
 
         return result
+
+
+def snapshot_predictions(tickers, skip_errors=False) -> int:
+    """
+    Score each ticker and store the result in prediction_snapshots (one row
+    per ticker, feature date and model version; re-scoring replaces it).
+    With skip_errors, tickers that cannot be scored (e.g. no price history
+    yet) are logged and left out.
+    """
+    from datetime import datetime
+    from sqlalchemy import delete, insert
+    from src.db import engine
+    from src.schema import PredictionSnapshot
+
+    PredictionSnapshot.__table__.create(bind=engine, checkfirst=True)
+    rows = []
+    for ticker in tickers:
+        try:
+            p = predict_next_day(ticker)
+        except Exception as e:
+            if not skip_errors:
+                raise
+            print(f"Prediction for {ticker} skipped: {type(e).__name__}: {e}")
+            continue
+        rows.append({
+            "ticker": ticker,
+            "date": datetime.fromisoformat(p["date"]),
+            "prediction": p["prediction"],
+            "confidence": p["confidence"],
+            "model_version": "price-v1",
+        })
+    if not rows:
+        return 0
+    with engine.begin() as conn:
+        for r in rows:
+            conn.execute(
+                delete(PredictionSnapshot).where(
+                    PredictionSnapshot.ticker == r["ticker"],
+                    PredictionSnapshot.date == r["date"],
+                    PredictionSnapshot.model_version == r["model_version"],
+                )
+            )
+        conn.execute(insert(PredictionSnapshot), rows)
+    return len(rows)
@@ -1,58 +1,341 @@
 # src/retriever.py
-from typing import List, Dict, Any, Optional
-from src.vectorstore import get_collection
-from src.observability.langfuse_client import get_langfuse
+"""
+News retriever over the Chroma collection.
+
+Modes (RETRIEVER_MODE, or per call):
+- dense   Chroma vector search (default)
+- bm25    local BM25 index (src.bm25_index) for exact tickers, numbers, names
+- hybrid  both, fused with reciprocal rank fusion: sum 1 / (RRF_K + rank)
+
+One long-lived NewsRetriever per process (get_default_retriever) with two
+in-memory LRU+TTL caches:
+- query text -> query embedding
+- (query, filters, k) -> results, tagged with the collection version and
+  dropped when the collection changes (see vectorstore.collection_version)
+"""
+
+import json
+import os
+import threading
 import time
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Hashable
+
+from src.vectorstore import get_collection, collection_version
+from src.embeddings import embed_texts
+from src.bm25_index import get_bm25_index
+from src.metadata_filters import parse_where, to_timestamp
+from src.observability.tracing import trace
+from src.observability.metrics import timer, inc
+
+RETRIEVER_CACHE_SIZE = int(os.getenv("RETRIEVER_CACHE_SIZE", "2048"))
+RETRIEVER_CACHE_TTL_SEC = float(os.getenv("RETRIEVER_CACHE_TTL_SEC", "600"))
+# how often to stat() the collection version file
+RETRIEVER_VERSION_CHECK_SEC = float(os.getenv("RETRIEVER_VERSION_CHECK_SEC", "2"))
+RETRIEVER_MODE = os.getenv("RETRIEVER_MODE", "dense")
+RRF_K = int(os.getenv("RRF_K", "60"))
+# per-retriever candidate depth for fusion is max(k * HYBRID_DEPTH_MULT, HYBRID_MIN_DEPTH)
+HYBRID_DEPTH_MULT = int(os.getenv("HYBRID_DEPTH_MULT", "4"))
+HYBRID_MIN_DEPTH = int(os.getenv("HYBRID_MIN_DEPTH", "20"))
+MODES = ("dense", "bm25", "hybrid")
+
+_default_retriever = None
+_default_lock = threading.Lock()
+
+
+class LRUCache:
+    """
+    Thread-safe LRU cache with per-entry TTL.
+    """
+
+    def __init__(self, maxsize: int = RETRIEVER_CACHE_SIZE, ttl_sec: float = RETRIEVER_CACHE_TTL_SEC):
+        self.maxsize = maxsize
+        self.ttl_sec = ttl_sec
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or (self.ttl_sec and time.monotonic() - entry[1] > self.ttl_sec):
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: Hashable, value: Any):
+        with self._lock:
+            self._data[key] = (value, time.monotonic())
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+class _LatencyStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds: float):
+        with self._lock:
+            self.count += 1
+            self.total += seconds
+            self.max = max(self.max, seconds)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "count": self.count,
+            "avg_ms": 1000 * self.total / self.count if self.count else 0.0,
+            "max_ms": 1000 * self.max,
+        }
+
+
+def build_where(
+    ticker: Optional[str] = None,
+    published_after=None,
+    published_before=None,
+) -> Optional[Dict[str, Any]]:
+    """
+    Chroma `where` clause for the supported filters (published_at is epoch seconds).
+    """
+    clauses = []
+    if ticker:
+        clauses.append({"ticker": ticker})
+    if published_after is not None:
+        clauses.append({"published_at": {"$gte": to_timestamp(published_after)}})
+    if published_before is not None:
+        clauses.append({"published_at": {"$lte": to_timestamp(published_before)}})
+    if not clauses:
+        return None
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int, rrf_k: int = RRF_K) -> List[tuple]:
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (rrf_k + rank)
+    return sorted(scores.items(), key=lambda kv: kv[1], reverse=True)[:k]
 
 
 class NewsRetriever:
     def __init__(self, collection_name: str = "news", k: int = 5):
+        self.collection_name = collection_name
         self.collection = get_collection(collection_name)
         self.k = k
+        self.mode = RETRIEVER_MODE
+        self._bm25 = None
+        self.embedding_cache = LRUCache()
+        self.result_cache = LRUCache()
+        self._version = collection_version(collection_name)
+        self._version_checked = time.monotonic()
+        self._cached_latency = _LatencyStats()
+        self._uncached_latency = _LatencyStats()
 
-    def get_relevant_documents(
-        self,
-        query_text: str,
-        k: Optional[int] = None,
-        filters: Optional[Dict[str, Any]] = None,
-    ) -> List[Dict[str, Any]]:
-        lf = get_langfuse()
-        start = time.time()
+    def _current_version(self) -> str:
+        now = time.monotonic()
+        if now - self._version_checked >= RETRIEVER_VERSION_CHECK_SEC:
+            self._version_checked = now
+            version = collection_version(self.collection_name)
+            if version != self._version:
+                self._version = version
+                self.result_cache.clear()
+                self._bm25 = None
+                # the embedded ANN store maps its files once; chroma reads fresh on each query
+                refresh = getattr(self.collection, "refresh", None)
+                if refresh is not None:
+                    refresh()
+        return self._version
 
-        with lf.trace(
-            name="news_retrieval",
-            input={
-                "query": query_text,
-                "filters": filters,
-                "top_k": k or self.k,
-            },
-            metadata={"retriever": "chroma+gemini"},
-        ) as trace:
+    def _query_embeddings(self, queries: List[str]) -> List[List[float]]:
+        """
+        Cached query embeddings; all misses go to the provider in one call.
+        """
+        embs = [self.embedding_cache.get(q) for q in queries]
+        missing = list(dict.fromkeys(q for q, e in zip(queries, embs) if e is None))
+        if missing:
+            fresh = dict(zip(missing, embed_texts(missing, task_type="retrieval_query")))
+            for q, e in fresh.items():
+                self.embedding_cache.put(q, e)
+            embs = [fresh[q] if e is None else e for q, e in zip(queries, embs)]
+        return embs
+
+    def _bm25_index(self):
+        if self._bm25 is None:
+            self._bm25 = get_bm25_index(self.collection_name, reload=True)
+        return self._bm25
+
+    def _dense_many(self, queries: List[str], k: int, filters: Optional[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        embeddings = self._query_embeddings(queries)
+        # one collection query for all query vectors
+        with timer("vector_query"):
             result = self.collection.query(
-                query_texts=[query_text],
-                n_results=k or self.k,
+                query_embeddings=embeddings,
+                n_results=k,
                 where=filters,
             )
 
-            docs = result.get("documents", [[]])[0]
-            metas = result.get("metadatas", [[]])[0]
-            dists = result.get("distances", [[]])[0]
+        outputs = []
+        for n in range(len(queries)):
+            ids = result["ids"][n]
+            docs = result["documents"][n]
+            metas = result["metadatas"][n]
+            dists = result["distances"][n]
 
             output = []
             for i in range(len(docs)):
                 output.append(
                     {
+                        "id": ids[i],
                         "text": docs[i],
                         "metadata": metas[i],
                         "distance": dists[i],
                     }
                 )
+            outputs.append(output)
+        return outputs
+
+    def _sparse(self, query_text: str, k: int, filters: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        with timer("bm25_search"):
+            hits = self._bm25_index().search(query_text, k=k, **parse_where(filters))
+        if not hits:
+            return []
+        with timer("doc_fetch"):
+            found = self.collection.get(ids=[doc_id for doc_id, _ in hits], include=["documents", "metadatas"])
+        by_id = {
+            doc_id: (doc, meta)
+            for doc_id, doc, meta in zip(found["ids"], found["documents"], found["metadatas"])
+        }
+        return [
+            {
+                "id": doc_id,
+                "text": by_id[doc_id][0],
+                "metadata": by_id[doc_id][1],
+                "distance": None,
+                "bm25_score": score,
+            }
+            for doc_id, score in hits
+            if doc_id in by_id
+        ]
+
+    def _hybrid_many(self, queries: List[str], k: int, filters: Optional[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        depth = max(k * HYBRID_DEPTH_MULT, HYBRID_MIN_DEPTH)
+        outputs = []
+        for query_text, dense in zip(queries, self._dense_many(queries, depth, filters)):
+            sparse = self._sparse(query_text, depth, filters)
+            docs = {d["id"]: d for d in sparse}
+            for d in dense:
+                docs[d["id"]] = {**docs.get(d["id"], {}), **d}
+            fused = reciprocal_rank_fusion([[d["id"] for d in dense], [d["id"] for d in sparse]], k)
+            outputs.append([{**docs[doc_id], "rrf_score": score} for doc_id, score in fused])
+        return outputs
+
+    def _search_many(self, queries: List[str], k: int, filters: Optional[Dict[str, Any]], mode: str):
+        if mode == "dense":
+            return self._dense_many(queries, k, filters)
+        if mode == "bm25":
+            return [self._sparse(q, k, filters) for q in queries]
+        return self._hybrid_many(queries, k, filters)
+
+    def get_relevant_documents(
+        self,
+        query_text: str,
+        k: Optional[int] = None,
+        filters: Optional[Dict[str, Any]] = None,
+        mode: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        return self.get_relevant_documents_batch([query_text], k=k, filters=filters, mode=mode)[0]
+
+    def get_relevant_documents_batch(
+        self,
+        queries: List[str],
+        k: Optional[int] = None,
+        filters: Optional[Dict[str, Any]] = None,
+        mode: Optional[str] = None,
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Results per query, in order. Uncached queries share one embedding call
+        and one collection query.
+        """
+        start = time.perf_counter()
+        k = k or self.k
+        mode = mode or self.mode
+        if mode not in MODES:
+            raise ValueError(f"Unknown retrieval mode: {mode}")
+        version = self._current_version()
+        filters_key = json.dumps(filters, sort_keys=True, default=str)
+
+        results: List[Optional[List[Dict[str, Any]]]] = []
+        for q in queries:
+            cached = self.result_cache.get((q, filters_key, k, mode))
+            results.append(cached[1] if cached is not None and cached[0] == version else None)
+        missing = list(dict.fromkeys(q for q, r in zip(queries, results) if r is None))
+        if len(missing) < len(queries):
+            inc("cache_requests_total", len(queries) - len(missing), cache="retrieval", result="hit")
+        if missing:
+            inc("cache_requests_total", len(missing), cache="retrieval", result="miss")
+        if not missing:
+            self._cached_latency.record(time.perf_counter() - start)
+            return results
+
+        with trace(
+            "news_retrieval",
+            input={
+                "query": missing[0] if len(missing) == 1 else missing,
+                "filters": filters,
+                "top_k": k,
+                "mode": mode,
+            },
+            metadata={"retriever": "chroma+gemini" if mode == "dense" else f"{mode}:chroma+bm25"},
+        ) as span:
+            fresh = dict(zip(missing, self._search_many(missing, k, filters, mode)))
+            for q, output in fresh.items():
+                self.result_cache.put((q, filters_key, k, mode), (version, output))
+            results = [fresh[q] if r is None else r for q, r in zip(queries, results)]
+
+            latency = time.perf_counter() - start
+            self._uncached_latency.record(latency)
+            span.output = {"results": sum(len(fresh[q]) for q in missing)}
 
-            trace.output = {"results": len(output)}
-            trace.metadata["latency_sec"] = time.time() - start
+            return results
 
-            return output
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "collection_version": self._version,
+            "embedding_cache": self.embedding_cache.stats(),
+            "result_cache": self.result_cache.stats(),
+            "latency_cached": self._cached_latency.stats(),
+            "latency_uncached": self._uncached_latency.stats(),
+        }
 
 
 def get_default_retriever(k: int = 5) -> NewsRetriever:
-    return NewsRetriever(k=k)
+    """
+    Process-wide retriever; `k` is only the default used when a query passes none.
+    """
+    global _default_retriever
+    if _default_retriever is None:
+        with _default_lock:
+            if _default_retriever is None:
+                _default_retriever = NewsRetriever(k=k)
+    return _default_retriever
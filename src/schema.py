@@ -91,4 +91,80 @@ class DailySentiment(Base):
     model_version = Column(String, nullable=True)
     computed_at = Column(DateTime(timezone=True), server_default=sqlfunc.now())
 
-    __table_args__ = (UniqueConstraint("ticker", "date", name="uix_ticker_date_daily"),)
+    __table_args__ = (
+        UniqueConstraint("ticker", "date", "model_version", name="uix_ticker_date_model_daily"),
+    )
+
+class SentimentFeature(Base):
+    """
+    Materialized rolling / decay-weighted sentiment per ticker and calendar day
+    (computed incrementally from daily_sentiment by src/sentiment_features.py).
+    Days without news are present with article_count = 0.
+    """
+    __tablename__ = "sentiment_features"
+    id = Column(Integer, primary_key=True, index=True)
+    ticker = Column(String, nullable=False)
+    date = Column(DateTime, nullable=False)
+    model_version = Column(String, nullable=False)
+    article_count = Column(Integer, nullable=False, default=0)
+    sent_mean_3d = Column(Float, nullable=True)  # article-weighted, NULL if no news in window
+    sent_mean_7d = Column(Float, nullable=True)
+    sent_mean_21d = Column(Float, nullable=True)
+    sent_decay = Column(Float, nullable=True)  # exponentially decayed, article-weighted
+    decay_num = Column(Float, nullable=False, default=0.0)  # recursion state for sent_decay
+    decay_den = Column(Float, nullable=False, default=0.0)
+    volume_z_21d = Column(Float, nullable=True)
+    computed_at = Column(DateTime(timezone=True), server_default=sqlfunc.now())
+
+    __table_args__ = (
+        UniqueConstraint("ticker", "date", "model_version", name="uix_sentfeat_ticker_date_model"),
+    )
+
+class PipelineWatermark(Base):
+    """
+    High-water marks for incremental jobs, e.g. the last sentiment_scores.id
+    folded into daily_sentiment for a model version.
+    """
+    __tablename__ = "pipeline_watermarks"
+    name = Column(String, primary_key=True)
+    last_id = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=sqlfunc.now(), onupdate=sqlfunc.now())
+
+class PredictionSnapshot(Base):
+    """
+    Next-day price predictions written by the daily pipeline, one row per
+    ticker and feature date.
+    """
+    __tablename__ = "prediction_snapshots"
+    id = Column(Integer, primary_key=True, index=True)
+    ticker = Column(String, nullable=False)
+    date = Column(DateTime, nullable=False)  # last feature row the prediction is based on
+    prediction = Column(String, nullable=False)  # UP / DOWN
+    confidence = Column(Float, nullable=False)
+    model_version = Column(String, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=sqlfunc.now())
+
+    __table_args__ = (
+        UniqueConstraint("ticker", "date", "model_version", name="uix_prediction_ticker_date_model"),
+    )
+
+class PipelineStageRun(Base):
+    """
+    One stage execution of the pipeline runner (src/pipeline.py): outcome,
+    timing, rows written and the input fingerprint used to skip unchanged stages.
+    """
+    __tablename__ = "pipeline_stage_runs"
+    id = Column(Integer, primary_key=True, index=True)
+    run_id = Column(String, nullable=False, index=True)
+    stage = Column(String, nullable=False)
+    status = Column(String, nullable=False)  # running | succeeded | skipped | failed | blocked
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    duration_sec = Column(Float, nullable=True)
+    rows = Column(Integer, nullable=True)
+    input_fingerprint = Column(Text, nullable=True)
+    error = Column(Text, nullable=True)
+
+    __table_args__ = (
+        Index("ix_pipeline_stage_runs_stage_status", "stage", "status"),
+    )
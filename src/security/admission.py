@@ -0,0 +1,224 @@
+# src/security/admission.py
+"""
+Per-endpoint admission control: cost-weighted concurrency budgets with a
+bounded wait queue, fair across API keys.
+
+- each endpoint (sentiment, predict, retrieve) has its own budget of cost
+  units in flight; a request holds `cost` units (e.g. articles in a batch)
+- one API key may hold at most ADMISSION_PER_KEY_SHARE of a budget, so a
+  single client cannot starve the rest
+- requests that cannot run wait FIFO (a waiter blocked by its key's share
+  does not block other keys), at most max_queue of them, for at most
+  max_wait_sec; otherwise they are rejected at once with 503 + Retry-After
+- queue-wait and service times are recorded per endpoint (stats())
+"""
+
+import os
+import time
+import math
+import asyncio
+import hashlib
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Deque, Dict, Optional
+
+from fastapi import HTTPException, status
+
+from src.executors import POOL_SIZES
+
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "1") == "1"
+ADMISSION_MAX_WAIT_SEC = float(os.getenv("ADMISSION_MAX_WAIT_SEC", "2"))
+ADMISSION_PER_KEY_SHARE = float(os.getenv("ADMISSION_PER_KEY_SHARE", "0.5"))
+
+# endpoint -> (cost units in flight, max queued requests)
+ADMISSION_BUDGETS = {
+    "sentiment": (
+        int(os.getenv("ADMISSION_SENTIMENT_CONCURRENCY", "32")),
+        int(os.getenv("ADMISSION_SENTIMENT_QUEUE", "64")),
+    ),
+    "predict": (
+        # a little above the worker count keeps the pool busy without a hidden executor backlog
+        int(os.getenv("ADMISSION_PREDICT_CONCURRENCY", str(2 * POOL_SIZES["predict"]))),
+        int(os.getenv("ADMISSION_PREDICT_QUEUE", "16")),
+    ),
+    "retrieve": (
+        int(os.getenv("ADMISSION_RETRIEVE_CONCURRENCY", str(POOL_SIZES["retrieve"]))),
+        int(os.getenv("ADMISSION_RETRIEVE_QUEUE", "128")),
+    ),
+}
+
+_WAIT_SAMPLES = 2048
+_controllers: Dict[str, "AdmissionController"] = {}
+
+
+class Overloaded(Exception):
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        name: str,
+        max_concurrent: int,
+        max_queue: int,
+        max_wait_sec: float = ADMISSION_MAX_WAIT_SEC,
+        per_key_share: float = ADMISSION_PER_KEY_SHARE,
+    ):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.max_wait_sec = max_wait_sec
+        self.per_key_limit = max(1, int(max_concurrent * per_key_share))
+        self.in_flight = 0
+        self._per_key: Dict[str, int] = {}
+        self._waiters: Deque[list] = deque()  # [key, cost, future]
+        self._waits: Deque[float] = deque(maxlen=_WAIT_SAMPLES)
+        self._service_ewma = 0.0
+        self._counts = {"admitted": 0, "rejected_queue_full": 0, "rejected_timeout": 0}
+
+    def _fits(self, key: str, cost: int) -> bool:
+        return self.in_flight + cost <= self.max_concurrent and self._key_ok(key, cost)
+
+    def _grant(self, key: str, cost: int):
+        self.in_flight += cost
+        self._per_key[key] = self._per_key.get(key, 0) + cost
+        self._counts["admitted"] += 1
+
+    def _key_ok(self, key: str, cost: int) -> bool:
+        return self._per_key.get(key, 0) + cost <= self.per_key_limit
+
+    def _wake(self):
+        # FIFO on the shared budget; waiters held back only by their own key's share are skipped
+        for waiter in list(self._waiters):
+            key, cost, fut = waiter
+            if fut.done():
+                self._waiters.remove(waiter)
+            elif not self._key_ok(key, cost):
+                continue
+            elif self.in_flight + cost <= self.max_concurrent:
+                self._grant(key, cost)
+                self._waiters.remove(waiter)
+                fut.set_result(None)
+            else:
+                break
+
+    def retry_after(self) -> int:
+        # time for the queue ahead to drain at the current service rate
+        service = self._service_ewma or 1.0
+        return max(1, math.ceil(service * (len(self._waiters) + 1) / self.max_concurrent))
+
+    async def acquire(self, key: str, cost: int = 1) -> float:
+        """
+        Returns the queue wait in seconds, or raises Overloaded.
+        """
+        cost = min(max(1, cost), self.per_key_limit)
+        ahead = any(not fut.done() and self._key_ok(k, c) for k, c, fut in self._waiters)
+        if not ahead and self._fits(key, cost):
+            self._grant(key, cost)
+            self._waits.append(0.0)
+            return 0.0
+        if len(self._waiters) >= self.max_queue:
+            self._counts["rejected_queue_full"] += 1
+            raise Overloaded("queue full", self.retry_after())
+
+        fut = asyncio.get_running_loop().create_future()
+        waiter = [key, cost, fut]
+        self._waiters.append(waiter)
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(asyncio.shield(fut), self.max_wait_sec)
+        except asyncio.TimeoutError:
+            if fut.done():
+                # granted just as the wait expired: give the slot back
+                self.release(key, cost)
+            else:
+                fut.cancel()
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+            self._counts["rejected_timeout"] += 1
+            raise Overloaded("queue wait timeout", self.retry_after())
+        except asyncio.CancelledError:
+            # client went away while queued
+            if fut.done() and not fut.cancelled():
+                self.release(key, cost)
+            else:
+                fut.cancel()
+            raise
+        wait = time.perf_counter() - start
+        self._waits.append(wait)
+        return wait
+
+    def release(self, key: str, cost: int = 1, service_sec: Optional[float] = None):
+        cost = min(max(1, cost), self.per_key_limit)
+        self.in_flight -= cost
+        held = self._per_key.get(key, 0) - cost
+        if held > 0:
+            self._per_key[key] = held
+        else:
+            self._per_key.pop(key, None)
+        if service_sec is not None:
+            self._service_ewma = service_sec if not self._service_ewma else 0.8 * self._service_ewma + 0.2 * service_sec
+        self._wake()
+
+    @asynccontextmanager
+    async def slot(self, api_key: str, cost: int = 1):
+        """
+        Hold `cost` units of this endpoint's budget for the body of the block.
+        Raises HTTPException(503) with Retry-After when saturated.
+        """
+        key = hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()[:16]
+        try:
+            await self.acquire(key, cost)
+        except Overloaded as ex:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail=f"{self.name} overloaded ({ex.reason}), retry later",
+                headers={"Retry-After": str(ex.retry_after)},
+            )
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.release(key, cost, time.perf_counter() - start)
+
+    def stats(self) -> Dict[str, float]:
+        import numpy as np
+
+        waits = np.array(self._waits) * 1000 if self._waits else np.zeros(1)
+        return {
+            "in_flight": self.in_flight,
+            "max_concurrent": self.max_concurrent,
+            "queued": len(self._waiters),
+            "max_queue": self.max_queue,
+            **self._counts,
+            "queue_wait_ms_p50": float(np.percentile(waits, 50)),
+            "queue_wait_ms_p95": float(np.percentile(waits, 95)),
+            "queue_wait_ms_p99": float(np.percentile(waits, 99)),
+            "service_ms_ewma": 1000 * self._service_ewma,
+        }
+
+
+class _NoAdmission:
+    @asynccontextmanager
+    async def slot(self, api_key: str, cost: int = 1):
+        yield
+
+
+def get_admission(name: str):
+    """
+    Controller for an endpoint budget (a no-op when ADMISSION_ENABLED=0).
+    Controllers are per process and used from the event loop thread only.
+    """
+    if not ADMISSION_ENABLED:
+        return _NoAdmission()
+    if name not in _controllers:
+        max_concurrent, max_queue = ADMISSION_BUDGETS[name]
+        _controllers[name] = AdmissionController(name, max_concurrent, max_queue)
+    return _controllers[name]
+
+
+def admission_stats() -> Dict[str, Dict[str, float]]:
+    return {name: ctrl.stats() for name, ctrl in _controllers.items()}
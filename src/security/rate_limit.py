@@ -1,4 +1,15 @@
 from slowapi import Limiter
 from slowapi.util import get_remote_address
+from src.auth.api_key import API_KEY_NAME, API_KEYS
 
-limiter = Limiter(key_func=get_remote_address)
+
+def api_key_or_ip(request):
+    # limits follow the client's API key; unknown keys and anonymous requests fall
+    # back to the IP, so rotating made-up keys cannot mint fresh buckets
+    api_key = request.headers.get(API_KEY_NAME)
+    if api_key in API_KEYS:
+        return api_key
+    return get_remote_address(request)
+
+
+limiter = Limiter(key_func=api_key_or_ip)
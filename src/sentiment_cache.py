@@ -0,0 +1,149 @@
+# src/sentiment_cache.py
+"""
+Content-addressed, disk-backed cache for LLM sentiment results (SQLite).
+
+Key = sha256(provider, model, prompt version, normalized title, normalized body),
+so identical articles cost a local lookup instead of an LLM round trip.
+Entries expire after a TTL; the oldest entries are evicted once the cache
+grows past max_entries.
+"""
+
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv(Path(__file__).parents[1] / ".env")
+
+SENTIMENT_CACHE_ENABLED = os.getenv("SENTIMENT_CACHE_ENABLED", "1") == "1"
+SENTIMENT_CACHE_PATH = Path(
+    os.getenv("SENTIMENT_CACHE_PATH", str(Path(__file__).parents[1] / "data" / "sentiment_cache.sqlite"))
+)
+SENTIMENT_CACHE_TTL_SEC = float(os.getenv("SENTIMENT_CACHE_TTL_SEC", str(30 * 24 * 3600)))
+SENTIMENT_CACHE_MAX_ENTRIES = int(os.getenv("SENTIMENT_CACHE_MAX_ENTRIES", "1000000"))
+
+# how many writes between size checks
+_EVICT_CHECK_EVERY = 1000
+
+_cache = None
+
+
+def _normalize(text: Optional[str]) -> str:
+    return re.sub(r"\s+", " ", (text or "")).strip().lower()
+
+
+def cache_key(provider: str, model: str, prompt_version: str, title: str, body: str) -> str:
+    payload = json.dumps(
+        [provider, model, prompt_version, _normalize(title), _normalize(body)],
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SentimentCache:
+    def __init__(
+        self,
+        path: Path = SENTIMENT_CACHE_PATH,
+        ttl_sec: float = SENTIMENT_CACHE_TTL_SEC,
+        max_entries: int = SENTIMENT_CACHE_MAX_ENTRIES,
+    ):
+        self.ttl_sec = ttl_sec
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._writes_since_check = 0
+        self._stats = {"hits": 0, "misses": 0, "expired": 0, "writes": 0, "evictions": 0}
+
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(path), check_same_thread=False, isolation_level=None)
+        self._conn.executescript(
+            """
+            PRAGMA journal_mode=WAL;
+            PRAGMA synchronous=NORMAL;
+            CREATE TABLE IF NOT EXISTS sentiment_cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                created_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS ix_sentiment_cache_created ON sentiment_cache(created_at);
+            """
+        )
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM sentiment_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self._stats["misses"] += 1
+                return None
+            if self.ttl_sec and time.time() - row[1] > self.ttl_sec:
+                self._conn.execute("DELETE FROM sentiment_cache WHERE key = ?", (key,))
+                self._stats["expired"] += 1
+                self._stats["misses"] += 1
+                return None
+            self._stats["hits"] += 1
+            return json.loads(row[0])
+
+    def set(self, key: str, value: Dict[str, Any]):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sentiment_cache (key, value, created_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), time.time()),
+            )
+            self._stats["writes"] += 1
+            self._writes_since_check += 1
+            if self._writes_since_check >= _EVICT_CHECK_EVERY:
+                self._writes_since_check = 0
+                self._evict()
+
+    def _evict(self):
+        if self.ttl_sec:
+            cur = self._conn.execute(
+                "DELETE FROM sentiment_cache WHERE created_at < ?", (time.time() - self.ttl_sec,)
+            )
+            self._stats["evictions"] += max(cur.rowcount, 0)
+        size = self._conn.execute("SELECT COUNT(*) FROM sentiment_cache").fetchone()[0]
+        if size > self.max_entries:
+            cur = self._conn.execute(
+                """
+                DELETE FROM sentiment_cache WHERE key IN (
+                    SELECT key FROM sentiment_cache ORDER BY created_at ASC LIMIT ?
+                )
+                """,
+                (size - self.max_entries,),
+            )
+            self._stats["evictions"] += max(cur.rowcount, 0)
+
+    def evict(self):
+        with self._lock:
+            self._evict()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def get_sentiment_cache() -> Optional[SentimentCache]:
+    """
+    Process-wide cache, or None when SENTIMENT_CACHE_ENABLED=0.
+    """
+    global _cache
+    if not SENTIMENT_CACHE_ENABLED:
+        return None
+    if _cache is None:
+        _cache = SentimentCache()
+    return _cache
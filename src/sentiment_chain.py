@@ -2,22 +2,36 @@
 """
 LLM-based sentiment classifier using Google Gemini.
 
-- Provider: Gemini (primary), HF (optional fallback)
+- Provider: Gemini (primary), HF local transformer (src.hf_sentiment), stub (offline/testing)
 - JSON-only output
-- Langfuse observability
+- Sampled, non-blocking Langfuse tracing (src.observability.tracing)
+- Async bulk path (classify_many_async): bounded concurrency, token-bucket
+  rate limit, jittered exponential backoff
+- Batched mode (classify_batch): several articles per prompt, mapped back by id,
+  missing/unparseable items retried individually
+- Persistent content-addressed result cache (src.sentiment_cache)
+- API micro-batching (get_sentiment_batcher): concurrent requests coalesced into
+  batched provider calls
 """
 
 import os
 import json
 import time
 import re
+import random
+import asyncio
+import threading
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, Iterable, Tuple, Optional, AsyncIterator, List, Iterator, Union
 
 from dotenv import load_dotenv
-import google.generativeai as genai
 
-from src.observability.langfuse_client import get_langfuse
+from src.observability.tracing import trace
+from src.observability.metrics import timer, inc
+from src.sentiment_cache import get_sentiment_cache, cache_key
+from src import hf_sentiment
+from src.micro_batch import MicroBatcher
+from src.executors import run_in_pool
 
 # -------------------------------------------------
 # Env & config
@@ -26,13 +40,35 @@ load_dotenv(Path(__file__).parents[1] / ".env")
 
 SENTIMENT_LLM_PROVIDER = os.getenv("SENTIMENT_LLM_PROVIDER", "gemini")
 GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-1.5-flash")
-HF_SENTIMENT_MODEL = os.getenv("HF_SENTIMENT_MODEL")
+HF_SENTIMENT_MODEL = hf_sentiment.HF_SENTIMENT_MODEL
+GEMINI_MODEL_VERSION = "llm-v1"
 
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+# Bulk/async labeling knobs
+SENTIMENT_CONCURRENCY = int(os.getenv("SENTIMENT_CONCURRENCY", "8"))
+SENTIMENT_RATE_PER_SEC = float(os.getenv("SENTIMENT_RATE_PER_SEC", "5"))  # 0 disables
+SENTIMENT_MAX_RETRIES = int(os.getenv("SENTIMENT_MAX_RETRIES", "4"))
+SENTIMENT_BACKOFF_BASE_SEC = float(os.getenv("SENTIMENT_BACKOFF_BASE_SEC", "0.5"))
+SENTIMENT_BACKOFF_MAX_SEC = float(os.getenv("SENTIMENT_BACKOFF_MAX_SEC", "20"))
+SENTIMENT_STUB_LATENCY_SEC = float(os.getenv("SENTIMENT_STUB_LATENCY_SEC", "0.05"))
+
+# API request coalescing
+SENTIMENT_MICROBATCH_MAX_ITEMS = int(os.getenv("SENTIMENT_MICROBATCH_MAX_ITEMS", "16"))
+SENTIMENT_MICROBATCH_WAIT_MS = float(os.getenv("SENTIMENT_MICROBATCH_WAIT_MS", "5"))
+SENTIMENT_MICROBATCH_MAX_IN_FLIGHT = int(os.getenv("SENTIMENT_MICROBATCH_MAX_IN_FLIGHT", "8"))
+
+# Multi-article prompts
+SENTIMENT_BATCH_SIZE = int(os.getenv("SENTIMENT_BATCH_SIZE", "1"))
+SENTIMENT_BATCH_TOKEN_BUDGET = int(os.getenv("SENTIMENT_BATCH_TOKEN_BUDGET", "6000"))
+
+_gemini_model = None
+_sentiment_batcher = None
 
 # -------------------------------------------------
 # Prompt (JSON only)
 # -------------------------------------------------
+# Part of the cache key: bump when prompt wording/format changes results
+PROMPT_VERSION = "v1"
+
 _PROMPT_TEMPLATE = """You are a financial news sentiment classifier.
 
 Return ONLY valid JSON with:
@@ -47,6 +83,22 @@ Article body:
 \"\"\"{body}\"\"\"
 """
 
+_BATCH_PROMPT_TEMPLATE = """You are a financial news sentiment classifier.
+
+Classify EACH article below. Return ONLY a valid JSON array with one object per article:
+- "id": the article id exactly as given
+- "label": "positive", "neutral", or "negative"
+- "confidence": number between 0 and 1
+- "rationale": max 40 words
+
+{articles}
+"""
+
+_BATCH_ITEM_TEMPLATE = """Article id: {id}
+Title: \"\"\"{title}\"\"\"
+Body: \"\"\"{body}\"\"\"
+"""
+
 # -------------------------------------------------
 # Helpers
 # -------------------------------------------------
@@ -69,6 +121,8 @@ def _sanitize(parsed: Dict[str, Any]) -> Dict[str, Any]:
         "rationale": rationale,
     }
 
+_PARSE_FAILED_RATIONALE = "Failed to parse Gemini output"
+
 def _parse_json(text: str) -> Dict[str, Any]:
     try:
         return json.loads(text)
@@ -79,60 +133,565 @@ def _parse_json(text: str) -> Dict[str, Any]:
         return {
             "label": "neutral",
             "confidence": 0.0,
-            "rationale": "Failed to parse Gemini output",
+            "rationale": _PARSE_FAILED_RATIONALE,
         }
 
+def _build_prompt(title: str, body: str) -> str:
+    return _PROMPT_TEMPLATE.format(
+        title=title or "",
+        body=body or "",
+    )
+
+def _estimate_tokens(text: str) -> int:
+    # ~4 chars/token is close enough for budgeting English news text
+    return len(text) // 4 + 1
+
+def _build_batch_prompt(items: List[Tuple[Any, str, str]]) -> str:
+    articles = "\n".join(
+        _BATCH_ITEM_TEMPLATE.format(id=key, title=title or "", body=body or "")
+        for key, title, body in items
+    )
+    return _BATCH_PROMPT_TEMPLATE.format(articles=articles)
+
+def _parse_json_array(text: str) -> List[Dict[str, Any]]:
+    try:
+        parsed = json.loads(text)
+    except Exception:
+        match = re.search(r"\[.*\]", text, flags=re.S)
+        if not match:
+            return []
+        try:
+            parsed = json.loads(match.group(0))
+        except Exception:
+            return []
+    if isinstance(parsed, dict):
+        parsed = [parsed]
+    return [p for p in parsed if isinstance(p, dict)] if isinstance(parsed, list) else []
+
+def pack_batches(
+    items: Iterable[Tuple[Any, str, str]],
+    max_items: Optional[int] = None,
+    token_budget: Optional[int] = None,
+) -> Iterator[List[Tuple[Any, str, str]]]:
+    """
+    Greedily group (key, title, body) items into prompts of at most `max_items`
+    articles and ~`token_budget` prompt tokens. An item over budget goes alone.
+    Lazy: consumes `items` one at a time.
+    """
+    max_items = max_items or SENTIMENT_BATCH_SIZE
+    token_budget = token_budget or SENTIMENT_BATCH_TOKEN_BUDGET
+    overhead = _estimate_tokens(_BATCH_PROMPT_TEMPLATE)
+
+    batch, used = [], overhead
+    for key, title, body in items:
+        cost = _estimate_tokens(_BATCH_ITEM_TEMPLATE.format(id=key, title=title or "", body=body or ""))
+        if batch and (len(batch) >= max_items or used + cost > token_budget):
+            yield batch
+            batch, used = [], overhead
+        batch.append((key, title, body))
+        used += cost
+    if batch:
+        yield batch
+
+# Articles-per-call counters for batched classification
+_batch_stats = {"calls": 0, "articles": 0, "parsed": 0, "fallbacks": 0}
+_batch_stats_lock = threading.Lock()
+
+def _record_batch(articles: int, parsed: int):
+    with _batch_stats_lock:
+        _batch_stats["calls"] += 1
+        _batch_stats["articles"] += articles
+        _batch_stats["parsed"] += parsed
+        _batch_stats["fallbacks"] += articles - parsed
+
+def batch_stats() -> Dict[str, float]:
+    with _batch_stats_lock:
+        stats = dict(_batch_stats)
+    stats["articles_per_call"] = stats["articles"] / stats["calls"] if stats["calls"] else 0.0
+    return stats
+
+def _map_batch_response(items: List[Tuple[Any, str, str]], text: str) -> Dict[Any, Dict[str, Any]]:
+    keys = {str(key): key for key, _, _ in items}
+    out = {}
+    for obj in _parse_json_array(text):
+        key = keys.get(str(obj.get("id")))
+        if key is not None and key not in out:
+            out[key] = _sanitize(obj)
+    return out
+
 # -------------------------------------------------
 # Gemini sentiment classifier
 # -------------------------------------------------
+_GENERATION_CONFIG = {
+    "temperature": 0.0,
+    "max_output_tokens": 256,
+}
+
+def _get_gemini_model():
+    global _gemini_model
+    if _gemini_model is None:
+        # deferred: the SDK import is slow and only the gemini provider needs it
+        import google.generativeai as genai
+
+        genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+        _gemini_model = genai.GenerativeModel(GEMINI_MODEL)
+    return _gemini_model
+
 def _classify_gemini(title: str, body: str) -> Dict[str, Any]:
-    model = genai.GenerativeModel(GEMINI_MODEL)
+    with timer("llm_call"):
+        response = _get_gemini_model().generate_content(
+            _build_prompt(title, body),
+            generation_config=_GENERATION_CONFIG,
+        )
 
-    prompt = _PROMPT_TEMPLATE.format(
-        title=title or "",
-        body=body or "",
-    )
+    parsed = _parse_json(response.text.strip())
+    return _sanitize(parsed)
 
-    response = model.generate_content(
-        prompt,
-        generation_config={
-            "temperature": 0.0,
-            "max_output_tokens": 256,
-        },
-    )
+async def _classify_gemini_async(title: str, body: str) -> Dict[str, Any]:
+    with timer("llm_call"):
+        response = await _get_gemini_model().generate_content_async(
+            _build_prompt(title, body),
+            generation_config=_GENERATION_CONFIG,
+        )
 
     parsed = _parse_json(response.text.strip())
     return _sanitize(parsed)
 
+def _batch_generation_config(n: int) -> Dict[str, Any]:
+    return {"temperature": 0.0, "max_output_tokens": 64 + 128 * n}
+
+def _classify_batch_gemini(items: List[Tuple[Any, str, str]]) -> str:
+    with timer("llm_call"):
+        response = _get_gemini_model().generate_content(
+            _build_batch_prompt(items),
+            generation_config=_batch_generation_config(len(items)),
+        )
+    return response.text.strip()
+
+async def _classify_batch_gemini_async(items: List[Tuple[Any, str, str]]) -> str:
+    with timer("llm_call"):
+        response = await _get_gemini_model().generate_content_async(
+            _build_batch_prompt(items),
+            generation_config=_batch_generation_config(len(items)),
+        )
+    return response.text.strip()
+
 # -------------------------------------------------
-# Public API (with Langfuse tracing)
+# Stub classifier (offline, deterministic, configurable latency)
 # -------------------------------------------------
-def classify_text(title: str, body: str) -> Dict[str, Any]:
-    lf = get_langfuse()
-    start = time.time()
+_STUB_POSITIVE = ("gain", "rise", "rose", "surge", "beat", "profit", "growth", "upgrade", "record")
+_STUB_NEGATIVE = ("fall", "fell", "drop", "loss", "miss", "cut", "downgrade", "probe", "weak")
+
+def _stub_result(title: str, body: str) -> Dict[str, Any]:
+    text = f"{title or ''} {body or ''}".lower()
+    score = sum(text.count(w) for w in _STUB_POSITIVE) - sum(text.count(w) for w in _STUB_NEGATIVE)
+    label = "positive" if score > 0 else "negative" if score < 0 else "neutral"
+    return _sanitize(
+        {
+            "label": label,
+            "confidence": min(1.0, 0.5 + 0.1 * abs(score)),
+            "rationale": "stub keyword classifier",
+        }
+    )
+
+def _classify_stub(title: str, body: str) -> Dict[str, Any]:
+    with timer("llm_call"):
+        time.sleep(SENTIMENT_STUB_LATENCY_SEC)
+    return _stub_result(title, body)
 
-    with lf.trace(
-        name="llm_sentiment_classification",
+async def _classify_stub_async(title: str, body: str) -> Dict[str, Any]:
+    with timer("llm_call"):
+        await asyncio.sleep(SENTIMENT_STUB_LATENCY_SEC)
+    return _stub_result(title, body)
+
+def _stub_batch_text(items: List[Tuple[Any, str, str]]) -> str:
+    return json.dumps([{"id": str(key), **_stub_result(title, body)} for key, title, body in items])
+
+def _classify_batch_stub(items: List[Tuple[Any, str, str]]) -> str:
+    with timer("llm_call"):
+        time.sleep(SENTIMENT_STUB_LATENCY_SEC)
+    return _stub_batch_text(items)
+
+async def _classify_batch_stub_async(items: List[Tuple[Any, str, str]]) -> str:
+    with timer("llm_call"):
+        await asyncio.sleep(SENTIMENT_STUB_LATENCY_SEC)
+    return _stub_batch_text(items)
+
+# -------------------------------------------------
+# Local HF transformer classifier (CPU-bound: async variants run in a thread)
+# -------------------------------------------------
+def _classify_hf(title: str, body: str) -> Dict[str, Any]:
+    with timer("hf_inference"):
+        return _sanitize(hf_sentiment.classify_texts([hf_sentiment.article_text(title, body)])[0])
+
+async def _classify_hf_async(title: str, body: str) -> Dict[str, Any]:
+    return await run_in_pool("local_ml", _classify_hf, title, body)
+
+def _classify_batch_hf(items: List[Tuple[Any, str, str]]) -> str:
+    with timer("hf_inference"):
+        results = hf_sentiment.classify_texts([hf_sentiment.article_text(t, b) for _, t, b in items])
+    return json.dumps([{"id": str(key), **res} for (key, _, _), res in zip(items, results)])
+
+async def _classify_batch_hf_async(items: List[Tuple[Any, str, str]]) -> str:
+    return await run_in_pool("local_ml", _classify_batch_hf, items)
+
+_PROVIDERS = {
+    "gemini": _classify_gemini,
+    "hf": _classify_hf,
+    "stub": _classify_stub,
+}
+
+_ASYNC_PROVIDERS = {
+    "gemini": _classify_gemini_async,
+    "hf": _classify_hf_async,
+    "stub": _classify_stub_async,
+}
+
+# Batch providers return the raw completion text (a JSON array keyed by article id)
+_BATCH_PROVIDERS = {
+    "gemini": _classify_batch_gemini,
+    "hf": _classify_batch_hf,
+    "stub": _classify_batch_stub,
+}
+
+_ASYNC_BATCH_PROVIDERS = {
+    "gemini": _classify_batch_gemini_async,
+    "hf": _classify_batch_hf_async,
+    "stub": _classify_batch_stub_async,
+}
+
+def _provider_name(provider: Optional[str]) -> str:
+    return (provider or SENTIMENT_LLM_PROVIDER).lower()
+
+def _provider_fn(provider: Optional[str], registry: Dict[str, Any]):
+    name = _provider_name(provider)
+    if name not in registry:
+        raise ValueError(f"Unknown sentiment provider: {name}")
+    return registry[name]
+
+# -------------------------------------------------
+# Result cache
+# -------------------------------------------------
+def _model_name(provider: Optional[str]) -> str:
+    name = _provider_name(provider)
+    if name == "gemini":
+        return GEMINI_MODEL
+    if name == "hf":
+        return HF_SENTIMENT_MODEL
+    return name
+
+def model_version_for(provider: Optional[str] = None) -> str:
+    """
+    sentiment_scores.model_version written for a provider's labels.
+    """
+    name = _provider_name(provider)
+    if name == "gemini":
+        return GEMINI_MODEL_VERSION
+    if name == "hf":
+        return f"hf-{HF_SENTIMENT_MODEL.split('/')[-1].lower()}-v1"
+    return f"{name}-v1"
+
+def _cache_get(provider: Optional[str], title: str, body: str) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+    cache = get_sentiment_cache()
+    if cache is None:
+        return None, None
+    key = cache_key(_provider_name(provider), _model_name(provider), PROMPT_VERSION, title, body)
+    value = cache.get(key)
+    inc("cache_requests_total", cache="sentiment", result="miss" if value is None else "hit")
+    return key, value
+
+def _cache_set(key: Optional[str], result: Dict[str, Any]):
+    cache = get_sentiment_cache()
+    if cache is None or key is None or result.get("rationale") == _PARSE_FAILED_RATIONALE:
+        return
+    cache.set(key, result)
+
+def cache_stats() -> Dict[str, float]:
+    cache = get_sentiment_cache()
+    return cache.stats() if cache is not None else {}
+
+# -------------------------------------------------
+# Public API (traced, see src/observability/tracing.py)
+# -------------------------------------------------
+def classify_text(title: str, body: str, provider: Optional[str] = None) -> Dict[str, Any]:
+    key, cached = _cache_get(provider, title, body)
+    if cached is not None:
+        return cached
+
+    with trace(
+        "llm_sentiment_classification",
         input={
             "title": title[:300],
             "body": body[:1000],
         },
         metadata={
-            "provider": "gemini",
-            "model": GEMINI_MODEL,
-            "model_version": "llm-gemini-v1",
+            "provider": _provider_name(provider),
+            "model": _model_name(provider),
+            "model_version": model_version_for(provider),
         },
-    ) as trace:
+    ) as span:
         try:
-            result = _classify_gemini(title, body)
+            result = _provider_fn(provider, _PROVIDERS)(title, body)
+            _cache_set(key, result)
 
-            latency = time.time() - start
-            trace.output = result
-            trace.score(name="confidence", value=result["confidence"])
-            trace.metadata["latency_sec"] = latency
+            span.output = result
+            span.score("confidence", result["confidence"])
 
             return result
 
         except Exception as e:
-            trace.error(str(e))
+            span.error(str(e))
             raise
+
+def _split_cached(items: List[Tuple[Any, str, str]], provider: Optional[str]):
+    hits, misses = {}, []
+    for key, title, body in items:
+        _, cached = _cache_get(provider, title, body)
+        if cached is not None:
+            hits[key] = cached
+        else:
+            misses.append((key, title, body))
+    return hits, misses
+
+def _store_batch(items: List[Tuple[Any, str, str]], results: Dict[Any, Dict[str, Any]], provider: Optional[str]):
+    if get_sentiment_cache() is None:
+        return
+    for key, title, body in items:
+        if key in results:
+            _cache_set(
+                cache_key(_provider_name(provider), _model_name(provider), PROMPT_VERSION, title, body),
+                results[key],
+            )
+
+def classify_batch(
+    items: List[Tuple[Any, str, str]],
+    provider: Optional[str] = None,
+) -> Dict[Any, Dict[str, Any]]:
+    """
+    Classify several (key, title, body) articles in one model call.
+    Returns {key: result}; items missing from the response (or unparseable)
+    are classified individually via classify_text.
+    """
+    results, misses = _split_cached(items, provider)
+
+    if len(misses) > 1:
+        fn = _provider_fn(provider, _BATCH_PROVIDERS)
+        try:
+            batch_results = _map_batch_response(misses, fn(misses))
+        except Exception:
+            batch_results = {}
+        _record_batch(len(misses), len(batch_results))
+        _store_batch(misses, batch_results, provider)
+        results.update(batch_results)
+
+    for key, title, body in misses:
+        if key not in results:
+            results[key] = classify_text(title, body, provider=provider)
+    return results
+
+# -------------------------------------------------
+# Async bulk path
+# -------------------------------------------------
+class TokenBucket:
+    """
+    Async token bucket: `rate` tokens/sec, holding at most `burst` tokens.
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+def _backoff_delay(attempt: int) -> float:
+    # "full jitter": uniform in [0, min(cap, base * 2^attempt)]
+    return random.uniform(0, min(SENTIMENT_BACKOFF_MAX_SEC, SENTIMENT_BACKOFF_BASE_SEC * (2 ** attempt)))
+
+async def classify_text_async(
+    title: str,
+    body: str,
+    provider: Optional[str] = None,
+    bucket: Optional[TokenBucket] = None,
+    max_retries: int = SENTIMENT_MAX_RETRIES,
+) -> Dict[str, Any]:
+    fn = _provider_fn(provider, _ASYNC_PROVIDERS)
+    key, cached = _cache_get(provider, title, body)
+    if cached is not None:
+        return cached
+    for attempt in range(max_retries + 1):
+        if bucket is not None:
+            await bucket.acquire()
+        try:
+            result = await fn(title, body)
+            _cache_set(key, result)
+            return result
+        except Exception:
+            if attempt == max_retries:
+                raise
+            await asyncio.sleep(_backoff_delay(attempt))
+
+async def classify_batch_async(
+    items: List[Tuple[Any, str, str]],
+    provider: Optional[str] = None,
+    bucket: Optional[TokenBucket] = None,
+    max_retries: int = SENTIMENT_MAX_RETRIES,
+) -> Tuple[Dict[Any, Dict[str, Any]], Dict[Any, Exception]]:
+    """
+    Async classify_batch: one rate-limited, retried call for the whole batch, then
+    individual (also rate-limited) calls for anything the response didn't cover.
+    Returns ({key: result}, {key: error}); a failed individual call only fails its own item.
+    """
+    results, misses = _split_cached(items, provider)
+    if len(misses) > 1:
+        fn = _provider_fn(provider, _ASYNC_BATCH_PROVIDERS)
+        batch_results: Dict[Any, Dict[str, Any]] = {}
+        for attempt in range(max_retries + 1):
+            if bucket is not None:
+                await bucket.acquire()
+            try:
+                batch_results = _map_batch_response(misses, await fn(misses))
+                break
+            except Exception:
+                if attempt == max_retries:
+                    break
+                await asyncio.sleep(_backoff_delay(attempt))
+        _record_batch(len(misses), len(batch_results))
+        _store_batch(misses, batch_results, provider)
+        results.update(batch_results)
+
+    missing = [item for item in misses if item[0] not in results]
+    singles = await asyncio.gather(
+        *(classify_text_async(title, body, provider=provider, bucket=bucket) for _, title, body in missing),
+        return_exceptions=True,
+    )
+    errors: Dict[Any, Exception] = {}
+    for (key, _, _), res in zip(missing, singles):
+        if isinstance(res, Exception):
+            errors[key] = res
+        else:
+            results[key] = res
+    return results, errors
+
+async def classify_many_async(
+    items: Iterable[Tuple[Any, str, str]],
+    concurrency: Optional[int] = None,
+    rate_per_sec: Optional[float] = None,
+    provider: Optional[str] = None,
+    batch_size: Optional[int] = None,
+    token_budget: Optional[int] = None,
+) -> AsyncIterator[Tuple[Any, Optional[Dict[str, Any]], Optional[Exception]]]:
+    """
+    Classify (key, title, body) items with at most `concurrency` calls in flight and
+    at most `rate_per_sec` calls started per second. With batch_size > 1, items are
+    packed into multi-article prompts (see pack_batches).
+
+    Yields (key, result, error) in completion order; exactly one of result/error is set.
+    Items are pulled lazily, so `items` may be a generator over millions of rows.
+    """
+    batch_size = batch_size or SENTIMENT_BATCH_SIZE
+    concurrency = concurrency or SENTIMENT_CONCURRENCY
+    rate = SENTIMENT_RATE_PER_SEC if rate_per_sec is None else rate_per_sec
+    bucket = TokenBucket(rate, burst=concurrency) if rate and rate > 0 else None
+
+    in_q: asyncio.Queue = asyncio.Queue(maxsize=concurrency * 2)
+    out_q: asyncio.Queue = asyncio.Queue()
+    done = object()
+    feed_error = []
+
+    async def feed():
+        try:
+            for batch in pack_batches(items, max_items=batch_size, token_budget=token_budget):
+                await in_q.put(batch)
+        except Exception as e:
+            feed_error.append(e)
+        finally:
+            for _ in range(concurrency):
+                await in_q.put(None)
+
+    async def worker():
+        while True:
+            batch = await in_q.get()
+            if batch is None:
+                await out_q.put(done)
+                return
+            try:
+                results, errors = await classify_batch_async(batch, provider=provider, bucket=bucket)
+                for key, _, _ in batch:
+                    if key in errors:
+                        await out_q.put((key, None, errors[key]))
+                    else:
+                        await out_q.put((key, results[key], None))
+            except Exception as e:
+                for key, _, _ in batch:
+                    await out_q.put((key, None, e))
+
+    tasks = [asyncio.create_task(feed())]
+    tasks += [asyncio.create_task(worker()) for _ in range(concurrency)]
+    finished = 0
+    try:
+        while finished < concurrency:
+            msg = await out_q.get()
+            if msg is done:
+                finished += 1
+                continue
+            yield msg
+    finally:
+        for t in tasks:
+            t.cancel()
+
+    if feed_error:
+        raise feed_error[0]
+
+# -------------------------------------------------
+# API micro-batching
+# -------------------------------------------------
+async def classify_pairs_async(
+    pairs: List[Tuple[str, str]], provider: Optional[str] = None
+) -> List[Union[Dict[str, Any], Exception]]:
+    """
+    Classify (title, body) pairs, packed into token-budgeted multi-article prompts
+    that run concurrently. Results are returned in input order; an item that
+    failed has its exception in place of a result (see MicroBatcher).
+    """
+    items = [(i, title, body) for i, (title, body) in enumerate(pairs)]
+    batches = list(pack_batches(items, max_items=max(1, len(items))))
+    out: List[Union[Dict[str, Any], Exception]] = [None] * len(items)
+    parts = await asyncio.gather(
+        *(classify_batch_async(batch, provider=provider) for batch in batches),
+        return_exceptions=True,
+    )
+    for batch, part in zip(batches, parts):
+        for key, _, _ in batch:
+            if isinstance(part, Exception):
+                out[key] = part
+            else:
+                results, errors = part
+                out[key] = errors[key] if key in errors else results[key]
+    return out
+
+def get_sentiment_batcher() -> MicroBatcher:
+    """
+    Process-wide coalescer for single-article API requests. Must be used from the
+    event loop that first called it (the API server loop).
+    """
+    global _sentiment_batcher
+    if _sentiment_batcher is None:
+        _sentiment_batcher = MicroBatcher(
+            classify_pairs_async,
+            max_batch_size=SENTIMENT_MICROBATCH_MAX_ITEMS,
+            max_wait_ms=SENTIMENT_MICROBATCH_WAIT_MS,
+            max_in_flight=SENTIMENT_MICROBATCH_MAX_IN_FLIGHT,
+        )
+    return _sentiment_batcher
@@ -0,0 +1,275 @@
+# src/sentiment_features.py
+"""
+Materialized rolling sentiment layer (sentiment_features table).
+
+Per (ticker, model_version), on a dense calendar (days without news -> 0 articles):
+- sent_mean_{3,7,21}d: article-weighted rolling mean of the daily sentiment score
+- sent_decay: exponentially decayed, article-weighted sentiment (half-life in days)
+- volume_z_21d: z-score of article_count against the trailing 21-day window
+
+Daily score = avg_compound, or pct_positive - pct_negative when avg_compound is NULL
+(LLM labels carry no compound score).
+
+Incremental: each run only materializes days after the last stored day (through today
+in the exchange timezone), plus any earlier days whose daily_sentiment row was
+recomputed since the last run. The decay recursion resumes from the stored state.
+"""
+
+import os
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import OperationalError, ProgrammingError
+
+from src.config import EXCHANGE_TIMEZONE
+from src.db import engine, read_connection, async_read_connection
+from src.schema import SentimentFeature
+
+ROLLING_WINDOWS = (3, 7, 21)
+VOLUME_Z_WINDOW = 21
+SENTIMENT_DECAY_HALFLIFE_DAYS = float(os.getenv("SENTIMENT_DECAY_HALFLIFE_DAYS", "3"))
+LOOKBACK_DAYS = max(max(ROLLING_WINDOWS), VOLUME_Z_WINDOW)
+
+FEATURE_COLUMNS = [
+    "sent_mean_3d",
+    "sent_mean_7d",
+    "sent_mean_21d",
+    "sent_decay",
+    "volume_z_21d",
+]
+
+
+def _today() -> pd.Timestamp:
+    return pd.Timestamp.now(tz=EXCHANGE_TIMEZONE).tz_localize(None).normalize()
+
+
+def _feature_state(conn, ticker, model_version):
+    """
+    Returns (last materialized day, last computed_at) or (None, None).
+    """
+    row = conn.execute(
+        text(
+            """
+            SELECT MAX(date), MAX(computed_at) FROM sentiment_features
+            WHERE ticker = :t AND model_version = :mv
+            """
+        ),
+        {"t": ticker, "mv": model_version},
+    ).first()
+    return (row[0], row[1]) if row and row[0] is not None else (None, None)
+
+
+def _first_dirty_day(conn, ticker, model_version, last_day, last_computed_at):
+    start = pd.Timestamp(last_day) + pd.Timedelta(days=1)
+    recomputed = conn.execute(
+        text(
+            """
+            SELECT MIN(date) FROM daily_sentiment
+            WHERE ticker = :t AND model_version = :mv
+              AND date <= :last_day AND computed_at > :since
+            """
+        ),
+        {"t": ticker, "mv": model_version, "last_day": last_day, "since": last_computed_at},
+    ).scalar()
+    if recomputed is not None:
+        start = min(start, pd.Timestamp(recomputed).normalize())
+    return start
+
+
+def _load_daily(conn, ticker, model_version, since):
+    q = text(
+        """
+        SELECT date, avg_compound, article_count, pct_positive, pct_negative
+        FROM daily_sentiment
+        WHERE ticker = :t AND model_version = :mv AND (CAST(:since AS timestamp) IS NULL OR date >= :since)
+        ORDER BY date
+        """
+    )
+    return pd.read_sql(
+        q,
+        conn,
+        params={"t": ticker, "mv": model_version, "since": since},
+        parse_dates=["date"],
+    )
+
+
+def _decay_state(conn, ticker, model_version, day):
+    row = conn.execute(
+        text(
+            """
+            SELECT decay_num, decay_den FROM sentiment_features
+            WHERE ticker = :t AND model_version = :mv AND date = :d
+            """
+        ),
+        {"t": ticker, "mv": model_version, "d": day},
+    ).first()
+    return (float(row[0]), float(row[1])) if row else (0.0, 0.0)
+
+
+def compute_features(daily: pd.DataFrame, start: pd.Timestamp, end: pd.Timestamp,
+                     decay_state=(0.0, 0.0)) -> pd.DataFrame:
+    """
+    Vectorized computation over a dense calendar. `daily` must cover at least
+    LOOKBACK_DAYS before `start`; only rows in [start, end] are returned.
+    """
+    from scipy.signal import lfilter  # deferred: scipy.signal import is slow
+
+    first = min(start - pd.Timedelta(days=LOOKBACK_DAYS), daily["date"].min()) if len(daily) else start
+    calendar = pd.date_range(first.normalize(), end.normalize(), freq="D")
+
+    d = daily.copy()
+    d["date"] = d["date"].dt.normalize()
+    d["score"] = d["avg_compound"].where(d["avg_compound"].notna(), d["pct_positive"] - d["pct_negative"])
+    d = d.groupby("date").agg(article_count=("article_count", "sum"), score=("score", "mean"))
+    d = d.reindex(calendar)
+    count = d["article_count"].fillna(0).to_numpy(dtype=float)
+    score = d["score"].fillna(0).to_numpy(dtype=float)
+    weighted = score * count
+
+    out = pd.DataFrame(index=calendar)
+    out["article_count"] = count.astype(int)
+    w = pd.Series(weighted, index=calendar)
+    c = pd.Series(count, index=calendar)
+    for n in ROLLING_WINDOWS:
+        num = w.rolling(n, min_periods=1).sum()
+        den = c.rolling(n, min_periods=1).sum()
+        out[f"sent_mean_{n}d"] = (num / den).where(den > 0)
+
+    mean = c.rolling(VOLUME_Z_WINDOW, min_periods=2).mean()
+    std = c.rolling(VOLUME_Z_WINDOW, min_periods=2).std()
+    out[f"volume_z_{VOLUME_Z_WINDOW}d"] = ((c - mean) / std).where(std > 0)
+
+    # decay recursion y[t] = x[t] + lam * y[t-1], resumed from the stored state at start - 1
+    lam = 0.5 ** (1.0 / SENTIMENT_DECAY_HALFLIFE_DAYS)
+    mask = calendar >= start
+    num0, den0 = decay_state
+    dnum, _ = lfilter([1.0], [1.0, -lam], weighted[mask], zi=[lam * num0])
+    dden, _ = lfilter([1.0], [1.0, -lam], count[mask], zi=[lam * den0])
+
+    out = out[mask].copy()
+    out["decay_num"] = dnum
+    out["decay_den"] = dden
+    out["sent_decay"] = np.where(dden > 1e-9, dnum / np.maximum(dden, 1e-9), np.nan)
+    out.index.name = "date"
+    return out.reset_index()
+
+
+def _upsert(conn, rows):
+    if not rows:
+        return
+    stmt = insert(SentimentFeature.__table__).values(rows)
+    update_cols = {
+        col: stmt.excluded[col]
+        for col in rows[0].keys()
+        if col not in ("ticker", "date", "model_version")
+    }
+    update_cols["computed_at"] = text("now()")
+    conn.execute(
+        stmt.on_conflict_do_update(
+            index_elements=["ticker", "date", "model_version"],
+            set_=update_cols,
+        )
+    )
+
+
+def materialize_ticker(conn, ticker: str, model_version: str, end: pd.Timestamp = None) -> int:
+    end = end or _today()
+    last_day, last_computed_at = _feature_state(conn, ticker, model_version)
+    if last_day is None:
+        daily = _load_daily(conn, ticker, model_version, None)
+        if daily.empty:
+            return 0
+        start = daily["date"].min().normalize()
+    else:
+        start = _first_dirty_day(conn, ticker, model_version, last_day, last_computed_at)
+        if start > end:
+            return 0
+        daily = _load_daily(conn, ticker, model_version, start - pd.Timedelta(days=LOOKBACK_DAYS))
+
+    end = max(end, daily["date"].max().normalize()) if len(daily) else end
+    state = _decay_state(conn, ticker, model_version, start - pd.Timedelta(days=1))
+    feats = compute_features(daily, start, end, decay_state=state)
+
+    records = feats.astype(object).where(feats.notna(), None).to_dict("records")
+    rows = []
+    for r in records:
+        r["date"] = pd.Timestamp(r["date"]).to_pydatetime()
+        r["ticker"] = ticker
+        r["model_version"] = model_version
+        rows.append(r)
+    for i in range(0, len(rows), 1000):
+        _upsert(conn, rows[i:i + 1000])
+    return len(rows)
+
+
+def materialize_sentiment_features(model_version: str, tickers=None) -> int:
+    SentimentFeature.__table__.create(bind=engine, checkfirst=True)
+    total = 0
+    with engine.begin() as conn:
+        if tickers is None:
+            tickers = [
+                r[0]
+                for r in conn.execute(
+                    text("SELECT DISTINCT ticker FROM daily_sentiment WHERE model_version = :mv"),
+                    {"mv": model_version},
+                )
+            ]
+        for t in tickers:
+            total += materialize_ticker(conn, t, model_version)
+    return total
+
+
+_SENTIMENT_FEATURES_SQL = text(
+    f"""
+    SELECT ticker, date, {", ".join(FEATURE_COLUMNS)}
+    FROM sentiment_features
+    WHERE ticker = :t AND model_version = :mv
+    ORDER BY date
+    """
+)
+
+
+def _empty_features() -> pd.DataFrame:
+    return pd.DataFrame(columns=["ticker", "date"] + FEATURE_COLUMNS)
+
+
+def _undefined_table(exc) -> bool:
+    """
+    True when a query failed because sentiment_features does not exist yet;
+    timeouts and connection errors must propagate instead of zeroing features.
+    """
+    orig = exc.orig
+    code = getattr(orig, "pgcode", None) or getattr(orig, "sqlstate", None)
+    return code == "42P01" or "no such table" in str(orig)
+
+
+def _features_frame(rows) -> pd.DataFrame:
+    df = pd.DataFrame(rows, columns=["ticker", "date"] + FEATURE_COLUMNS)
+    df["date"] = pd.to_datetime(df["date"])
+    return df
+
+
+def load_sentiment_features(ticker: str, model_version: str) -> pd.DataFrame:
+    # plain execute rather than pd.read_sql, which re-wraps driver errors in its own DatabaseError
+    try:
+        with read_connection() as conn:
+            rows = conn.execute(_SENTIMENT_FEATURES_SQL, {"t": ticker, "mv": model_version}).all()
+    except (ProgrammingError, OperationalError) as e:
+        if not _undefined_table(e):
+            raise
+        # table not materialized yet
+        return _empty_features()
+    return _features_frame(rows)
+
+
+async def load_sentiment_features_async(ticker: str, model_version: str) -> pd.DataFrame:
+    try:
+        async with async_read_connection() as conn:
+            rows = (await conn.execute(_SENTIMENT_FEATURES_SQL, {"t": ticker, "mv": model_version})).all()
+    except (ProgrammingError, OperationalError) as e:
+        if not _undefined_table(e):
+            raise
+        # table not materialized yet
+        return _empty_features()
+    return _features_frame(rows)
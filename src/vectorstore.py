@@ -1,17 +1,90 @@
 # src/vectorstore.py
-from chromadb import Client
-from chromadb.config import Settings
-from src.embeddings import embed_texts
+"""
+Vector store backends behind one get_collection(name):
+- chroma (default)  persistent Chroma collection under data/chroma
+- ann               embedded memory-mapped IVF index (src.ann_store)
+
+Both return Chroma-shaped results, and callers pass explicit embeddings
+(src.embeddings), so the backend is a deployment choice (VECTOR_BACKEND).
+"""
+
+import os
+import time
+import threading
+from pathlib import Path
+
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma")
+CHROMA_DIR = Path(os.getenv("CHROMA_DIR", "./data/chroma"))
+VERSION_DIR = Path(os.getenv("COLLECTION_VERSION_DIR", str(CHROMA_DIR)))
+
+_client = None
+_collections = {}
+_lock = threading.Lock()
+
+
+def _get_client():
+    global _client
+    if _client is None:
+        import chromadb
+
+        _client = chromadb.PersistentClient(
+            path=str(CHROMA_DIR),
+            settings=chromadb.config.Settings(anonymized_telemetry=False),
+        )
+    return _client
+
+
+def _embedding_function():
+    from chromadb.api.types import EmbeddingFunction
+    from src.embeddings import embed_texts
+
+    class GeminiEmbeddingFunction(EmbeddingFunction):
+        """
+        Only used when a caller passes documents/query_texts without embeddings.
+        """
+
+        def __init__(self):
+            pass
+
+        def __call__(self, input):
+            return embed_texts(list(input))
+
+    return GeminiEmbeddingFunction()
 
-client = Client(
-    Settings(
-        persist_directory="./data/chroma",
-        anonymized_telemetry=False,
-    )
-)
 
 def get_collection(name="news"):
-    return client.get_or_create_collection(
-        name=name,
-        embedding_function=embed_texts,
-    )
+    with _lock:
+        if name not in _collections:
+            if VECTOR_BACKEND == "ann":
+                from src.ann_store import AnnCollection
+
+                _collections[name] = AnnCollection(name)
+            elif VECTOR_BACKEND == "chroma":
+                _collections[name] = _get_client().get_or_create_collection(
+                    name=name,
+                    embedding_function=_embedding_function(),
+                )
+            else:
+                raise ValueError(f"Unknown vector backend: {VECTOR_BACKEND}")
+        return _collections[name]
+
+
+def _version_file(name: str) -> Path:
+    return VERSION_DIR / f"{name}.version"
+
+
+def collection_version(name="news") -> str:
+    """
+    Cheap cross-process change marker for a collection (a stat() call).
+    Writers call bump_collection_version after modifying the collection.
+    """
+    try:
+        return str(_version_file(name).stat().st_mtime_ns)
+    except FileNotFoundError:
+        return "0"
+
+
+def bump_collection_version(name="news"):
+    path = _version_file(name)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(str(time.time_ns()))
@@ -0,0 +1,73 @@
+# src/watermarks.py
+"""
+Read/write pipeline high-water marks (pipeline_watermarks table).
+Functions take a Connection so the mark can move in the same transaction
+as the work it covers.
+
+Ids are assigned when a row is inserted but become visible when its
+transaction commits, so a row can appear below a mark that already moved
+past it (concurrent labelers / the intraday stream). Two ways around that:
+
+- settled_max_id (PostgreSQL): only move the mark to an id below which every
+  inserting transaction has finished; exact, no window
+- rescan_from: idempotent consumers re-read a trailing window of
+  WATERMARK_RESCAN_IDS ids below the mark. A row is picked up only if fewer
+  than WATERMARK_RESCAN_IDS ids were assigned after it before it committed.
+"""
+
+import os
+import time
+from typing import Optional
+
+from sqlalchemy import select, text, update, insert
+from src.schema import PipelineWatermark
+
+WATERMARK_RESCAN_IDS = int(os.getenv("WATERMARK_RESCAN_IDS", "10000"))
+WATERMARK_SETTLE_TIMEOUT_SEC = float(os.getenv("WATERMARK_SETTLE_TIMEOUT_SEC", "120"))
+
+
+def get_watermark(conn, name: str) -> int:
+    row = conn.execute(
+        select(PipelineWatermark.last_id).where(PipelineWatermark.name == name)
+    ).first()
+    return row[0] if row else 0
+
+
+def set_watermark(conn, name: str, last_id: int):
+    res = conn.execute(
+        update(PipelineWatermark)
+        .where(PipelineWatermark.name == name)
+        .values(last_id=last_id)
+    )
+    if res.rowcount == 0:
+        conn.execute(insert(PipelineWatermark).values(name=name, last_id=last_id))
+
+
+def rescan_from(last_id: int, window: int = WATERMARK_RESCAN_IDS) -> int:
+    """
+    Lower bound (exclusive) to read from so late commits below last_id are included.
+    """
+    return max(0, last_id - window) if last_id else 0
+
+
+def settled_max_id(conn, table: str, where: str = "", params: Optional[dict] = None,
+                   timeout: float = WATERMARK_SETTLE_TIMEOUT_SEC) -> Optional[int]:
+    """
+    PostgreSQL: max(id) of `table` (optionally filtered) such that every
+    transaction that could still commit a row with a lower id has finished.
+
+    Reads max(id) together with the snapshot's xmax, then polls (each READ
+    COMMITTED statement takes a fresh snapshot) until the oldest running
+    transaction is at least that xmax. Only an insert that had drawn its id but
+    not yet written the row at that instant can slip through. Returns None on
+    timeout. Call before `conn`'s transaction writes anything: its own xid
+    would never finish.
+    """
+    sql = f"SELECT txid_snapshot_xmax(txid_current_snapshot()), COALESCE(MAX(id), 0) FROM {table}"
+    xmax, top = conn.execute(text(sql + (f" WHERE {where}" if where else "")), params or {}).one()
+    deadline = time.monotonic() + timeout
+    while conn.execute(text("SELECT txid_snapshot_xmin(txid_current_snapshot())")).scalar() < xmax:
+        if time.monotonic() >= deadline:
+            return None
+        time.sleep(0.2)
+    return top